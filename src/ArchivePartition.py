@@ -0,0 +1,156 @@
+import base64
+import gzip
+import hashlib
+import json
+import os
+from bisect import bisect_left
+
+from Files import Files
+from Globals import StorageConsts
+from Instrumentation import Instrumentation
+from SortedTasks import SortedTasks
+from Task import Task
+from TaskStatistics import TaskStatistics
+
+
+class ArchivePartition:
+    """ArchivePartition is a part of archive of completed tasks with dates
+    of one period. It is stored in its own json file, that can be compressed
+    by gzip.
+    tasks: dict - id -> task for all tasks of partition,
+    sorted_tasks: SortedTasks - tasks ordered by date, priority and difficult,
+    signature: list - modification time and size of file, from which the
+    partition was read or to which it was written, None for new partition
+    """
+
+    def __init__(self, tasks=tuple(), signature: list | None = None):
+        """Creates ArchivePartition object from tasks and signature of their
+        file"""
+        self.__tasks = {task.id: task for task in tasks}
+        self.__sorted_tasks = SortedTasks(self.__tasks.values())
+        self.__signature = signature
+
+    @staticmethod
+    def read(path: str, compressed: bool):
+        """Returns partition read from file by path. Signature is taken from
+        opened file, so it belongs exactly to read content"""
+        with Instrumentation.open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            content = file.read()
+        if compressed:
+            content = gzip.decompress(content)
+        tasks_attributes = []
+        if len(content) != 0:
+            tasks_attributes = json.loads(content)
+        return ArchivePartition(map(Task, tasks_attributes),
+                                [stat.st_mtime_ns, stat.st_size])
+
+    def write(self, path: str, compressed: bool):
+        """Atomically writes all tasks of partition to file by path"""
+        tasks_attributes = [task.get_attributes()
+                            for task in self.__sorted_tasks]
+        content = json.dumps(tasks_attributes).encode("UTF-8")
+        if compressed:
+            content = gzip.compress(
+                content, compresslevel=StorageConsts.compression_level,
+                mtime=0)
+        Files.write_atomic(path, content)
+        stat = os.stat(path)
+        self.__signature = [stat.st_mtime_ns, stat.st_size]
+
+    def add(self, task: Task):
+        """Adds task to partition"""
+        self.__tasks[task.id] = task
+        self.__sorted_tasks.add(task)
+
+    def remove(self, task_id: int) -> Task | None:
+        """Removes task by id from partition. Returns removed task or None if
+        there is no task with this id"""
+        task = self.__tasks.pop(task_id, None)
+        if task is not None:
+            self.__sorted_tasks.remove(task)
+        return task
+
+    def get(self, task_id: int) -> Task | None:
+        """Returns task by id if this task exist otherwise None"""
+        return self.__tasks.get(task_id)
+
+    def get_tasks(self, tags: set) -> list:
+        """Returns ordered list of tasks, that have all tags"""
+        if len(tags) == 0:
+            return self.__sorted_tasks.tasks
+        return [task for task in self.__sorted_tasks if tags <= task.tags]
+
+    def get_by_dates(self, first_ordinal: int, last_ordinal: int,
+                     tags: set) -> list:
+        """Returns ordered tasks with date from first_ordinal to
+        last_ordinal inclusive, that have all tags"""
+        tasks = self.__sorted_tasks.get_by_dates(first_ordinal, last_ordinal)
+        if len(tags) == 0:
+            return tasks
+        return [task for task in tasks if tags <= task.tags]
+
+    def count_before(self, ordinal: int, tags: set) -> int:
+        """Returns number of tasks, that have all tags, with date before
+        ordinal"""
+        if len(tags) == 0:
+            return self.__sorted_tasks.count_before(ordinal)
+        return bisect_left(self.get_tasks(tags), ordinal,
+                           key=lambda task: task.ordinal)
+
+    @staticmethod
+    def _get_name_bits_(name: str, size: int) -> list:
+        """Returns positions of bits of name in filter of names with size
+        bits"""
+        hashes = StorageConsts.name_filter_hashes
+        digest = hashlib.blake2b(name.encode("UTF-8"),
+                                 digest_size=4 * hashes).digest()
+        return [int.from_bytes(digest[4 * i:4 * i + 4], "little") % size
+                for i in range(hashes)]
+
+    def get_name_filter(self) -> str:
+        """Returns Bloom filter of names of tasks encoded by base64:
+        StorageConsts.name_filter_bits bits per task, every name sets
+        StorageConsts.name_filter_hashes bits"""
+        size = max(len(self.__tasks) * StorageConsts.name_filter_bits, 8)
+        bits = bytearray((size + 7) // 8)
+        for task in self.__tasks.values():
+            for bit in self._get_name_bits_(task.name, len(bits) * 8):
+                bits[bit // 8] |= 1 << bit % 8
+        return base64.b64encode(bits).decode("ascii")
+
+    @staticmethod
+    def may_have_name(name_filter: str, name: str) -> bool:
+        """Returns False if partition with filter of names (see
+        get_name_filter) surely has no task with name"""
+        bits = base64.b64decode(name_filter)
+        return all(bits[bit // 8] >> bit % 8 & 1
+                   for bit in ArchivePartition._get_name_bits_(
+                       name, len(bits) * 8))
+
+    def get_summary(self) -> dict:
+        """Returns summary of partition for manifest: number of tasks,
+        number of tasks with every tag, range of ids, range of dates,
+        counters of every day (see TaskStatistics.get_rows) and filter of
+        names (see get_name_filter)"""
+        tags = dict()
+        for task in self.__tasks.values():
+            for tag in task.tags:
+                tags[tag] = tags.get(tag, 0) + 1
+        summary = {"count": len(self.__tasks), "tags": tags, "min_id": None,
+                   "max_id": None, "first": None, "last": None,
+                   "days": TaskStatistics(self.__tasks.values()).get_rows(),
+                   "names": self.get_name_filter()}
+        if len(self.__tasks) != 0:
+            tasks = self.__sorted_tasks.get_slice(0, 1) + \
+                self.__sorted_tasks.get_slice(len(self.__tasks) - 1, 1)
+            summary.update(min_id=min(self.__tasks), max_id=max(self.__tasks),
+                           first=tasks[0].ordinal, last=tasks[1].ordinal)
+        return summary
+
+    def __len__(self) -> int:
+        return len(self.__tasks)
+
+    @property
+    def signature(self) -> list | None:
+        return self.__signature
@@ -0,0 +1,627 @@
+import json
+import os
+import os.path
+from contextlib import contextmanager
+from datetime import date
+
+from ArchivePartition import ArchivePartition
+from Files import Files
+from Globals import PathConsts, StorageConsts
+from Instrumentation import Instrumentation
+from Storage import Storage
+from Task import Task
+from TaskStatistics import TaskStatistics
+
+
+class ArchiveStore(Storage):
+    """ArchiveStore is a storage of completed tasks partitioned by period
+    (month or year) of their dates. Every partition is stored in its own
+    json file in directory of archive, files of periods, that ended more than
+    StorageConsts.cold_days ago, are compressed by gzip. Manifest keeps
+    summary of every partition: number of tasks, number of tasks with every
+    tag, range of ids, range of dates, counters of days and filter of names,
+    so counts, tags and statistics are known without reading partitions,
+    queries read only partitions they touch and check of name reads only
+    partitions, that may have it.
+    Read partitions are kept in memory, partition is read again only if its
+    file was replaced by another process.
+    Changed partitions are written before manifest. If process crashes
+    between them, summaries of changed files are restored at the next start.
+    Mutations are persisted by owner of store (TaskManager) under exclusive
+    file lock.
+    path: string - path to directory of archive,
+    manifest_path: string - path to manifest,
+    period: string - period of partitions,
+    compression: bool - are cold partitions compressed,
+    summaries: dict - key of partition -> summary of partition,
+    partitions: dict - key of partition -> partition read to memory,
+    manifest_signature: tuple - modification time and size of manifest
+    after the last reading or writing, None before the first reading,
+    manifest_changed: bool - must manifest be written at the next commit,
+    stale: set - keys of partitions, whose summaries must be computed again,
+    dirty: set - keys of partitions changed by current transaction,
+    undo: list - (key, id, previous task or None) for every mutation of
+    current transaction or None if there is no transaction,
+    additions: bool - does current transaction add tasks,
+    written: dict - keys of partitions, whose files were changed by current
+    commit, with former format of their files (None if there was no file)
+    """
+
+    def __init__(self, path: str, period=StorageConsts.archive_period,
+                 compression=StorageConsts.archive_compression):
+        """Creates ArchiveStore object by path to directory of archive.
+        Period and compression of existing archive are taken from its
+        manifest"""
+        super().__init__(is_completed=True)
+        self.__path = path
+        self.__manifest_path = os.path.join(path, PathConsts.manifest_name)
+        self.__period = period
+        self.__compression = compression
+        self.__summaries = dict()
+        self.__partitions = dict()
+        self.__manifest_signature = None
+        self.__manifest_changed = False
+        self.__stale = set()
+        self.__dirty = set()
+        self.__undo = None
+        self.__additions = False
+        self.__written = dict()
+
+    @staticmethod
+    def get_key(ordinal: int, period: str) -> str:
+        """Returns key of partition of period with date by ordinal, keys are
+        ordered as periods"""
+        day = date.fromordinal(ordinal)
+        if period == StorageConsts.year_period:
+            return f"{day.year:04}"
+        return f"{day.year:04}-{day.month:02}"
+
+    @staticmethod
+    def get_last_ordinal(key: str) -> int:
+        """Returns ordinal of the last day of period of partition by key"""
+        parts = list(map(int, key.split("-")))
+        if len(parts) == 1:
+            next_day = date(parts[0] + 1, 1, 1)
+        else:
+            year, month = parts
+            next_day = date(year + month // 12, month % 12 + 1, 1)
+        return next_day.toordinal() - 1
+
+    @staticmethod
+    def _get_signature_(path: str) -> tuple:
+        """Returns modification time and size of file by path or empty tuple
+        if there is no file"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return tuple()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _get_path_(self, key: str, compressed: bool) -> str:
+        """Returns path to file of partition by key"""
+        name = key + PathConsts.archive_extension
+        if compressed:
+            name += PathConsts.compressed_extension
+        return os.path.join(self.__path, name)
+
+    @staticmethod
+    def _parse_name_(name: str) -> tuple:
+        """Returns key of partition and is it compressed by name of its file,
+        key is None if it isn't file of partition"""
+        compressed = name.endswith(PathConsts.compressed_extension)
+        if compressed:
+            name = name[:-len(PathConsts.compressed_extension)]
+        key = name[:-len(PathConsts.archive_extension)]
+        if not name.endswith(PathConsts.archive_extension) or \
+                len(key) == 0 or not key.replace("-", "").isdigit():
+            return None, compressed
+        return key, compressed
+
+    def _is_cold_(self, key: str) -> bool:
+        """Returns True if period of partition ended more than
+        StorageConsts.cold_days ago"""
+        today = date.today().toordinal()
+        return self.get_last_ordinal(key) < today - StorageConsts.cold_days
+
+    @staticmethod
+    def _make_summary_(partition: ArchivePartition, compressed: bool) -> dict:
+        """Returns summary of partition with format and signature of its
+        file"""
+        summary = partition.get_summary()
+        summary.update(compressed=compressed, signature=partition.signature)
+        return summary
+
+    def _read_manifest_(self):
+        """Reads summaries of partitions from manifest"""
+        try:
+            with Instrumentation.open(self.__manifest_path,
+                                      'rb') as file:
+                stat = os.fstat(file.fileno())
+                manifest = json.loads(file.read())
+        except FileNotFoundError:
+            self.__summaries = dict()
+            self.__manifest_signature = tuple()
+            return
+        self.__period = manifest["period"]
+        self.__compression = manifest["compression"]
+        self.__summaries = manifest["partitions"]
+        self.__manifest_signature = stat.st_mtime_ns, stat.st_size
+
+    def _recover_(self):
+        """Compares summaries from manifest with files of partitions and
+        reads partitions, whose files were written after manifest. If both
+        plain and compressed files of partition exist, the newer one is
+        used"""
+        if not os.path.isdir(self.__path):
+            return
+        files = dict()
+        for name in os.listdir(self.__path):
+            key, compressed = self._parse_name_(name)
+            if key is not None:
+                files.setdefault(key, []).append(compressed)
+        for key in set(self.__summaries) - set(files):
+            del self.__summaries[key]
+            self.__manifest_changed = True
+        for key, variants in files.items():
+            compressed = max(variants, key=lambda variant: os.path.getmtime(
+                self._get_path_(key, variant)))
+            path = self._get_path_(key, compressed)
+            summary = self.__summaries.get(key)
+            if summary is not None and summary["compressed"] == compressed \
+                    and summary["signature"] == \
+                    list(self._get_signature_(path)):
+                continue
+            partition = ArchivePartition.read(path, compressed)
+            self.__partitions[key] = partition
+            self.__summaries[key] = self._make_summary_(partition, compressed)
+            self.__manifest_changed = True
+
+    def _refresh_(self):
+        """Reads manifest again if it was changed since the last reading or
+        writing and forgets read partitions, whose files were replaced.
+        Isn't made during transaction"""
+        if self.__undo is not None:
+            return
+        signature = self._get_signature_(self.__manifest_path)
+        if signature == self.__manifest_signature:
+            return
+        is_first_reading = self.__manifest_signature is None
+        self._read_manifest_()
+        self._bump_version_()
+        self.__stale = set()
+        if is_first_reading:
+            self._recover_()
+        for key, partition in list(self.__partitions.items()):
+            summary = self.__summaries.get(key)
+            if summary is None or summary["signature"] != partition.signature:
+                del self.__partitions[key]
+
+    def _get_summary_(self, key: str) -> dict:
+        """Returns summary of partition by key, computes it again if
+        partition was changed"""
+        if key in self.__stale:
+            self.__stale.discard(key)
+            compressed = self.__summaries[key]["compressed"]
+            self.__summaries[key] = self._make_summary_(
+                self.__partitions[key], compressed)
+        return self.__summaries[key]
+
+    def _get_partition_(self, key: str) -> ArchivePartition:
+        """Returns partition by key, reads it from file if it isn't read
+        yet. If file was just replaced by another process with file in other
+        format, it is read instead, if it was deleted partition is empty"""
+        partition = self.__partitions.get(key)
+        if partition is not None:
+            return partition
+        compressed = self.__summaries[key]["compressed"]
+        partition = ArchivePartition()
+        for variant in (compressed, not compressed):
+            try:
+                partition = ArchivePartition.read(
+                    self._get_path_(key, variant), variant)
+                break
+            except FileNotFoundError:
+                continue
+        self.__partitions[key] = partition
+        return partition
+
+    def _get_keys_(self, tags: set) -> list:
+        """Returns ordered keys of partitions, that can have tasks with all
+        tags by their summaries"""
+        keys = []
+        for key in sorted(self.__summaries):
+            summary = self._get_summary_(key)
+            if summary["count"] != 0 and \
+                    all(tag in summary["tags"] for tag in tags):
+                keys.append(key)
+        return keys
+
+    def _count_(self, key: str, tags: set) -> int:
+        """Returns number of tasks of partition, that have all tags. It is
+        taken from summary if there are less than two tags"""
+        summary = self._get_summary_(key)
+        if len(tags) == 0:
+            return summary["count"]
+        if len(tags) == 1:
+            return summary["tags"].get(next(iter(tags)), 0)
+        return len(self._get_partition_(key).get_tasks(tags))
+
+    def _find_key_(self, task_id: int) -> str | None:
+        """Returns key of partition with task by id or None if there is no
+        such task. Read partitions are searched first, other partitions are
+        read only if task id is in range of their ids"""
+        for key, partition in self.__partitions.items():
+            if partition.get(task_id) is not None:
+                return key
+        for key in reversed(self._get_keys_(set())):
+            summary = self._get_summary_(key)
+            if key in self.__partitions or \
+                    not summary["min_id"] <= task_id <= summary["max_id"]:
+                continue
+            if self._get_partition_(key).get(task_id) is not None:
+                return key
+        return None
+
+    @contextmanager
+    def _mutation_(self):
+        """Context manager for mutation, outside of transaction it makes
+        mutation as one transaction"""
+        if self.__undo is not None:
+            yield
+            return
+        self.begin()
+        try:
+            yield
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    def _mutate_(self, key: str, task_id: int, task: Task | None):
+        """Replaces task by id in partition by key with task (deletes it if
+        task is None) in memory until commit"""
+        partition = self.__partitions.get(key)
+        if partition is None and key not in self.__summaries:
+            partition = ArchivePartition()
+            self.__partitions[key] = partition
+            self.__summaries[key] = self._make_summary_(partition, False)
+        elif partition is None:
+            partition = self._get_partition_(key)
+        old_task = partition.remove(task_id)
+        if task is not None:
+            partition.add(task)
+            self.__additions = True
+        self.__undo.append((key, task_id, old_task))
+        self.__stale.add(key)
+        self.__dirty.add(key)
+        self._bump_version_()
+
+    def add_task(self, task: Task):
+        """Adds task to partition of its date"""
+        with self._mutation_():
+            self._mutate_(self.get_key(task.ordinal, self.__period), task.id,
+                          task)
+
+    def delete_task_by_id(self, task_id: int):
+        """Deletes task with this id from its partition"""
+        with self._mutation_():
+            key = self._find_key_(task_id)
+            if key is not None:
+                self._mutate_(key, task_id, None)
+
+    def begin(self):
+        """Starts transaction, all mutations until commit are made only in
+        memory"""
+        self._refresh_()
+        self.__undo = list()
+        self.__dirty = set()
+        self.__additions = False
+
+    def _write_(self):
+        """Writes changed partitions, deletes files of empty ones and then
+        writes manifest. Cold partitions are written compressed and file in
+        other format is deleted. Empty partitions are forgotten only after
+        manifest is written, so rollback after failed write finds them.
+        Former format of every partition is saved in written before its
+        files are changed"""
+        os.makedirs(self.__path, exist_ok=True)
+        emptied = set()
+        for key in sorted(self.__dirty):
+            partition = self.__partitions[key]
+            summary = self.__summaries[key]
+            self.__written[key] = None if summary["signature"] is None \
+                else summary["compressed"]
+            compressed = self.__compression and self._is_cold_(key)
+            other_path = self._get_path_(key, not compressed)
+            if len(partition) == 0:
+                for path in (self._get_path_(key, compressed), other_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                emptied.add(key)
+                continue
+            partition.write(self._get_path_(key, compressed), compressed)
+            if os.path.exists(other_path):
+                os.remove(other_path)
+            self.__summaries[key] = self._make_summary_(partition, compressed)
+            self.__stale.discard(key)
+        for key in list(self.__stale - emptied):
+            self._get_summary_(key)
+        manifest = {"period": self.__period,
+                    "compression": self.__compression,
+                    "partitions": {key: summary for key, summary
+                                   in self.__summaries.items()
+                                   if key not in emptied}}
+        Files.write_atomic(self.__manifest_path, json.dumps(manifest))
+        for key in emptied:
+            del self.__partitions[key]
+            del self.__summaries[key]
+            self.__stale.discard(key)
+        self.__manifest_signature = self._get_signature_(self.__manifest_path)
+        self.__manifest_changed = False
+
+    def _restore_(self, written: dict):
+        """Writes files of partitions changed by failed commit again from
+        their rolled back state in former format, deletes files of
+        partitions created by it. Summaries get new signatures of files, so
+        manifest is written at the next commit"""
+        for key, compressed in written.items():
+            for variant in (False, True):
+                path = self._get_path_(key, variant)
+                if variant != compressed and os.path.exists(path):
+                    os.remove(path)
+            if compressed is None:
+                self.__partitions.pop(key, None)
+                self.__summaries.pop(key, None)
+                self.__stale.discard(key)
+                continue
+            partition = self.__partitions[key]
+            partition.write(self._get_path_(key, compressed), compressed)
+            self.__summaries[key] = self._make_summary_(partition, compressed)
+            self.__stale.discard(key)
+        self.__manifest_changed = True
+
+    def commit(self):
+        """Persists all mutations of transaction, only changed partitions
+        are written. If writing fails, mutations are rolled back and files of
+        partitions, that were already written, are restored, so files of
+        archive keep state before transaction"""
+        try:
+            if len(self.__dirty) != 0 or self.__manifest_changed:
+                self._write_()
+        except BaseException:
+            written = self.__written
+            self.rollback()
+            if len(written) != 0:
+                self._restore_(written)
+            raise
+        self.__written = dict()
+        self.__undo = None
+        self.__dirty = set()
+        self.__additions = False
+
+    def rollback(self):
+        """Cancels all mutations of transaction in memory"""
+        for key, task_id, old_task in reversed(self.__undo or []):
+            partition = self.__partitions[key]
+            partition.remove(task_id)
+            if old_task is not None:
+                partition.add(old_task)
+            self.__stale.add(key)
+        for key in self.__dirty:
+            if key in self.__summaries and \
+                    self.__summaries[key]["signature"] is None:
+                del self.__partitions[key]
+                del self.__summaries[key]
+                self.__stale.discard(key)
+        self.__undo = None
+        self.__dirty = set()
+        self.__written = dict()
+        self.__additions = False
+        self._bump_version_()
+
+    def migrate(self, tasks: list):
+        """Creates archive with tasks (from another storage), each partition
+        is written once"""
+        self.begin()
+        self.__manifest_changed = True
+        try:
+            for task in tasks:
+                self.add_task(task)
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    @property
+    def exists(self) -> bool:
+        """Returns True if manifest of archive exists"""
+        return os.path.exists(self.__manifest_path)
+
+    @property
+    def has_pending_additions(self) -> bool:
+        """Returns True if current transaction adds tasks to store"""
+        return self.__additions
+
+    @property
+    def has_pending_changes(self) -> bool:
+        """Returns True if current transaction changes store or manifest
+        must be written after recovery"""
+        return len(self.__dirty) != 0 or self.__manifest_changed
+
+    @property
+    def version(self) -> int:
+        """Returns version of tasks, reads manifest first if it was
+        changed"""
+        self._refresh_()
+        return super().version
+
+    @property
+    def tasks(self) -> list:
+        """Returns all tasks of store in sorted order, reads all
+        partitions"""
+        self._refresh_()
+        tasks = []
+        for key in self._get_keys_(set()):
+            tasks.extend(self._get_partition_(key).get_tasks(set()))
+        return tasks
+
+    def get_tasks(self, tags: set) -> list:
+        """Returns sorted by date, priority and difficult list of all tasks,
+        that have all tags. Only partitions, that have all tags by summary,
+        are read"""
+        self._refresh_()
+        tasks = []
+        for key in self._get_keys_(tags):
+            tasks.extend(self._get_partition_(key).get_tasks(tags))
+        return tasks
+
+    def get_tasks_page(self, tags: set, offset: int, limit: int) -> list:
+        """Returns limit tasks, that have all tags, starting from offset
+        position in sorted list of them. Partitions before offset are skipped
+        by counts from summaries, so only partitions of page are read"""
+        self._refresh_()
+        tasks = []
+        for key in self._get_keys_(tags):
+            if len(tasks) >= limit:
+                break
+            count = self._count_(key, tags)
+            if offset >= count:
+                offset -= count
+                continue
+            partition_tasks = self._get_partition_(key).get_tasks(tags)
+            tasks.extend(partition_tasks[offset:offset + limit - len(tasks)])
+            offset = 0
+        return tasks
+
+    def count_tasks(self, tags: set) -> int:
+        """Returns number of tasks, that have all tags. With less than two
+        tags it is found by summaries only"""
+        self._refresh_()
+        return sum(self._count_(key, tags) for key in self._get_keys_(tags))
+
+    def count_tasks_before(self, ordinal: int, tags: set) -> int:
+        """Returns number of tasks, that have all tags, with date before
+        ordinal. Only partition, that contains this date, is read"""
+        self._refresh_()
+        count = 0
+        for key in self._get_keys_(tags):
+            summary = self._get_summary_(key)
+            if summary["first"] >= ordinal:
+                break
+            if summary["last"] < ordinal:
+                count += self._count_(key, tags)
+                continue
+            count += self._get_partition_(key).count_before(ordinal, tags)
+        return count
+
+    def get_tasks_by_dates(self, first_ordinal: int, last_ordinal: int,
+                           tags=frozenset()) -> list:
+        """Returns sorted list of all tasks with date from first_ordinal to
+        last_ordinal inclusive, that have all tags. Only partitions, whose
+        dates intersect with this range, are read"""
+        self._refresh_()
+        tasks = []
+        for key in self._get_keys_(tags):
+            summary = self._get_summary_(key)
+            if summary["last"] < first_ordinal:
+                continue
+            if summary["first"] > last_ordinal:
+                break
+            tasks.extend(self._get_partition_(key).get_by_dates(
+                first_ordinal, last_ordinal, tags))
+        return tasks
+
+    def search_tasks(self, query: str, tags: set, limit: int,
+                     dates=None) -> list:
+        """Returns limit best tasks, whose name or tag contains lowercased
+        query, that have all tags and date from range dates if it is given.
+        Only partitions, that have all tags and intersect with range of
+        dates, are read"""
+        self._refresh_()
+        tasks = []
+        for key in self._get_keys_(tags):
+            summary = self._get_summary_(key)
+            if dates is not None and (summary["last"] < dates[0] or
+                                      summary["first"] > dates[1]):
+                continue
+            tasks.extend(self._get_partition_(key).get_tasks(tags))
+        return self.rank_found_tasks(tasks, query, tags, limit, dates)
+
+    def get_statistics(self, tags: set, dates=None) -> dict:
+        """Returns statistics of tasks, that have all tags, with date from
+        range dates if it is given. Without tags it is summed from counters
+        of days in summaries, with tags only partitions, that have all tags
+        and intersect with range of dates, are read. Partitions are also read
+        if their summaries come from manifest without counters of days"""
+        self._refresh_()
+        statistics = TaskStatistics()
+        for key in self._get_keys_(tags):
+            summary = self._get_summary_(key)
+            if dates is not None and (summary["last"] < dates[0] or
+                                      summary["first"] > dates[1]):
+                continue
+            if len(tags) == 0 and "days" in summary:
+                statistics.add_rows(summary["days"], dates)
+                continue
+            for task in self._get_partition_(key).get_tasks(tags):
+                if dates is None or dates[0] <= task.ordinal <= dates[1]:
+                    statistics.add(task)
+        return statistics.get_summary()
+
+    def _may_have_names_(self, key: str, names: set) -> set:
+        """Returns names, that partition by key may have by filter of names
+        from its summary. Summary from old manifest has no filter, then all
+        names are returned"""
+        name_filter = self._get_summary_(key).get("names")
+        if name_filter is None:
+            return names
+        return {name for name in names
+                if ArchivePartition.may_have_name(name_filter, name)}
+
+    def find_task_by_name(self, task_name: str) -> bool:
+        """Returns True if task with this name exists otherwise False, reads
+        partitions, that may have task by filters of names, from the latest
+        one until task is found"""
+        self._refresh_()
+        for key in reversed(self._get_keys_(set())):
+            if len(self._may_have_names_(key, {task_name})) == 0:
+                continue
+            if any(task.name == task_name
+                   for task in self._get_partition_(key).get_tasks(set())):
+                return True
+        return False
+
+    def find_tasks_by_names(self, names: set) -> set:
+        """Returns names from names, that tasks of this storage have, every
+        partition, that may have some of not found names by filter of names,
+        is read once for all names"""
+        self._refresh_()
+        found = set()
+        for key in reversed(self._get_keys_(set())):
+            if len(found) == len(names):
+                break
+            candidates = self._may_have_names_(key, names - found)
+            if len(candidates) == 0:
+                continue
+            found.update(task.name for task in
+                         self._get_partition_(key).get_tasks(set())
+                         if task.name in candidates)
+        return found
+
+    def get_task_by_id(self, task_id: int) -> Task | None:
+        """Returns task by id if this task exist otherwise None"""
+        self._refresh_()
+        key = self._find_key_(task_id)
+        if key is None:
+            return None
+        return self.__partitions[key].get(task_id)
+
+    @property
+    def tags(self) -> set:
+        """Returns all tags used at least once in this storage, they are
+        taken from summaries"""
+        self._refresh_()
+        tags = set()
+        for key in self._get_keys_(set()):
+            tags.update(self.__summaries[key]["tags"])
+        return tags
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from Globals import PersistenceConsts
+
+
+class BackgroundWriter:
+    """BackgroundWriter persists changes in its own thread, so thread, that
+    makes them (event loop of graphic shell), never waits for disk. Changes
+    submitted during PersistenceConsts.coalesce_delay after the first one
+    are written together by one call of write. Errors of writing are kept
+    until they are taken by owner.
+    write: function - writes list of submitted changes,
+    queue: list - submitted changes, that are not taken by thread yet,
+    writing: bool - is thread writing changes now,
+    errors: list - errors of writing, that are not taken yet,
+    closed: bool - is writer closed, thread finishes after the last write,
+    condition: threading.Condition - guards all state of writer,
+    thread: threading.Thread - thread of writer
+    """
+
+    def __init__(self, write):
+        """Creates BackgroundWriter object by function of writing and
+        starts its thread. Thread is daemon, so it doesn't keep interpreter
+        alive, owner must flush writer before exit"""
+        self.__write = write
+        self.__queue = list()
+        self.__writing = False
+        self.__errors = list()
+        self.__closed = False
+        self.__condition = threading.Condition()
+        self.__thread = threading.Thread(target=self._run_, daemon=True)
+        self.__thread.start()
+
+    def _run_(self):
+        """Waits for changes, takes all changes submitted during coalesce
+        delay and writes them"""
+        while True:
+            with self.__condition:
+                while len(self.__queue) == 0 and not self.__closed:
+                    self.__condition.wait()
+                if len(self.__queue) == 0:
+                    return
+                self.__writing = True
+            if not self.__closed:
+                time.sleep(PersistenceConsts.coalesce_delay)
+            with self.__condition:
+                changes = self.__queue
+                self.__queue = list()
+            try:
+                self.__write(changes)
+            except Exception as error:
+                with self.__condition:
+                    self.__errors.append(error)
+            finally:
+                with self.__condition:
+                    self.__writing = False
+                    self.__condition.notify_all()
+
+    def submit(self, change):
+        """Puts change to queue of writer"""
+        with self.__condition:
+            if self.__closed:
+                raise RuntimeError("writer is closed")
+            self.__queue.append(change)
+            self.__condition.notify_all()
+
+    def flush(self):
+        """Waits until all submitted changes are written"""
+        with self.__condition:
+            self.__condition.notify_all()
+            while len(self.__queue) != 0 or self.__writing:
+                self.__condition.wait()
+
+    def close(self):
+        """Writes all submitted changes and finishes thread"""
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+        self.__thread.join()
+
+    def take_errors(self) -> list:
+        """Returns errors of writing since the last call"""
+        with self.__condition:
+            errors = self.__errors
+            self.__errors = list()
+            return errors
+
+    @property
+    def is_idle(self) -> bool:
+        """Returns True if all submitted changes are written"""
+        with self.__condition:
+            return len(self.__queue) == 0 and not self.__writing
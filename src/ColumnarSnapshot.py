@@ -0,0 +1,329 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from Files import Files
+from Storage import Storage
+from Task import Task
+from TaskStatistics import TaskStatistics
+
+
+class ColumnarSnapshot:
+    """ColumnarSnapshot is a read-only binary snapshot of tasks with the same
+    state, stored by columns and opened by mmap, so only pages of columns,
+    that are used by query, are read from disk and Task objects are built
+    only for rows, that are returned. Rows are ordered by date, priority and
+    difficult, so row numbers are positions in sorted list of tasks.
+    File consists of header and columns aligned to 8 bytes:
+    ids (int64), ordinals (int32), priorities (uint8), difficults (uint8),
+    id_order (uint32) - rows ordered by id for binary search by id,
+    name_offsets (uint32) and names - UTF-8 names of rows one after another,
+    tag_offsets (uint32) and tag_codes (uint32) - codes of tags of rows,
+    posting_offsets (uint32) and postings (uint32) - ordered rows of every
+    tag code, dictionary - json list of tags, code of tag is its index.
+    All numbers are little-endian.
+    path: string - path to snapshot file,
+    file: file - opened snapshot file,
+    map: mmap - memory map of snapshot file, None for empty file,
+    columns: dict - name of column -> memoryview of its values,
+    offsets: dict - name of column -> offset of column in file,
+    rows: int - number of tasks in snapshot,
+    tags: list - dictionary of tags, None before the first use,
+    codes: dict - tag -> code, None before the first use,
+    cache: dict - row -> built Task,
+    signature: tuple - modification time and size of opened file
+    """
+
+    magic = b"TMCS"
+    version = 1
+    header = struct.Struct("<4sIIIIII")
+    alignment = 8
+    columns = (("ids", "q"), ("ordinals", "i"), ("priorities", "B"),
+               ("difficults", "B"), ("id_order", "I"), ("name_offsets", "I"),
+               ("tag_offsets", "I"), ("tag_codes", "I"),
+               ("posting_offsets", "I"), ("postings", "I"), ("names", "B"),
+               ("dictionary", "B"))
+
+    def __init__(self, path: str):
+        """Opens snapshot by path and maps it to memory. Only header is read
+        at once. Empty file is an empty snapshot"""
+        self.__path = path
+        self.__file = open(path, 'rb')
+        stat = os.fstat(self.__file.fileno())
+        self.__signature = (stat.st_mtime_ns, stat.st_size)
+        self.__map = None
+        self.__columns = dict()
+        self.__offsets = dict()
+        self.__tags = None
+        self.__codes = None
+        self.__cache = dict()
+        if stat.st_size == 0:
+            self.__rows = 0
+            return
+        self.__map = mmap.mmap(self.__file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+        try:
+            self._map_columns_()
+        except BaseException:
+            self.close()
+            raise
+
+    @staticmethod
+    def _get_layout_(counts: tuple) -> list:
+        """Returns (name, type code, number of values, offset) of every
+        column by numbers of values in them"""
+        layout = []
+        offset = ColumnarSnapshot.header.size
+        for (name, code), count in zip(ColumnarSnapshot.columns, counts):
+            offset += -offset % ColumnarSnapshot.alignment
+            layout.append((name, code, count, offset))
+            offset += count * array(code).itemsize
+        return layout
+
+    @staticmethod
+    def _get_counts_(rows: int, tags_count: int, tag_refs: int,
+                     names_size: int, dictionary_size: int) -> tuple:
+        """Returns numbers of values in columns in the same order as
+        ColumnarSnapshot.columns"""
+        return (rows, rows, rows, rows, rows, rows + 1, rows + 1, tag_refs,
+                tags_count + 1, tag_refs, names_size, dictionary_size)
+
+    def _map_columns_(self):
+        """Checks header and makes memoryviews of all columns"""
+        if len(self.__map) < self.header.size:
+            raise ValueError(f"{self.__path} is not a columnar snapshot")
+        magic, version, *counts = self.header.unpack_from(self.__map)
+        if magic != self.magic or version != self.version:
+            raise ValueError(f"{self.__path} is not a columnar snapshot")
+        self.__rows = counts[0]
+        layout = self._get_layout_(self._get_counts_(*counts))
+        name, code, count, offset = layout[-1]
+        if offset + count > len(self.__map):
+            raise ValueError(f"{self.__path} is truncated")
+        view = memoryview(self.__map)
+        for name, code, count, offset in layout:
+            size = count * array(code).itemsize
+            column = view[offset:offset + size]
+            if sys.byteorder != "little" and code != "B":
+                values = array(code, column)
+                values.byteswap()
+                column = memoryview(values)
+            self.__columns[name] = column.cast(code)
+            self.__offsets[name] = offset
+        view.release()
+
+    @staticmethod
+    def write(path: str, tasks):
+        """Atomically writes tasks in any order to snapshot file by path"""
+        tasks = sorted(tasks, key=Storage.sort_key)
+        tags = sorted({tag for task in tasks for tag in task.tags})
+        codes = {tag: code for code, tag in enumerate(tags)}
+        values = {name: array(code) for name, code in
+                  ColumnarSnapshot.columns}
+        postings = [[] for _ in tags]
+        names = bytearray()
+        values["name_offsets"].append(0)
+        values["tag_offsets"].append(0)
+        for row, task in enumerate(tasks):
+            values["ids"].append(task.id)
+            values["ordinals"].append(task.ordinal)
+            values["priorities"].append(task.priority)
+            values["difficults"].append(task.difficult)
+            names += task.name.encode("UTF-8")
+            values["name_offsets"].append(len(names))
+            for code in sorted(codes[tag] for tag in task.tags):
+                values["tag_codes"].append(code)
+                postings[code].append(row)
+            values["tag_offsets"].append(len(values["tag_codes"]))
+        values["id_order"].extend(sorted(range(len(tasks)),
+                                         key=lambda row: tasks[row].id))
+        values["posting_offsets"].append(0)
+        for posting in postings:
+            values["postings"].extend(posting)
+            values["posting_offsets"].append(len(values["postings"]))
+        values["names"].frombytes(names)
+        values["dictionary"].frombytes(json.dumps(tags).encode("UTF-8"))
+        counts = (len(tasks), len(tags), len(values["tag_codes"]),
+                  len(names), len(values["dictionary"]))
+        content = bytearray(ColumnarSnapshot.header.pack(
+            ColumnarSnapshot.magic, ColumnarSnapshot.version, *counts))
+        layout = ColumnarSnapshot._get_layout_(
+            ColumnarSnapshot._get_counts_(*counts))
+        for name, code, count, offset in layout:
+            content += bytes(offset - len(content))
+            if sys.byteorder != "little":
+                values[name].byteswap()
+            content += values[name].tobytes()
+        Files.write_atomic(path, bytes(content))
+
+    def close(self):
+        """Releases all memoryviews and unmaps file. Built tasks stay
+        valid"""
+        for column in self.__columns.values():
+            column.release()
+        self.__columns = dict()
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+        self.__file.close()
+
+    def _get_dictionary_(self) -> list:
+        """Returns dictionary of tags, reads it at the first use"""
+        if self.__tags is None:
+            self.__tags = []
+            if self.__rows != 0:
+                self.__tags = json.loads(bytes(self.__columns["dictionary"]))
+            self.__codes = {tag: code for code, tag in enumerate(self.__tags)}
+        return self.__tags
+
+    def get_id(self, row: int) -> int:
+        """Returns id of task in row"""
+        return self.__columns["ids"][row]
+
+    def get_ordinal(self, row: int) -> int:
+        """Returns date ordinal of task in row"""
+        return self.__columns["ordinals"][row]
+
+    def get_key(self, row: int) -> tuple:
+        """Returns the same key of task in row as Storage.sort_key without
+        building the task"""
+        columns = self.__columns
+        return (columns["ordinals"][row], columns["priorities"][row],
+                -columns["difficults"][row], columns["ids"][row])
+
+    def get_name(self, row: int) -> str:
+        """Returns name of task in row"""
+        offsets = self.__columns["name_offsets"]
+        return bytes(self.__columns["names"][offsets[row]:offsets[row + 1]]) \
+            .decode("UTF-8")
+
+    def get_task(self, row: int) -> Task:
+        """Returns task in row, builds it at the first use"""
+        task = self.__cache.get(row)
+        if task is None:
+            columns = self.__columns
+            tags = self._get_dictionary_()
+            codes = columns["tag_codes"][columns["tag_offsets"][row]:
+                                         columns["tag_offsets"][row + 1]]
+            task = Task.make(columns["ids"][row], self.get_name(row),
+                             columns["ordinals"][row],
+                             [tags[code] for code in codes],
+                             columns["priorities"][row],
+                             columns["difficults"][row])
+            self.__cache[row] = task
+        return task
+
+    def find_row(self, task_id: int) -> int | None:
+        """Returns row of task by id or None if there is no task with this
+        id. Row is found by binary search in rows ordered by id"""
+        if self.__rows == 0:
+            return None
+        ids = self.__columns["ids"]
+        id_order = self.__columns["id_order"]
+        position = bisect_left(id_order, task_id, key=ids.__getitem__)
+        if position < self.__rows and ids[id_order[position]] == task_id:
+            return id_order[position]
+        return None
+
+    def find_name_rows(self, name: str) -> list:
+        """Returns rows of all tasks with this name. Name is searched in
+        blob of names without decoding of other names"""
+        if self.__rows == 0:
+            return []
+        encoded = name.encode("UTF-8")
+        offsets = self.__columns["name_offsets"]
+        start = self.__offsets["names"]
+        end = start + offsets[self.__rows]
+        rows = []
+        position = self.__map.find(encoded, start, end)
+        while position != -1:
+            offset = position - start
+            row = bisect_right(offsets, offset) - 1
+            if offsets[row] == offset and \
+                    offsets[row + 1] == offset + len(encoded):
+                rows.append(row)
+            position = self.__map.find(encoded, position + 1, end)
+        return rows
+
+    def find_names_rows(self, names: set) -> list:
+        """Returns rows of all tasks, whose names are in names. Blob of
+        names is read once, it is faster than find_name_rows for every name,
+        when there are many names"""
+        if self.__rows == 0 or len(names) == 0:
+            return []
+        encoded = {name.encode("UTF-8") for name in names}
+        offsets = self.__columns["name_offsets"]
+        blob = bytes(self.__columns["names"])
+        return [row for row, (start, end) in
+                enumerate(zip(offsets, offsets[1:]))
+                if blob[start:end] in encoded]
+
+    def count_before(self, ordinal: int) -> int:
+        """Returns number of rows with date before ordinal, it is the first
+        row with this date or later"""
+        if self.__rows == 0:
+            return 0
+        return bisect_left(self.__columns["ordinals"], ordinal)
+
+    def get_rows(self, tags: set, start: int, end: int):
+        """Returns ordered rows from start to end (not inclusive) of tasks,
+        that have all tags. Without tags it is a range, otherwise rows are
+        taken from the shortest posting of tags and checked by codes of their
+        tags"""
+        if len(tags) == 0:
+            return range(start, end)
+        self._get_dictionary_()
+        codes = set()
+        for tag in tags:
+            code = self.__codes.get(tag)
+            if code is None:
+                return []
+            codes.add(code)
+        columns = self.__columns
+        posting_offsets = columns["posting_offsets"]
+        code = min(codes, key=lambda code: posting_offsets[code + 1] -
+                   posting_offsets[code])
+        posting = columns["postings"][posting_offsets[code]:
+                                      posting_offsets[code + 1]]
+        posting = posting[bisect_left(posting, start):
+                          bisect_left(posting, end)]
+        codes.discard(code)
+        if len(codes) == 0:
+            return posting.tolist()
+        tag_offsets = columns["tag_offsets"]
+        tag_codes = columns["tag_codes"]
+        return [row for row in posting if codes.issubset(
+            tag_codes[tag_offsets[row]:tag_offsets[row + 1]].tolist())]
+
+    def get_tag_counts(self) -> dict:
+        """Returns tag -> number of rows with this tag by lengths of
+        postings"""
+        tags = self._get_dictionary_()
+        if len(tags) == 0:
+            return dict()
+        offsets = self.__columns["posting_offsets"]
+        return {tag: offsets[code + 1] - offsets[code]
+                for code, tag in enumerate(tags)}
+
+    def get_statistics(self, rows=None) -> TaskStatistics:
+        """Returns statistics of all rows or only of rows from rows. They
+        are aggregated by columns of dates, priorities, difficults and tags
+        without building tasks"""
+        if self.__rows == 0:
+            return TaskStatistics()
+        columns = self.__columns
+        return TaskStatistics.from_columns(
+            columns["ordinals"], columns["priorities"], columns["difficults"],
+            columns["tag_offsets"], columns["tag_codes"],
+            self._get_dictionary_(), rows)
+
+    def __len__(self) -> int:
+        return self.__rows
+
+    @property
+    def signature(self) -> tuple:
+        return self.__signature
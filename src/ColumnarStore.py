@@ -0,0 +1,543 @@
+import json
+import os
+import os.path
+import threading
+
+from ColumnarSnapshot import ColumnarSnapshot
+from Files import Files
+from Globals import PathConsts, StorageConsts
+from Journal import Journal
+from SortedTasks import SortedTasks
+from Storage import Storage
+from Task import Task
+from TaskStatistics import TaskStatistics
+from TaskStore import TaskStore
+
+
+class ColumnarStore(Storage):
+    """ColumnarStore is a storage of all tasks with the same state
+    (following/completed) backed by columnar snapshot (see
+    ColumnarSnapshot), that is opened by mmap, and journal of mutations made
+    after it. Only journal is read to memory: added and changed tasks are
+    kept in small overlay and deleted ones are hidden from snapshot, so
+    start and queries touch only pages of snapshot, that they need, and
+    Task objects are built only for returned rows. When journal becomes too
+    big it is folded to new snapshot at commit, that is made by owner of
+    store (TaskManager) under exclusive file lock.
+    path: string - path to snapshot file,
+    snapshot: ColumnarSnapshot - opened snapshot, None before reading,
+    added: dict - id -> task for tasks added after snapshot,
+    sorted_added: SortedTasks - added tasks ordered by date, priority and
+    difficult,
+    names: dict - name -> set of ids of added tasks with this name,
+    deleted: dict - id -> row of snapshot tasks, that were deleted or
+    replaced after snapshot,
+    statistics: TaskStatistics - counters of tasks by days, they are
+    aggregated from columns of snapshot by the first query of statistics and
+    then updated, None before it,
+    journal: Journal - journal of mutations made after the snapshot,
+    journal_records: int - number of records in journal,
+    signature: tuple - modification time and size of snapshot and journal
+    after the last reading or writing,
+    undo: list - (id, added task or None, was task of snapshot deleted) for
+    every mutation of current transaction or None if there is no
+    transaction,
+    pending: list - journal records of current transaction,
+    unwritten: int - number of deferred records, that are not written yet,
+    store isn't read again from disk until they are written
+    """
+
+    def __init__(self, path: str, is_completed=False):
+        """Creates ColumnarStore object by path to snapshot file and
+        state"""
+        super().__init__(is_completed)
+        self.__path = path
+        self.__snapshot = None
+        self.__added = dict()
+        self.__sorted_added = SortedTasks()
+        self.__names = dict()
+        self.__deleted = dict()
+        self.__statistics = None
+        self.__journal = Journal(path + PathConsts.journal_extension)
+        self.__journal_records = 0
+        self.__signature = None
+        self.__lock = threading.RLock()
+        self.__undo = None
+        self.__pending = list()
+        self.__unwritten = 0
+
+    @staticmethod
+    def convert_from_json(json_path: str, path: str):
+        """Writes all tasks of json file (with its journal) to columnar
+        snapshot by path and clears journal of snapshot"""
+        ColumnarSnapshot.write(path, TaskStore(json_path).tasks)
+        Journal(path + PathConsts.journal_extension).replace(b"")
+
+    @staticmethod
+    def convert_to_json(path: str, json_path: str):
+        """Writes all tasks of columnar snapshot (with its journal) to json
+        file by json_path and clears journal of json file"""
+        store = ColumnarStore(path)
+        tasks_attributes = [task.get_attributes() for task in store.tasks]
+        store.close()
+        Files.write_atomic(json_path, json.dumps(tasks_attributes))
+        Journal(json_path + PathConsts.journal_extension).replace(b"")
+
+    def _get_signature_(self) -> tuple:
+        """Returns modification time and size of snapshot and journal"""
+        stat = os.stat(self.__path)
+        return stat.st_mtime_ns, stat.st_size, self.__journal.signature
+
+    def _add_overlay_(self, task: Task):
+        """Adds task to overlay of added tasks"""
+        self.__added[task.id] = task
+        self.__sorted_added.add(task)
+        self.__names.setdefault(task.name, set()).add(task.id)
+        if self.__statistics is not None:
+            self.__statistics.add(task)
+        self._bump_version_()
+
+    def _pop_overlay_(self, task_id: int) -> Task | None:
+        """Removes task by id from overlay of added tasks. Returns removed
+        task or None if there is no added task with this id"""
+        task = self.__added.pop(task_id, None)
+        if task is None:
+            return None
+        self.__sorted_added.remove(task)
+        ids = self.__names[task.name]
+        ids.discard(task_id)
+        if len(ids) == 0:
+            del self.__names[task.name]
+        if self.__statistics is not None:
+            self.__statistics.remove(task)
+        self._bump_version_()
+        return task
+
+    def _hide_row_(self, task_id: int) -> Task | None:
+        """Hides task of snapshot by id. Returns hidden task or None if there
+        is no task with this id in snapshot"""
+        row = self.__snapshot.find_row(task_id)
+        if row is None:
+            return None
+        self.__deleted[task_id] = row
+        task = self.__snapshot.get_task(row)
+        if self.__statistics is not None:
+            self.__statistics.remove(task)
+        self._bump_version_()
+        return task
+
+    def _show_row_(self, task_id: int):
+        """Shows hidden task of snapshot by id again"""
+        row = self.__deleted.pop(task_id, None)
+        if row is None:
+            return
+        if self.__statistics is not None:
+            self.__statistics.add(self.__snapshot.get_task(row))
+        self._bump_version_()
+
+    def _remove_(self, task_id: int) -> Task | None:
+        """Removes task by id from overlay or hides it in snapshot. Returns
+        removed task or None if there is no task with this id"""
+        task = self._pop_overlay_(task_id)
+        if task is not None or task_id in self.__deleted:
+            return task
+        return self._hide_row_(task_id)
+
+    def _apply_record_(self, record: dict):
+        """Applies journal record to overlay. Applying is idempotent, so
+        records, that are already in snapshot, can be replayed again"""
+        if record["op"] == Journal.add_operation:
+            task = Task(record["task"])
+            self._remove_(task.id)
+            self._add_overlay_(task)
+        elif record["op"] == Journal.delete_operation:
+            self._remove_(record["id"])
+        elif record["op"] == Journal.batch_operation:
+            for batch_record in record["records"]:
+                self._apply_record_(batch_record)
+
+    def _load_(self):
+        """Opens snapshot and replays journal on top of it"""
+        if self.__snapshot is not None:
+            self.__snapshot.close()
+        self.__snapshot = ColumnarSnapshot(self.__path)
+        self.__added = dict()
+        self.__sorted_added = SortedTasks()
+        self.__names = dict()
+        self.__deleted = dict()
+        self.__statistics = None
+        records = self.__journal.read()
+        for record in records:
+            self._apply_record_(record)
+        self.__journal_records = len(records)
+        self._bump_version_()
+
+    def _refresh_(self):
+        """Opens snapshot again if it or journal was changed since last
+        reading or writing. Isn't made during transaction and while deferred
+        records are not written. If another
+        process replaced the snapshot during reading, it is read again, so
+        records folded to new snapshot are not lost"""
+        if self.__undo is not None or self.__unwritten > 0:
+            return
+        with self.__lock:
+            while True:
+                signature = self._get_signature_()
+                if signature == self.__signature:
+                    return
+                self._load_()
+                if self.__snapshot.signature == signature[:2] and \
+                        self._get_signature_()[:2] == signature[:2]:
+                    self.__signature = signature
+                    return
+
+    def _need_compaction_(self) -> bool:
+        """Returns True if journal passed size or ratio (to number of tasks)
+        threshold, big journal is compacted as in TaskStore"""
+        if self.__journal_records < StorageConsts.compaction_min_records:
+            return False
+        count = len(self.__snapshot) - len(self.__deleted) + \
+            len(self.__added)
+        ratio = self.__journal_records / max(count, 1)
+        if self.__journal.size >= StorageConsts.compaction_size:
+            return ratio >= StorageConsts.compaction_growth
+        return ratio >= StorageConsts.compaction_ratio
+
+    def _compact_(self):
+        """Writes all tasks to new snapshot, clears journal and opens new
+        snapshot"""
+        ColumnarSnapshot.write(self.__path, self.get_tasks(frozenset()))
+        self.__journal.replace(b"")
+        self._load_()
+        self.__signature = self._get_signature_()
+
+    def close(self):
+        """Unmaps snapshot, it is opened again by the next query"""
+        with self.__lock:
+            if self.__snapshot is not None:
+                self.__snapshot.close()
+                self.__snapshot = None
+                self.__signature = None
+
+    def _write_records_(self, records: list):
+        """Appends records to journal and folds it to new snapshot if it is
+        too big"""
+        self.__journal.append(records)
+        self.__journal_records += len(records)
+        self.__signature = self._get_signature_()
+        if self._need_compaction_():
+            self._compact_()
+
+    def _mutate_(self, task_id: int, task: Task | None, record: dict):
+        """Replaces task by id with task (deletes it if task is None) in
+        memory. Persists record at once if there is no transaction otherwise
+        postpones it until commit"""
+        undo_entry = (task_id, self.__added.get(task_id),
+                      task_id in self.__deleted)
+        self._remove_(task_id)
+        if task is not None:
+            self._add_overlay_(task)
+        if self.__undo is None:
+            self._write_records_([record])
+            return
+        self.__undo.append(undo_entry)
+        self.__pending.append(record)
+
+    def add_task(self, task: Task):
+        """Adds task to store and journal"""
+        with self.__lock:
+            self._refresh_()
+            record = Journal.make_add_record(task.get_attributes())
+            self._mutate_(task.id, task, record)
+
+    def delete_task_by_id(self, task_id: int):
+        """Deletes task with this id from store and journal"""
+        with self.__lock:
+            self._refresh_()
+            if self.get_task_by_id(task_id) is None:
+                return
+            record = Journal.make_delete_record(task_id)
+            self._mutate_(task_id, None, record)
+
+    def begin(self):
+        """Starts transaction, all mutations until commit are made only in
+        memory"""
+        with self.__lock:
+            self._refresh_()
+            self.__undo = list()
+            self.__pending = list()
+
+    def commit(self):
+        """Persists all mutations of transaction by one write. If writing
+        fails, mutations are rolled back"""
+        with self.__lock:
+            records = self.__pending
+            try:
+                if len(records) > 0:
+                    self._write_records_(records)
+            except BaseException:
+                self.rollback()
+                raise
+            self.__undo = None
+            self.__pending = list()
+
+    def rollback(self):
+        """Cancels all mutations of transaction in memory"""
+        with self.__lock:
+            for task_id, added_task, was_deleted in \
+                    reversed(self.__undo or []):
+                self._pop_overlay_(task_id)
+                if added_task is not None:
+                    self._add_overlay_(added_task)
+                if not was_deleted:
+                    self._show_row_(task_id)
+                elif task_id not in self.__deleted:
+                    self._hide_row_(task_id)
+            self.__undo = None
+            self.__pending = list()
+
+    @property
+    def supports_deferred_writes(self) -> bool:
+        """Returns True, deferred records are appended to journal"""
+        return True
+
+    def defer_commit(self) -> list:
+        """Finishes transaction keeping all its mutations in memory and
+        returns its journal records, that must be persisted by
+        write_deferred"""
+        with self.__lock:
+            records = self.__pending
+            self.__unwritten += len(records)
+            self.__undo = None
+            self.__pending = list()
+            return records
+
+    def write_deferred(self, records: list, reload=False):
+        """Appends records returned by defer_commit to journal. Journal is
+        written without lock of store, so queries aren't blocked by disk. If
+        reload is True, store is read again by the next query, otherwise
+        journal is folded to snapshot if it is too big and all deferred
+        records are written"""
+        self.__journal.append(records)
+        with self.__lock:
+            self.__journal_records += len(records)
+            self.__unwritten -= len(records)
+            self.__signature = self._get_signature_()
+            if reload:
+                self.__signature = None
+            elif self.__unwritten == 0 and self._need_compaction_():
+                self._compact_()
+
+    def discard_deferred(self, records: list):
+        """Forgets records returned by defer_commit, that can't be written,
+        store is read again from disk by the next query"""
+        with self.__lock:
+            self.__unwritten -= len(records)
+            self.__signature = None
+
+    @property
+    def has_pending_additions(self) -> bool:
+        """Returns True if current transaction adds tasks to store"""
+        return any(record["op"] == Journal.add_operation
+                   for record in self.__pending)
+
+    @property
+    def has_pending_changes(self) -> bool:
+        """Returns True if current transaction changes store"""
+        return len(self.__pending) > 0
+
+    def _get_rows_(self, tags: set, start: int, end: int):
+        """Returns ordered rows of snapshot from start to end (not
+        inclusive) of not deleted tasks, that have all tags"""
+        rows = self.__snapshot.get_rows(tags, start, end)
+        if len(self.__deleted) == 0:
+            return rows
+        deleted_rows = set(self.__deleted.values())
+        return [row for row in rows if row not in deleted_rows]
+
+    def _get_added_(self, tags: set, first_ordinal=None,
+                    last_ordinal=None) -> list:
+        """Returns ordered added tasks, that have all tags, with date from
+        first_ordinal to last_ordinal inclusive if they are given"""
+        if first_ordinal is None:
+            tasks = self.__sorted_added.tasks
+        else:
+            tasks = self.__sorted_added.get_by_dates(first_ordinal,
+                                                     last_ordinal)
+        if len(tags) == 0:
+            return tasks
+        return [task for task in tasks if tags <= task.tags]
+
+    def _merge_(self, rows, tasks: list, offset: int, limit: int) -> list:
+        """Returns limit tasks starting from offset position in merged
+        ordered rows of snapshot and ordered added tasks. Number of added
+        tasks before offset is found by binary search, so skipped rows are
+        neither built nor compared"""
+        snapshot = self.__snapshot
+        offset = max(0, min(offset, len(rows) + len(tasks)))
+        low = max(0, offset - len(rows))
+        high = min(offset, len(tasks))
+        while low < high:
+            middle = (low + high) // 2
+            if self.sort_key(tasks[middle]) < \
+                    snapshot.get_key(rows[offset - middle - 1]):
+                low = middle + 1
+            else:
+                high = middle
+        i, j = low, offset - low
+        result = []
+        while len(result) < limit and (i < len(tasks) or j < len(rows)):
+            if j == len(rows) or i < len(tasks) and \
+                    self.sort_key(tasks[i]) < snapshot.get_key(rows[j]):
+                result.append(tasks[i])
+                i += 1
+            else:
+                result.append(snapshot.get_task(rows[j]))
+                j += 1
+        return result
+
+    @property
+    def version(self) -> int:
+        """Returns version of tasks, opens snapshot again first if it or
+        journal was changed"""
+        with self.__lock:
+            self._refresh_()
+            return super().version
+
+    @property
+    def tasks(self) -> list:
+        """Returns all tasks of store in sorted order"""
+        return self.get_tasks(frozenset())
+
+    def get_tasks(self, tags: set) -> list:
+        """Returns sorted by date, priority and difficult attributes list of
+        all tasks, that have all tags"""
+        with self.__lock:
+            self._refresh_()
+            rows = self._get_rows_(tags, 0, len(self.__snapshot))
+            tasks = self._get_added_(tags)
+            return self._merge_(rows, tasks, 0, len(rows) + len(tasks))
+
+    def get_tasks_page(self, tags: set, offset: int, limit: int) -> list:
+        """Returns limit tasks, that have all tags, starting from offset
+        position in sorted list of them. Only tasks of page are built"""
+        with self.__lock:
+            self._refresh_()
+            rows = self._get_rows_(tags, 0, len(self.__snapshot))
+            return self._merge_(rows, self._get_added_(tags), offset, limit)
+
+    def count_tasks(self, tags: set) -> int:
+        """Returns number of tasks, that have all tags"""
+        with self.__lock:
+            self._refresh_()
+            if len(tags) == 0:
+                return len(self.__snapshot) - len(self.__deleted) + \
+                    len(self.__added)
+            return len(self._get_rows_(tags, 0, len(self.__snapshot))) + \
+                len(self._get_added_(tags))
+
+    def count_tasks_before(self, ordinal: int, tags: set) -> int:
+        """Returns number of tasks, that have all tags, with date before
+        ordinal. Rows before it are found by binary search in column of
+        dates"""
+        with self.__lock:
+            self._refresh_()
+            end = self.__snapshot.count_before(ordinal)
+            tasks = self._get_added_(tags, -1, ordinal - 1)
+            return len(self._get_rows_(tags, 0, end)) + len(tasks)
+
+    def get_tasks_by_dates(self, first_ordinal: int, last_ordinal: int,
+                           tags=frozenset()) -> list:
+        """Returns sorted list of all tasks with date from first_ordinal to
+        last_ordinal inclusive, that have all tags. Rows are found by binary
+        search in column of dates"""
+        with self.__lock:
+            self._refresh_()
+            start = self.__snapshot.count_before(first_ordinal)
+            end = self.__snapshot.count_before(last_ordinal + 1)
+            rows = self._get_rows_(tags, start, end)
+            tasks = self._get_added_(tags, first_ordinal, last_ordinal)
+            return self._merge_(rows, tasks, 0, len(rows) + len(tasks))
+
+    def get_statistics(self, tags: set, dates=None) -> dict:
+        """Returns statistics of tasks, that have all tags, with date from
+        range dates if it is given. Without tags it is summed from counters
+        of days, that are aggregated from columns of snapshot at the first
+        call, with tags rows of snapshot found by postings are aggregated by
+        columns"""
+        with self.__lock:
+            self._refresh_()
+            if len(tags) == 0:
+                if self.__statistics is None:
+                    statistics = self.__snapshot.get_statistics()
+                    for row in self.__deleted.values():
+                        statistics.remove(self.__snapshot.get_task(row))
+                    for task in self.__added.values():
+                        statistics.add(task)
+                    self.__statistics = statistics
+                return self.__statistics.get_summary(dates)
+            start, end = 0, len(self.__snapshot)
+            added = self._get_added_(tags)
+            if dates is not None:
+                start = self.__snapshot.count_before(dates[0])
+                end = self.__snapshot.count_before(dates[1] + 1)
+                added = self._get_added_(tags, dates[0], dates[1])
+            statistics = self.__snapshot.get_statistics(
+                self._get_rows_(tags, start, end))
+            for task in added:
+                statistics.add(task)
+            return statistics.get_summary()
+
+    def find_task_by_name(self, task_name: str) -> bool:
+        """Returns True if task with this name exists otherwise False"""
+        with self.__lock:
+            self._refresh_()
+            if task_name in self.__names:
+                return True
+            deleted_rows = set(self.__deleted.values())
+            return any(row not in deleted_rows for row in
+                       self.__snapshot.find_name_rows(task_name))
+
+    def find_tasks_by_names(self, names: set) -> set:
+        """Returns names from names, that tasks of this storage have, names of
+        snapshot are read once for all names"""
+        with self.__lock:
+            self._refresh_()
+            found = {name for name in names if name in self.__names}
+            deleted_rows = set(self.__deleted.values())
+            for row in self.__snapshot.find_names_rows(names - found):
+                if row not in deleted_rows:
+                    found.add(self.__snapshot.get_name(row))
+            return found
+
+    def get_task_by_id(self, task_id: int) -> Task | None:
+        """Returns task by id if this task exist otherwise None"""
+        with self.__lock:
+            self._refresh_()
+            task = self.__added.get(task_id)
+            if task is not None or task_id in self.__deleted:
+                return task
+            row = self.__snapshot.find_row(task_id)
+            if row is None:
+                return None
+            return self.__snapshot.get_task(row)
+
+    @property
+    def tags(self) -> set:
+        """Returns all tags used at least once in this storage. They are
+        counted by postings of snapshot without reading tags of rows"""
+        with self.__lock:
+            self._refresh_()
+            counts = self.__snapshot.get_tag_counts()
+            for row in self.__deleted.values():
+                for tag in self.__snapshot.get_task(row).tags:
+                    counts[tag] -= 1
+            tags = {tag for tag, count in counts.items() if count > 0}
+            for task in self.__added.values():
+                tags |= task.tags
+            return tags
+
+    @property
+    def exists(self) -> bool:
+        """Returns True if snapshot file exists"""
+        return os.path.exists(self.__path)
@@ -0,0 +1,404 @@
+import argparse
+import json
+import sys
+from datetime import date
+
+from Globals import ConsoleConsts, MessageConsts, PlannerConsts, \
+    ResultConsts, SearchConsts, ServerConsts, StateConsts, TaskConsts, \
+    TransferConsts
+from Task import Task
+from TaskManager import TaskManager
+from TaskTransfer import TaskTransfer
+
+
+class ConsoleShell:
+    """Command line shell for TaskManager engine, it doesn't need graphic
+    library.
+    manager: TaskManager - engine of application, created only when command
+    is parsed,
+    as_json: bool - is output in json"""
+
+    def __init__(self):
+        self.__manager = None
+        self.__as_json = False
+
+    @staticmethod
+    def get_parser() -> argparse.ArgumentParser:
+        """Returns parser of command line arguments"""
+        parser = argparse.ArgumentParser(
+            prog="main.py",
+            description=f"Task manager. Without command or with command "
+                        f"{ConsoleConsts.gui} the graphic shell is started")
+        common = argparse.ArgumentParser(add_help=False)
+        common.add_argument("--json", action="store_true",
+                            help="print result in json")
+        commands = parser.add_subparsers(dest="command", required=True)
+
+        add = commands.add_parser(ConsoleConsts.add, parents=[common],
+                                  help="add task")
+        add.add_argument("name")
+        add.add_argument("--date", default=TaskConsts.Default.date,
+                         help="date in format dd.mm.yyyy, today by default")
+        add.add_argument("--tag", action="append", default=[], dest="tags")
+        add.add_argument("--priority", default=TaskConsts.Default.priority)
+        add.add_argument("--difficult", default=TaskConsts.Default.difficult)
+        add.add_argument("--completed", action="store_true",
+                         help="add to completed tasks")
+        add.add_argument("--force", action="store_true",
+                         help="add even if task with this name exists")
+
+        tasks_list = commands.add_parser(ConsoleConsts.list,
+                                         parents=[common], help="print tasks")
+        tasks_list.add_argument("--tag", action="append", default=[],
+                                dest="tags", help="only tasks with all tags")
+        tasks_list.add_argument("--completed", action="store_true",
+                                help="print completed tasks")
+        tasks_list.add_argument("--offset", type=int, default=0)
+        tasks_list.add_argument("--limit", type=int, default=None)
+        dates = tasks_list.add_mutually_exclusive_group()
+        dates.add_argument("--overdue", action="store_true",
+                           help="only tasks with date before today")
+        dates.add_argument("--due-within", type=int, default=None,
+                           metavar="DAYS",
+                           help="only tasks with date from today to DAYS "
+                                "days from today")
+        tasks_list.add_argument("--from", default=None, dest="first_date",
+                                help="only tasks with this date or later")
+        tasks_list.add_argument("--to", default=None, dest="last_date",
+                                help="only tasks with this date or earlier")
+
+        for command, help_text in ((ConsoleConsts.check, "complete tasks"),
+                                   (ConsoleConsts.uncheck,
+                                    "make completed tasks following"),
+                                   (ConsoleConsts.delete, "delete tasks")):
+            ids_parser = commands.add_parser(command, parents=[common],
+                                             help=help_text)
+            ids_parser.add_argument("ids", type=int, nargs='+')
+            if command == ConsoleConsts.delete:
+                ids_parser.add_argument("--completed", action="store_true",
+                                        help="delete completed tasks")
+
+        commands.add_parser(ConsoleConsts.tags, parents=[common],
+                            help="print all tags")
+
+        search = commands.add_parser(ConsoleConsts.search, parents=[common],
+                                     help="search tasks by part of name or "
+                                          "tag")
+        search.add_argument("query")
+        search.add_argument("--tag", action="append", default=[],
+                            dest="tags", help="only tasks with all tags")
+        search.add_argument("--completed", action="store_true",
+                            help="search completed tasks")
+        search.add_argument("--limit", type=int, default=SearchConsts.limit)
+
+        statistics = commands.add_parser(
+            ConsoleConsts.statistics, parents=[common],
+            help="print number and difficult of tasks by states, "
+                 "priorities, tags and days")
+        statistics.add_argument("--tag", action="append", default=[],
+                                dest="tags", help="only tasks with all tags")
+        statistics.add_argument("--from", default=None, dest="first_date",
+                                help="only tasks with this date or later")
+        statistics.add_argument("--to", default=None, dest="last_date",
+                                help="only tasks with this date or earlier")
+
+        plan = commands.add_parser(
+            ConsoleConsts.plan, parents=[common],
+            help="print following tasks to do next, whose sum of difficult "
+                 "fits to budget, with explanations")
+        plan.add_argument("--budget", type=int, default=PlannerConsts.budget,
+                          help="max sum of difficult of tasks")
+        plan.add_argument("--limit", type=int, default=PlannerConsts.limit,
+                          help="max number of tasks")
+        plan.add_argument("--tag", action="append", default=[],
+                          dest="tags", help="only tasks with all tags")
+
+        import_parser = commands.add_parser(
+            ConsoleConsts.import_tasks, parents=[common],
+            help="import tasks from JSON Lines, CSV or iCalendar file")
+        import_parser.add_argument("path")
+        import_parser.add_argument("--format", choices=TransferConsts.formats,
+                                   default=None, dest="file_format",
+                                   help="format of file, by its extension "
+                                        "by default")
+        import_parser.add_argument("--force", action="store_true",
+                                   help="add tasks even if tasks with the "
+                                        "same names exist")
+        import_parser.add_argument("--chunk-size", type=int,
+                                   default=TransferConsts.chunk_size,
+                                   help="number of tasks written at once")
+
+        export_parser = commands.add_parser(
+            ConsoleConsts.export_tasks, parents=[common],
+            help="export tasks to JSON Lines, CSV or iCalendar file")
+        export_parser.add_argument("path")
+        export_parser.add_argument("--format", choices=TransferConsts.formats,
+                                   default=None, dest="file_format",
+                                   help="format of file, by its extension "
+                                        "by default")
+        states = export_parser.add_mutually_exclusive_group()
+        states.add_argument("--completed", action="store_const", const=True,
+                            default=None, dest="is_completed",
+                            help="export only completed tasks")
+        states.add_argument("--following", action="store_const", const=False,
+                            dest="is_completed",
+                            help="export only following tasks")
+
+        serve = commands.add_parser(ConsoleConsts.serve, parents=[common],
+                                    help="start local json API server")
+        serve.add_argument("--host", default=ServerConsts.host)
+        serve.add_argument("--port", type=int, default=ServerConsts.port)
+        serve.add_argument("--unix", default=None,
+                           help="path to unix socket to listen instead of "
+                                "port")
+        return parser
+
+    def print_result(self, result, text: str):
+        """Prints result in json or text"""
+        if self.__as_json:
+            print(json.dumps(result, ensure_ascii=False))
+        else:
+            print(text)
+
+    @staticmethod
+    def get_task_line(task: Task) -> str:
+        """Returns line with task for text output"""
+        tags = ", ".join(sorted(task.tags))
+        line = f"{task.id:>6} {task.date_str} {task.priority} " \
+               f"{task.difficult} {task.name}"
+        if tags:
+            line += f" [{tags}]"
+        return line
+
+    def add(self, arguments: argparse.Namespace) -> int:
+        """Adds task by arguments, returns exit code"""
+        task_attributes = {"id": None, "name": arguments.name,
+                           "date": arguments.date, "tags": arguments.tags,
+                           "priority": arguments.priority,
+                           "difficult": arguments.difficult}
+        message = Task.check_task_attributes(task_attributes)
+        if message != "":
+            self.print_result({"result": ResultConsts.invalid,
+                               "message": message}, message)
+            return 1
+        done = self.__manager.add_task(task_attributes,
+                                       is_completed=arguments.completed,
+                                       in_any_case=arguments.force)
+        if not done:
+            self.print_result({"result": ResultConsts.duplicate},
+                              MessageConsts.already_exist_console_text)
+            return 1
+        self.print_result({"result": ResultConsts.created,
+                           "id": task_attributes["id"]},
+                          str(task_attributes["id"]))
+        return 0
+
+    @staticmethod
+    def get_dates(arguments: argparse.Namespace) -> tuple | None:
+        """Returns ordinals of the first and the last dates of listed tasks
+        by arguments or None if they aren't limited by dates"""
+        if arguments.overdue:
+            return TaskManager.get_state_dates(StateConsts.overdue)
+        today = date.today().toordinal()
+        if arguments.due_within is not None:
+            return today, today + arguments.due_within
+        if arguments.first_date is None and arguments.last_date is None:
+            return None
+        first_ordinal = TaskConsts.Default.minimal_date.toordinal()
+        last_ordinal = date.max.toordinal()
+        if arguments.first_date is not None:
+            first_ordinal = Task.parse_date(arguments.first_date)
+        if arguments.last_date is not None:
+            last_ordinal = Task.parse_date(arguments.last_date)
+        return first_ordinal, last_ordinal
+
+    def list_tasks(self, arguments: argparse.Namespace) -> int:
+        """Prints tasks of section by arguments, returns exit code"""
+        try:
+            dates = self.get_dates(arguments)
+        except ValueError:
+            self.print_result({"result": ResultConsts.invalid,
+                               "message": MessageConsts.wrong_date_text},
+                              MessageConsts.wrong_date_text)
+            return 1
+        self.__manager.change_section_tags(arguments.tags, arguments.completed,
+                                           dates)
+        tasks = self.__manager.get_tasks(arguments.offset, arguments.limit)
+        self.print_result([task.get_attributes() for task in tasks],
+                          "\n".join(map(self.get_task_line, tasks)))
+        return 0
+
+    def print_results(self, ids: list, results: list) -> int:
+        """Prints results of operation with tasks by ids, returns exit
+        code"""
+        self.print_result(dict(zip(map(str, ids), results)),
+                          "\n".join(f"{task_id} {result}"
+                                    for task_id, result in zip(ids, results)))
+        return int(any(result != ResultConsts.done for result in results))
+
+    def check(self, arguments: argparse.Namespace) -> int:
+        """Completes tasks by ids, returns exit code"""
+        results = self.__manager.check_many(arguments.ids)
+        return self.print_results(arguments.ids, results)
+
+    def uncheck(self, arguments: argparse.Namespace) -> int:
+        """Makes completed tasks by ids following, returns exit code"""
+        results = self.__manager.uncheck_many(arguments.ids)
+        return self.print_results(arguments.ids, results)
+
+    def delete(self, arguments: argparse.Namespace) -> int:
+        """Deletes tasks by ids, returns exit code"""
+        self.__manager.change_section_tags([], arguments.completed)
+        results = self.__manager.delete_many(arguments.ids)
+        return self.print_results(arguments.ids, results)
+
+    def print_tags(self, arguments: argparse.Namespace) -> int:
+        """Prints all tags, returns exit code"""
+        tags = sorted(self.__manager.tags)
+        self.print_result(tags, "\n".join(tags))
+        return 0
+
+    def search(self, arguments: argparse.Namespace) -> int:
+        """Prints the best found tasks of section by arguments, returns exit
+        code"""
+        self.__manager.change_section_tags(arguments.tags, arguments.completed)
+        tasks = self.__manager.search_tasks(arguments.query, arguments.limit)
+        self.print_result([task.get_attributes() for task in tasks],
+                          "\n".join(map(self.get_task_line, tasks)))
+        return 0
+
+    @staticmethod
+    def get_statistics_lines(statistics: dict) -> list:
+        """Returns lines with statistics for text output"""
+        states = (StateConsts.following, StateConsts.completed)
+        lines = [f"{state} {statistics[state]['tasks']} difficult "
+                 f"{statistics[state]['difficult']}" for state in states]
+        lines.append(f"completion rate {statistics['completion_rate']:.0%}")
+        for field, title in (("priorities", "priority"), ("tags", "tag")):
+            for key, counts in sorted(statistics[field].items()):
+                lines.append(f"{title} {key}: " + ", ".join(
+                    f"{state} {counts[state]}" for state in states))
+        for day in statistics["days"]:
+            lines.append(f"{day['date']} " + " ".join(
+                f"{state} {day[state]}" for state in states) +
+                f" difficult {day['difficult']} rate "
+                f"{day['completion_rate']:.0%}")
+        return lines
+
+    def print_statistics(self, arguments: argparse.Namespace) -> int:
+        """Prints statistics of tasks by arguments, returns exit code"""
+        try:
+            statistics = self.__manager.get_statistics(
+                arguments.first_date, arguments.last_date, arguments.tags)
+        except ValueError:
+            self.print_result({"result": ResultConsts.invalid,
+                               "message": MessageConsts.wrong_date_text},
+                              MessageConsts.wrong_date_text)
+            return 1
+        self.print_result(statistics,
+                          "\n".join(self.get_statistics_lines(statistics)))
+        return 0
+
+    def plan(self, arguments: argparse.Namespace) -> int:
+        """Prints plan of tasks to do next by arguments, every task with
+        explanation, returns exit code"""
+        message = ""
+        if arguments.budget < 0:
+            message = MessageConsts.wrong_budget_text
+        elif arguments.limit < 0:
+            message = MessageConsts.wrong_limit_text
+        if message != "":
+            self.print_result({"result": ResultConsts.invalid,
+                               "message": message}, message)
+            return 1
+        picks = self.__manager.plan_tasks(arguments.budget, arguments.limit,
+                                          arguments.tags)
+        self.print_result(
+            [dict(pick, task=pick["task"].get_attributes())
+             for pick in picks],
+            "\n".join(f"{self.get_task_line(pick['task'])}\n"
+                      f"       {pick['explanation']}" for pick in picks))
+        return 0
+
+    def import_tasks(self, arguments: argparse.Namespace) -> int:
+        """Imports tasks from file by arguments, every not created row is
+        printed at once, so output doesn't grow in memory. Returns exit
+        code, it is 1 if some rows were not created"""
+        transfer = TaskTransfer(self.__manager, arguments.chunk_size)
+
+        def report(line: int, result: str, error: str):
+            self.print_result({"line": line, "result": result,
+                               "error": error},
+                              f"line {line}: {result}: {error}")
+
+        try:
+            counts = transfer.import_file(arguments.path,
+                                          arguments.file_format,
+                                          arguments.force, report)
+        except (OSError, ValueError) as error:
+            print(error, file=sys.stderr)
+            return 1
+        self.print_result(counts, ", ".join(
+            f"{result}: {count}" for result, count in counts.items()))
+        return int(counts[ResultConsts.created] !=
+                   sum(counts.values()))
+
+    def export_tasks(self, arguments: argparse.Namespace) -> int:
+        """Exports tasks to file by arguments, returns exit code"""
+        transfer = TaskTransfer(self.__manager)
+        try:
+            count = transfer.export_file(arguments.path,
+                                         arguments.file_format,
+                                         arguments.is_completed)
+        except (OSError, ValueError) as error:
+            print(error, file=sys.stderr)
+            return 1
+        self.print_result({"exported": count}, f"exported: {count}")
+        return 0
+
+    def serve(self, arguments: argparse.Namespace) -> int:
+        """Serves clients by local server until interruption, returns exit
+        code. Server is imported only here, so other commands start fast"""
+        import asyncio
+        from TaskServer import TaskServer
+        server = TaskServer(self.__manager, arguments.host, arguments.port,
+                            arguments.unix)
+
+        async def serve_forever():
+            await server.start()
+            self.print_result({"address": server.address},
+                              f"Serving on {server.address}")
+            sys.stdout.flush()
+            await server.serve_forever()
+
+        try:
+            asyncio.run(serve_forever())
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    def run(self, arguments: list) -> int:
+        """Runs command by command line arguments, returns exit code"""
+        arguments = self.get_parser().parse_args(arguments)
+        self.__as_json = arguments.json
+        commands = {ConsoleConsts.add: self.add,
+                    ConsoleConsts.list: self.list_tasks,
+                    ConsoleConsts.check: self.check,
+                    ConsoleConsts.uncheck: self.uncheck,
+                    ConsoleConsts.delete: self.delete,
+                    ConsoleConsts.tags: self.print_tags,
+                    ConsoleConsts.search: self.search,
+                    ConsoleConsts.statistics: self.print_statistics,
+                    ConsoleConsts.plan: self.plan,
+                    ConsoleConsts.serve: self.serve,
+                    ConsoleConsts.import_tasks: self.import_tasks,
+                    ConsoleConsts.export_tasks: self.export_tasks}
+        self.__manager = TaskManager()
+        try:
+            return commands[arguments.command](arguments)
+        finally:
+            self.__manager.close()
+
+
+if __name__ == "__main__":
+    sys.exit(ConsoleShell().run(sys.argv[1:]))
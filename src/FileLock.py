@@ -0,0 +1,43 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class FileLock:
+    """Advisory lock of data files shared by all processes, that work with
+    them. Shared lock is taken by readers, that need consistent state of
+    several files, so readers don't block each other. Exclusive lock is
+    taken by writers. Every acquisition opens lock file again, so threads of
+    one process also exclude each other. Where fcntl is not available
+    (Windows) locks do nothing.
+    path: string - path to lock file
+    """
+
+    def __init__(self, path: str):
+        """Creates FileLock object by path to lock file"""
+        self.__path = path
+
+    @contextmanager
+    def _lock_(self, operation: int):
+        """Context manager, that holds lock with fcntl operation"""
+        if fcntl is None:
+            yield
+            return
+        descriptor = os.open(self.__path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(descriptor, operation)
+            yield
+        finally:
+            os.close(descriptor)
+
+    def shared(self):
+        """Returns context manager, that holds shared lock"""
+        return self._lock_(fcntl.LOCK_SH if fcntl is not None else 0)
+
+    def exclusive(self):
+        """Returns context manager, that holds exclusive lock"""
+        return self._lock_(fcntl.LOCK_EX if fcntl is not None else 0)
@@ -0,0 +1,32 @@
+import os
+import threading
+
+from Globals import PathConsts
+from Instrumentation import Instrumentation
+
+
+class Files:
+    """Wrapper for all functions of work with files"""
+
+    @staticmethod
+    def write_temp(path: str, content: str | bytes) -> str:
+        """Writes content to temp file near the file by path, flushes it to
+        disk and returns path to temp file. Name of temp file is unique for
+        process and thread, so concurrent writers don't mix their temp
+        files"""
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}" \
+                    f"{PathConsts.temp_extension}"
+        if isinstance(content, str):
+            content = content.encode("UTF-8")
+        with Instrumentation.open(temp_path, 'wb') as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        return temp_path
+
+    @staticmethod
+    def write_atomic(path: str, content: str | bytes):
+        """Replaces content of file by path, so that after crash the file has
+        either old or new content"""
+        temp_path = Files.write_temp(path, content)
+        os.replace(temp_path, path)
@@ -0,0 +1,184 @@
+import PySimpleGUI as Sg
+
+from Globals import GeneralLayoutConsts, StateConsts
+from Layout import Layout
+from LayoutModel import LayoutModel
+
+
+class GeneralWindow:
+    """GeneralWindow is a long-lived general window of application. On every
+    show it compares new state of section with shown one and updates, hides
+    or inserts only changed elements. Window is rebuilt only if tags
+    changed more than GeneralLayoutConsts.rebuild_threshold.
+    window: Sg.Window - shown window or None,
+    rows: list - shown rows of tasks page for each slot (see
+    LayoutModel.get_task_rows), None for hidden slot,
+    tags: dict - tag -> is its checkbox visible for all tags in window,
+    picked_tags: set - picked tags of shown section,
+    is_completed: bool - is shown section completed,
+    state: str - state of shown section (see StateConsts),
+    statistics_lines: list - shown lines of statistics panel
+    """
+
+    def __init__(self):
+        """Creates GeneralWindow object without window"""
+        self.__window = None
+        self.__rows = list()
+        self.__tags = dict()
+        self.__picked_tags = set()
+        self.__is_completed = False
+        self.__state = StateConsts.following
+        self.__statistics_lines = list()
+
+    def _build_(self, tasks: list, tags: list, picked_tags: list,
+                is_completed: bool, offset: int, count: int, state: str,
+                query: str, statistics_lines: list):
+        """Closes shown window and creates new one"""
+        self.close()
+        layout = Layout.get_general_layout(tasks, tags, picked_tags,
+                                           is_completed, offset, count, state,
+                                           query, statistics_lines)
+        self.__window = Sg.Window("Task manager", layout, finalize=True)
+        rows = LayoutModel.get_task_rows(tasks)
+        self.__rows = [rows[slot] if slot < len(rows) else None
+                       for slot in range(GeneralLayoutConsts.page_size)]
+        self.__tags = {tag: True for tag in tags}
+        self.__picked_tags = set(picked_tags)
+        self.__is_completed = is_completed
+        self.__state = state
+        self.__statistics_lines = list(statistics_lines)
+
+    def _need_rebuild_(self, tags: list) -> bool:
+        """Returns True if tags changed too much to update window"""
+        new_tags = sum(1 for tag in tags if tag not in self.__tags)
+        hidden_tags = len(self.__tags) - len(tags) + new_tags
+        threshold = GeneralLayoutConsts.rebuild_threshold
+        return new_tags > threshold or hidden_tags > threshold
+
+    def _update_tasks_(self, tasks: list, is_completed: bool):
+        """Updates slots of tasks page, which rows changed"""
+        rows = LayoutModel.get_task_rows(tasks)
+        keys = GeneralLayoutConsts.Keys
+        for slot in range(GeneralLayoutConsts.page_size):
+            row = rows[slot] if slot < len(rows) else None
+            if row == self.__rows[slot] and \
+                    is_completed == self.__is_completed:
+                continue
+            self.__rows[slot] = row
+            task_row = self.__window[f"{keys.task_row}{slot}"]
+            header = self.__window[f"{keys.task_date}{slot}"]
+            if row is None:
+                task_row.update(visible=False)
+                header.update(visible=False)
+                continue
+            [_, header_text, name, color, difficult_text] = row
+            header.update(value=header_text or "",
+                          visible=header_text is not None)
+            self.__window[f"{keys.checkbox_task}{slot}"].update(
+                value=is_completed, text=name, background_color=color)
+            self.__window[f"{keys.task_difficult}{slot}"].update(
+                value=difficult_text, background_color=color)
+            task_row.update(visible=True)
+
+    def _update_tags_(self, tags: list, picked_tags: list):
+        """Inserts new tags, hides unused ones and updates picked ones"""
+        picked_tags = set(picked_tags)
+        new_rows = []
+        for tag in tags:
+            if tag not in self.__tags:
+                new_rows.append(Layout.get_tag_row(tag, tag in picked_tags))
+            elif not self.__tags[tag]:
+                self.__window[f"{GeneralLayoutConsts.Keys.tag}{tag}"].update(
+                    visible=True)
+        if len(new_rows) > 0:
+            tags_column = self.__window[GeneralLayoutConsts.Keys.tags_column]
+            self.__window.extend_layout(tags_column, new_rows)
+            tags_column.contents_changed()
+        shown_tags = set(tags)
+        for tag in self.__tags:
+            key = f"{GeneralLayoutConsts.Keys.tag}{tag}"
+            if tag not in shown_tags:
+                if self.__tags[tag]:
+                    self.__window[key].update(value=False, visible=False)
+                continue
+            is_picked = tag in picked_tags
+            if is_picked != (tag in self.__picked_tags) or \
+                    not self.__tags[tag]:
+                self.__window[key].update(value=is_picked)
+        self.__tags = {tag: tag in shown_tags
+                       for tag in list(self.__tags) + list(shown_tags)}
+        self.__picked_tags = picked_tags
+
+    def _update_state_(self, is_completed: bool, state: str):
+        """Updates chosen state"""
+        self.__is_completed = is_completed
+        if state == self.__state:
+            return
+        key = GeneralLayoutConsts.Keys.ch_type
+        self.__window[f"{key}{state}"].update(value=True)
+        self.__state = state
+
+    def _update_pages_(self, offset: int, count: int):
+        """Updates number of page and pages buttons"""
+        [text, prev_disabled, next_disabled] = \
+            LayoutModel.get_pages_state(offset, count)
+        self.__window[GeneralLayoutConsts.Keys.page_text].update(value=text)
+        self.__window[GeneralLayoutConsts.Keys.prev_page].update(
+            disabled=prev_disabled)
+        self.__window[GeneralLayoutConsts.Keys.next_page].update(
+            disabled=next_disabled)
+
+    def _update_statistics_(self, statistics_lines: list):
+        """Updates changed lines of statistics panel"""
+        key = GeneralLayoutConsts.Keys.statistics
+        for line, text in enumerate(statistics_lines):
+            if line < len(self.__statistics_lines) and \
+                    text == self.__statistics_lines[line]:
+                continue
+            self.__window[f"{key}{line}"].update(value=text)
+        self.__statistics_lines = list(statistics_lines)
+
+    def show(self, tasks: list, tags: list, picked_tags: list,
+             is_completed: bool, offset: int, count: int, state=None,
+             query="", statistics_lines=None):
+        """Shows page of tasks of section, that starts from offset position.
+        tasks - list of tasks of page,
+        tags - list of all tags,
+        picked_tags - list of tags of section,
+        is_completed - is section completed,
+        count - number of all tasks of section,
+        state - state of section (see StateConsts),
+        query - text of search box, it is kept if window is rebuilt,
+        statistics_lines - lines of statistics panel (see
+        LayoutModel.get_statistics_lines)"""
+        state = LayoutModel.get_state(is_completed, state)
+        statistics_lines = statistics_lines or []
+        if self.__window is None or self._need_rebuild_(tags):
+            self._build_(tasks, tags, picked_tags, is_completed, offset,
+                         count, state, query, statistics_lines)
+            return
+        self._update_tasks_(tasks, is_completed)
+        self._update_tags_(tags, picked_tags)
+        self._update_state_(is_completed, state)
+        self._update_pages_(offset, count)
+        self._update_statistics_(statistics_lines)
+
+    def invalidate_slot(self, slot: int):
+        """Marks slot as changed, so it will be updated by next show even if
+        its task is the same (for example after click on its checkbox)"""
+        self.__rows[slot] = tuple()
+
+    def get_task_id(self, slot: int) -> int:
+        """Returns id of task shown in slot"""
+        return self.__rows[slot][0]
+
+    def read(self, timeout=None) -> tuple:
+        """Returns event and values of window, if timeout (in milliseconds)
+        is given and passed without events, event is Sg.TIMEOUT_KEY"""
+        return self.__window.read(timeout=timeout)
+
+    def close(self):
+        """Closes window if it is shown"""
+        if self.__window is not None:
+            self.__window.close()
+            self.__window = None
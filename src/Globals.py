@@ -4,6 +4,8 @@ import os.path
 
 class TaskConsts:
     """All constants for Tasks"""
+    attributes = ("id", "name", "date", "tags", "priority", "difficult")
+    date_cache_size = 4096
 
     class Ranges:
         """Ranges of attributes values"""
@@ -34,19 +36,192 @@ class PathConsts:
                                      following_tasks_name)
     path_to_completed = os.path.join(path_to_completed_dir,
                                      completed_tasks_name)
+    following_columns_name = "FollowingTasks.columns"
+    completed_columns_name = "CompletedTasks.columns"
+    path_to_following_columns = os.path.join(path_to_following_dir,
+                                             following_columns_name)
+    path_to_completed_columns = os.path.join(path_to_completed_dir,
+                                             completed_columns_name)
     path_to_config = os.path.join(path_to_config_dir, config_name)
+    path_to_database_dir = "data"
+    database_name = "Tasks.sqlite3"
+    path_to_database = os.path.join(path_to_database_dir, database_name)
+    lock_name = "Data.lock"
+    path_to_lock = os.path.join(path_to_config_dir, lock_name)
+    archive_name = "Completed"
+    path_to_archive = os.path.join(path_to_completed_dir, archive_name)
+    manifest_name = "Manifest.json"
+    archive_extension = ".json"
+    compressed_extension = ".gz"
+    journal_extension = ".journal"
+    temp_extension = ".tmp"
+
+
+class StorageConsts:
+    """All constants for storage of tasks"""
+    json_storage = "json"
+    sqlite_storage = "sqlite"
+    default_storage = json_storage
+    json_snapshot = "json"
+    columnar_snapshot = "columnar"
+    default_snapshot = json_snapshot
+    journal_mode = True
+    compaction_size = 1024 * 1024
+    compaction_ratio = 1.0
+    compaction_growth = 0.25
+    compaction_min_records = 100
+    filter_scan_ratio = 8
+    sorted_insert_limit = 16
+    max_retries = 10
+    retry_delay = 0.005
+    archive = False
+    month_period = "month"
+    year_period = "year"
+    archive_period = month_period
+    archive_compression = True
+    cold_days = 92
+    compression_level = 6
+    name_filter_bits = 16
+    name_filter_hashes = 3
+    section_cache_tasks = 20000
+    section_cache_sections = 64
+
+
+class StateConsts:
+    """All constants for states of sections"""
+    following = "following"
+    completed = "completed"
+    overdue = "overdue"
+    due_soon = "due_soon"
+    states = (following, completed, overdue, due_soon)
+    titles = {following: "Following", completed: "Completed",
+              overdue: "Overdue", due_soon: "Due soon"}
+    due_days = 7
+
+
+class SearchConsts:
+    """All constants for search of tasks by name and tags"""
+    gram_size = 3
+    end_mark = "\0"
+    limit = 100
+    name_prefix_rank = 0
+    name_rank = 1
+    tag_prefix_rank = 2
+    tag_rank = 3
+
+
+class InstrumentationConsts:
+    """All constants for instrumentation of application"""
+    env_variable = "TASK_MANAGER_INSTRUMENTATION"
+    config_key = "instrumentation"
+    profile_env_variable = "TASK_MANAGER_PROFILE_EVENT"
+    path_to_profile_dir = "data"
+    profile_name = "Profile.pstats"
+    path_to_profile = os.path.join(path_to_profile_dir, profile_name)
+    profile_lines = 30
+    background_operation = "(background)"
+
+
+class ServerConsts:
+    """All constants for local server of tasks"""
+    host = "127.0.0.1"
+    port = 8765
+    coalesce_delay = 0.002
+    poll_timeout = 30.0
+    max_poll_timeout = 300.0
+    changes_history = 1000
+    max_body_size = 16 * 1024 * 1024
+
+
+class PersistenceConsts:
+    """All constants for background writing of changes"""
+    coalesce_delay = 0.05
+    reserved_ids = 1000
+    prefetch_ids = 500
+    errors_poll_timeout = 500
+
+
+class PlannerConsts:
+    """All constants for planning of tasks to do next"""
+    budget = 10
+    limit = 10
+    horizon = 7
+    priority_weights = {1: 3.0, 2: 2.0, 3: 1.0}
+    min_score = 0.5
+    page_size = 1000
+    max_page_size = 64000
+
+
+class TransferConsts:
+    """All constants for import and export of tasks"""
+    jsonl_format = "jsonl"
+    csv_format = "csv"
+    ics_format = "ics"
+    formats = (jsonl_format, csv_format, ics_format)
+    extensions = {".jsonl": jsonl_format, ".ndjson": jsonl_format,
+                  ".csv": csv_format, ".ics": ics_format}
+    chunk_size = 10000
+    fields = ("id", "name", "date", "tags", "priority", "difficult",
+              "completed")
+    required_fields = ("name", "date")
+    true_values = ("1", "true", "yes")
+    ics_line_length = 75
+    ics_product = "-//task_manager//EN"
+    ics_uid_domain = "task-manager"
+    ics_difficult = "X-DIFFICULT"
+    ics_completed = "COMPLETED"
+    ics_following = "NEEDS-ACTION"
+    ics_priorities = {1: 1, 2: 5, 3: 9}
+    ics_priority_levels = {1: range(1, 5), 2: range(5, 6), 3: range(6, 10)}
+
+
+class ConsoleConsts:
+    """All constants for command line shell"""
+    gui = "gui"
+    add = "add"
+    list = "list"
+    check = "check"
+    uncheck = "uncheck"
+    delete = "delete"
+    tags = "tags"
+    search = "search"
+    serve = "serve"
+    import_tasks = "import"
+    export_tasks = "export"
+    statistics = "stats"
+    plan = "plan"
+
+
+class ResultConsts:
+    """All constants for results of batch operations with tasks"""
+    created = "created"
+    duplicate = "duplicate"
+    invalid = "invalid"
+    done = "done"
+    not_found = "not_found"
 
 
 class MessageConsts:
     """All constants for messages to user"""
     already_exist_text = "A task with the same name already exists. If you " \
                          "still want to add a task click \"Add\" again"
+    already_exist_console_text = "A task with the same name already " \
+                                 "exists, use --force to add it anyway"
     wrong_date_text = "Wrong date, change it"
     not_digits_fields_text = "The following fields must be filled with " \
                              "numbers: "
     empty_fields_text = "The following fields must not be empty: "
     wrong_range_fields_text = "the values of the following fields are not in " \
                               "the valid range: "
+    write_failed_text = "Changes could not be saved, tasks are read from " \
+                        "disk again: "
+    missing_fields_text = "Task must contain the following fields: "
+    wrong_row_text = "Row is not a task: "
+    wrong_budget_text = "Budget must be a non-negative integer"
+    wrong_limit_text = "Limit must be a non-negative integer"
+    wrong_attributes_text = "Task attributes must contain the following " \
+                            "fields: id, name, date, tags, priority, " \
+                            "difficult"
 
 
 class GeneralLayoutConsts:
@@ -64,16 +239,34 @@ class GeneralLayoutConsts:
         ch_following = "change_following"
         ch_completed = "change_completed"
         delete_task = "delete_task_"
+        prev_page = "prev_page"
+        next_page = "next_page"
+        page_date = "page_date"
+        go_to_date = "go_to_date"
+        page_text = "page_text"
+        search = "search"
+        tags_column = "tags_column"
+        task_date = "task_date_"
+        task_row = "task_row_"
+        task_difficult = "task_difficult_"
+        statistics = "statistics_"
+        plan = "plan_day"
 
     class Sizes:
         """All sizes of elements of general layout"""
         tag = (14, 1)
         task = (30, 1)
-        state_column = (200, 100)
+        state_column = (200, 120)
         tags_column = (200, 500)
         tasks_column = (1000, 600)
         difficult = (15, 1)
+        page_date = (10, 1)
+        search = (40, 1)
+        statistics = (28, 1)
 
+    page_size = 100
+    statistics_lines = 5
+    rebuild_threshold = 20
     colors_by_priority = ["#DF3838", "#DA8686", "#A7C1B4"]
 
 
@@ -96,3 +289,20 @@ class TaskLayoutConsts:
         task_name = (20, 1)
         tags = (20, 5)
         date = (10, 1)
+
+
+class PlanLayoutConsts:
+    """All constants for plan layout of application"""
+
+    class Keys:
+        """All keys to events and values of plan layout"""
+        budget = "budget"
+        plan = "Plan"
+        close = "Close"
+        message = "message"
+
+    class Sizes:
+        """All sizes of elements of plan layout"""
+        budget = (5, 1)
+        task = (40, 1)
+        explanation = (90, 1)
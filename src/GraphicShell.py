@@ -1,17 +1,39 @@
 import PySimpleGUI as Sg
 
-from Globals import MessageConsts, GeneralLayoutConsts, TaskLayoutConsts
+from GeneralWindow import GeneralWindow
+from Globals import MessageConsts, GeneralLayoutConsts, \
+    PersistenceConsts, PlanLayoutConsts, PlannerConsts, StateConsts, \
+    TaskLayoutConsts
+from Instrumentation import Instrumentation
 from Layout import Layout
+from LayoutModel import LayoutModel
 from Task import Task
 from TaskManager import TaskManager
 
 
 class GraphicShell:
-    """Graphic shell for TaskManager engine
-    manager: TaskManager - engine of application"""
+    """Graphic shell for TaskManager engine. Changes are persisted by
+    background writer of TaskManager, so event loop doesn't wait for disk,
+    errors of writing are shown when they happen
+    manager: TaskManager - engine of application,
+    offset: int - position of the first task of shown page,
+    query: str - text of search box, if it isn't empty found tasks of
+    current section are shown instead of page,
+    general_window: GeneralWindow - long-lived general window,
+    statistics_key: tuple - versions of storages and dates of tasks due
+    soon, for which lines of statistics panel were computed,
+    statistics_lines: list - lines of statistics panel"""
 
     def __init__(self):
         self.__manager = TaskManager()
+        self.__manager.start_background_writes()
+        self.__offset = 0
+        self.__query = ""
+        self.__general_window = GeneralWindow()
+        self.__statistics_key = None
+        self.__statistics_lines = []
+        Instrumentation.instrument([Layout, LayoutModel, GeneralWindow],
+                                   exclude=("GeneralWindow.read",))
         Sg.theme("GreenMono")
 
     @property
@@ -21,10 +43,16 @@ class GraphicShell:
         return self.__manager.is_completed
 
     @staticmethod
-    def get_id(key: str, event: str):
-        """Return task or tag id by key of event and event"""
-        id_start = len(key)
-        return int(event[id_start:])
+    def get_slot(key: str, event: str) -> int:
+        """Return slot of tasks page by key of event and event"""
+        slot_start = len(key)
+        return int(event[slot_start:])
+
+    def get_id(self, key: str, event: str) -> int:
+        """Return id of task shown in slot of tasks page by key of event and
+        event"""
+        slot = self.get_slot(key, event)
+        return self.__general_window.get_task_id(slot)
 
     def task_window(self, title: str, layout: list,
                     task_id: int | None) -> bool:
@@ -54,9 +82,13 @@ class GraphicShell:
                     window["message"].update(message)
                     in_any_case = False
                     continue
-                done = self.__manager.add_task(task_attributes,
-                                               is_completed=self._is_completed_,
-                                               in_any_case=in_any_case)
+                if task_id is None:
+                    done = self.__manager.add_task(
+                        task_attributes, is_completed=self._is_completed_,
+                        in_any_case=in_any_case)
+                else:
+                    done = self.__manager.change_task(task_id, task_attributes,
+                                                      in_any_case=in_any_case)
                 if not done:
                     window["message"].update(MessageConsts.already_exist_text)
                     in_any_case = True
@@ -80,27 +112,75 @@ class GraphicShell:
         """Draws change task window and handling user input"""
         task_id = self.get_id(GeneralLayoutConsts.Keys.ch_task, event)
         task = self.__manager.get_task_by_id(task_id)
-        self.__manager.delete_task_by_id(task_id)
         layout = Layout.get_change_task_layout(task)
-        is_ok = self.task_window("Change task", layout, task_id)
-        if not is_ok:
-            self.__manager.add_task(task.get_attributes(),
-                                    is_completed=self._is_completed_,
-                                    in_any_case=True)
-
-    def get_general_window(self) -> Sg.Window:
-        """Returns general window by current section"""
-        tasks = self.__manager.get_tasks()
+        self.task_window("Change task", layout, task_id)
+
+    def plan_window(self):
+        """Draws the window of plan of following tasks of current section to
+        do next and handling changes of budget, every change plans tasks
+        again"""
+        budget = PlannerConsts.budget
+        message = ""
+        while True:
+            picks = self.__manager.plan_tasks(
+                budget, PlannerConsts.limit,
+                self.__manager.get_section_tags())
+            layout = Layout.get_plan_layout(LayoutModel.get_plan_rows(picks),
+                                            budget, message)
+            window = Sg.Window("Plan day", layout)
+            event, values = window.read()
+            window.close()
+            if event != PlanLayoutConsts.Keys.plan:
+                break
+            budget_text = values[PlanLayoutConsts.Keys.budget].strip()
+            message = ""
+            if budget_text.isdigit():
+                budget = int(budget_text)
+            else:
+                message = MessageConsts.wrong_budget_text
+
+    def get_statistics_lines(self) -> list:
+        """Returns lines of statistics panel by statistics of all tasks and
+        of tasks due soon. Statistics of all tasks is kept by storages, so
+        it is summed from counters of days without reading tasks. Lines are
+        computed again only if tasks or today are changed, so events, that
+        don't change tasks (typing of search query), don't compute them"""
+        [first_ordinal, last_ordinal] = \
+            self.__manager.get_state_dates(StateConsts.due_soon)
+        key = (self.__manager.storage_versions, first_ordinal, last_ordinal)
+        if key != self.__statistics_key:
+            soon_statistics = self.__manager.get_statistics(
+                Task.format_date(first_ordinal),
+                Task.format_date(last_ordinal))
+            self.__statistics_lines = LayoutModel.get_statistics_lines(
+                self.__manager.get_statistics(), soon_statistics)
+            self.__statistics_key = key
+        return self.__statistics_lines
+
+    def show_general_window(self):
+        """Shows current page of current section in general window"""
+        page_size = GeneralLayoutConsts.page_size
+        if self.__query.strip() != "":
+            self.__offset = 0
+            tasks = self.__manager.search_tasks(self.__query, page_size)
+            count = len(tasks)
+        else:
+            count = self.__manager.count_tasks()
+            if self.__offset >= count:
+                self.__offset = max(count - 1, 0) // page_size * page_size
+            tasks = self.__manager.get_tasks(self.__offset, page_size)
         tags = self.__manager.tags
         picked_tags = self.__manager.get_section_tags()
-        layout = Layout.get_general_layout(tasks, tags, picked_tags,
-                                           self._is_completed_)
-        window = Sg.Window("Task manager", layout)
-        return window
+        self.__general_window.show(tasks, tags, picked_tags,
+                                   self._is_completed_, self.__offset, count,
+                                   self.__manager.state, self.__query,
+                                   self.get_statistics_lines())
 
     def update_task(self, event: str):
         """Checks or unchecks task by event depends on current section state"""
         task_id = self.get_id(GeneralLayoutConsts.Keys.checkbox_task, event)
+        slot = self.get_slot(GeneralLayoutConsts.Keys.checkbox_task, event)
+        self.__general_window.invalidate_slot(slot)
         if self._is_completed_:
             self.__manager.uncheck(task_id)
         else:
@@ -114,40 +194,101 @@ class GraphicShell:
                                    values.items())
         chosen_tags = list(map(lambda item: item[0][tag_start:],
                                chosen_tags_items))
-        self.__manager.change_section_tags(chosen_tags, self._is_completed_)
+        self.__manager.change_section_state(chosen_tags, self.__manager.state)
+        self.__offset = 0
 
     def change_type(self, event):
-        """Change current section type to opposite"""
+        """Change current section state to chosen one: following, completed,
+        overdue or due soon"""
         type_start = len(GeneralLayoutConsts.Keys.ch_type)
-        is_completed = event[type_start:] == "completed"
+        state = event[type_start:]
+        if state == self.__manager.state:
+            return
         tags = self.__manager.get_section_tags()
-        self.__manager.change_section_tags(tags, is_completed)
+        self.__manager.change_section_state(tags, state)
+        self.__offset = 0
 
     def clear_tags(self):
         """Uncheck all chosen tags"""
-        self.__manager.change_section_tags([], self._is_completed_)
+        self.__manager.change_section_state([], self.__manager.state)
+        self.__offset = 0
+
+    def change_page(self, event: str):
+        """Shows previous or next page of tasks by event"""
+        page_size = GeneralLayoutConsts.page_size
+        if event == GeneralLayoutConsts.Keys.prev_page:
+            self.__offset = max(self.__offset - page_size, 0)
+        else:
+            self.__offset += page_size
+
+    def go_to_date(self, values: dict):
+        """Shows page of tasks with the first task with chosen date or
+        later"""
+        date_str = values[GeneralLayoutConsts.Keys.page_date]
+        try:
+            position = self.__manager.get_date_position(date_str)
+        except ValueError:
+            Sg.popup_error(MessageConsts.wrong_date_text)
+            return
+        page_size = GeneralLayoutConsts.page_size
+        self.__offset = position // page_size * page_size
+
+    def search(self, values: dict):
+        """Changes text of search, found tasks are shown instead of page"""
+        self.__query = values[GeneralLayoutConsts.Keys.search]
+        self.__offset = 0
+
+    def handle_event(self, event: str, values: dict):
+        """Handles event of the general window and shows updated window"""
+        if event == GeneralLayoutConsts.Keys.search:
+            self.search(values)
+        elif GeneralLayoutConsts.Keys.checkbox_task in event:
+            self.update_task(event)
+        elif event == GeneralLayoutConsts.Keys.add_task:
+            self.add_task()
+        elif event == GeneralLayoutConsts.Keys.plan:
+            self.plan_window()
+        elif GeneralLayoutConsts.Keys.ch_tags in event:
+            self.change_tags(values)
+        elif GeneralLayoutConsts.Keys.ch_type in event:
+            self.change_type(event)
+        elif GeneralLayoutConsts.Keys.ch_task in event:
+            self.change_task(event)
+        elif GeneralLayoutConsts.Keys.delete_task in event:
+            self.delete_task(event)
+        elif GeneralLayoutConsts.Keys.clear_tags in event:
+            self.clear_tags()
+        elif event in (GeneralLayoutConsts.Keys.prev_page,
+                       GeneralLayoutConsts.Keys.next_page):
+            self.change_page(event)
+        elif event == GeneralLayoutConsts.Keys.go_to_date:
+            self.go_to_date(values)
+        self.show_general_window()
+
+    def report_write_errors(self) -> bool:
+        """Shows errors of background writing of changes. Returns True if
+        there were errors"""
+        errors = self.__manager.take_write_errors()
+        for error in errors:
+            Sg.popup_error(MessageConsts.write_failed_text + str(error))
+        return len(errors) != 0
 
     def general(self):
-        """handles user requests to the general window"""
-        window = self.get_general_window()
+        """handles user requests to the general window. Window is read with
+        timeout, so errors of writing are shown without user events. All
+        changes are written before exit"""
+        self.show_general_window()
         while True:
-            event, values = window.read()
+            event, values = self.__general_window.read(
+                PersistenceConsts.errors_poll_timeout)
             if event in (None, "Exit", "Cancel"):
                 break
-            elif GeneralLayoutConsts.Keys.checkbox_task in event:
-                self.update_task(event)
-            elif event == GeneralLayoutConsts.Keys.add_task:
-                self.add_task()
-            elif GeneralLayoutConsts.Keys.ch_tags in event:
-                self.change_tags(values)
-            elif GeneralLayoutConsts.Keys.ch_type in event:
-                self.change_type(event)
-            elif GeneralLayoutConsts.Keys.ch_task in event:
-                self.change_task(event)
-            elif GeneralLayoutConsts.Keys.delete_task in event:
-                self.delete_task(event)
-            elif GeneralLayoutConsts.Keys.clear_tags in event:
-                self.clear_tags()
-            window.close()
-            window = self.get_general_window()
-        window.close()
+            if event != Sg.TIMEOUT_KEY:
+                with Instrumentation.profile(event):
+                    self.handle_event(event, values)
+            if self.report_write_errors():
+                self.show_general_window()
+        self.__general_window.close()
+        self.__manager.flush()
+        self.report_write_errors()
+        self.__manager.close()
@@ -0,0 +1,318 @@
+import atexit
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager, nullcontext
+
+from Globals import InstrumentationConsts
+
+
+class OperationStats:
+    """Statistics of one instrumented operation.
+    calls: int - number of calls,
+    total_time: float - cumulative time of calls in seconds,
+    max_time: float - max time of one call in seconds,
+    bytes_read: int - bytes read from files during calls,
+    bytes_written: int - bytes written to files during calls,
+    opens: int - number of opened files during calls"""
+
+    __slots__ = ("calls", "total_time", "max_time", "bytes_read",
+                 "bytes_written", "opens")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.opens = 0
+
+    def get_attributes(self) -> dict:
+        """Returns statistics as dict"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class CountingFile:
+    """Wrapper of file opened by Instrumentation.open, that counts read and
+    written data for operations, during which it is used. Data of text files
+    is counted in characters.
+    file: file object - wrapped file"""
+
+    def __init__(self, file):
+        self.__file = file
+
+    def read(self, *arguments):
+        data = self.__file.read(*arguments)
+        Instrumentation.count_io(read=len(data))
+        return data
+
+    def readinto(self, buffer):
+        size = self.__file.readinto(buffer)
+        Instrumentation.count_io(read=size or 0)
+        return size
+
+    def readline(self, *arguments):
+        data = self.__file.readline(*arguments)
+        Instrumentation.count_io(read=len(data))
+        return data
+
+    def readlines(self, *arguments):
+        lines = self.__file.readlines(*arguments)
+        Instrumentation.count_io(read=sum(map(len, lines)))
+        return lines
+
+    def write(self, data):
+        Instrumentation.count_io(written=len(data))
+        return self.__file.write(data)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self.__file)
+        Instrumentation.count_io(read=len(line))
+        return line
+
+    def __enter__(self):
+        self.__file.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.__file.__exit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self.__file, name)
+
+
+class Instrumentation:
+    """Opt-in instrumentation of application. It is enabled by environment
+    variable or key of config file. When it is enabled public methods of
+    instrumented classes are replaced by wrappers, that record time of calls,
+    and files of application opened by Instrumentation.open are wrapped by
+    CountingFile, that records input/output of current operations. Builtin
+    open isn't replaced, so files of libraries are not affected. Summary is
+    printed to stderr at exit. When it is disabled nothing is replaced, so
+    there is no overhead.
+    enabled: bool - is instrumentation enabled,
+    stats: dict - name of operation -> OperationStats,
+    instrumented: set - already instrumented classes,
+    local: threading.local - stack of current operations of each thread,
+    lock: threading.Lock - lock of all counters of statistics,
+    profiled: bool - was GUI event already profiled"""
+
+    enabled = False
+    stats = dict()
+    instrumented = set()
+    local = threading.local()
+    lock = threading.Lock()
+    profiled = False
+
+    @staticmethod
+    def is_requested(config: dict) -> bool:
+        """Returns True if instrumentation is enabled by environment variable
+        or config"""
+        variable = os.environ.get(InstrumentationConsts.env_variable, "")
+        if variable not in ("", "0"):
+            return True
+        return bool(config.get(InstrumentationConsts.config_key, False))
+
+    @staticmethod
+    def enable():
+        """Enables counting of input/output and printing of summary at
+        exit"""
+        if Instrumentation.enabled:
+            return
+        Instrumentation.enabled = True
+        atexit.register(Instrumentation.print_summary)
+
+    @staticmethod
+    def instrument(classes: list, exclude=tuple()):
+        """Replaces public methods and properties of classes by wrappers, that
+        record their calls. Operations from exclude (for example waiting of
+        user input) are not replaced. Does nothing if instrumentation is
+        disabled"""
+        if not Instrumentation.enabled:
+            return
+        for cls in classes:
+            if cls in Instrumentation.instrumented:
+                continue
+            Instrumentation.instrumented.add(cls)
+            for name, attribute in list(vars(cls).items()):
+                operation = f"{cls.__name__}.{name}"
+                if name.startswith('_') or operation in exclude:
+                    continue
+                wrapper = Instrumentation._wrap_attribute_(attribute,
+                                                           operation)
+                if wrapper is not None:
+                    setattr(cls, name, wrapper)
+
+    @staticmethod
+    def _wrap_attribute_(attribute, name: str):
+        """Returns wrapper of method, static method or property, that records
+        its calls as operation with name, or None for other attributes.
+        Method, that returns context manager made by contextmanager, records
+        time from entering to exiting of context instead of its call"""
+        if inspect.isgeneratorfunction(getattr(attribute, "__wrapped__",
+                                               None)):
+            return Instrumentation._wrap_context_(attribute, name)
+        if isinstance(attribute, staticmethod):
+            return staticmethod(Instrumentation._wrap_(attribute.__func__,
+                                                       name))
+        if isinstance(attribute, property):
+            return property(Instrumentation._wrap_(attribute.fget, name),
+                            attribute.fset, attribute.fdel, attribute.__doc__)
+        if isinstance(attribute, types.FunctionType):
+            return Instrumentation._wrap_(attribute, name)
+        return None
+
+    @staticmethod
+    def _get_stack_() -> list:
+        """Returns stack of current operations of this thread"""
+        stack = getattr(Instrumentation.local, "stack", None)
+        if stack is None:
+            stack = Instrumentation.local.stack = []
+        return stack
+
+    @staticmethod
+    def _start_(stats: OperationStats) -> float:
+        """Makes operation by stats current in this thread, returns start
+        time of its call"""
+        Instrumentation._get_stack_().append(stats)
+        return time.perf_counter()
+
+    @staticmethod
+    def _finish_(stats: OperationStats, start: float):
+        """Records call of current operation by stats, that was started at
+        start time. Time of recursive calls is counted once"""
+        duration = time.perf_counter() - start
+        stack = Instrumentation._get_stack_()
+        stack.pop()
+        with Instrumentation.lock:
+            stats.calls += 1
+            if stats not in stack:
+                stats.total_time += duration
+                stats.max_time = max(stats.max_time, duration)
+
+    @staticmethod
+    def _wrap_(function, name: str):
+        """Returns wrapper of function, that records its calls as operation
+        with name"""
+        stats = Instrumentation.stats.setdefault(name, OperationStats())
+
+        @functools.wraps(function)
+        def wrapper(*arguments, **keywords):
+            start = Instrumentation._start_(stats)
+            try:
+                return function(*arguments, **keywords)
+            finally:
+                Instrumentation._finish_(stats, start)
+
+        return wrapper
+
+    @staticmethod
+    def _wrap_context_(function, name: str):
+        """Returns wrapper of function, that returns context manager. It
+        records time of the whole context (entering, body and exiting) as
+        operation with name"""
+        stats = Instrumentation.stats.setdefault(name, OperationStats())
+
+        @functools.wraps(function)
+        @contextmanager
+        def wrapper(*arguments, **keywords):
+            start = Instrumentation._start_(stats)
+            try:
+                with function(*arguments, **keywords) as value:
+                    yield value
+            finally:
+                Instrumentation._finish_(stats, start)
+
+        return wrapper
+
+    @staticmethod
+    def _get_current_stats_() -> set:
+        """Returns statistics of all current operations of this thread or
+        of background operation if there are no them"""
+        stack = Instrumentation._get_stack_()
+        if len(stack) == 0:
+            name = InstrumentationConsts.background_operation
+            return {Instrumentation.stats.setdefault(name, OperationStats())}
+        return set(stack)
+
+    @staticmethod
+    def open(*arguments, **keywords):
+        """Opens file of application by builtin open. If instrumentation is
+        enabled, file is counted as opened and wrapped by CountingFile"""
+        file = open(*arguments, **keywords)
+        if not Instrumentation.enabled:
+            return file
+        with Instrumentation.lock:
+            for stats in Instrumentation._get_current_stats_():
+                stats.opens += 1
+        return CountingFile(file)
+
+    @staticmethod
+    def count_io(read=0, written=0):
+        """Adds read and written data to all current operations"""
+        with Instrumentation.lock:
+            for stats in Instrumentation._get_current_stats_():
+                stats.bytes_read += read
+                stats.bytes_written += written
+
+    @staticmethod
+    def get_summary() -> dict:
+        """Returns statistics of all called operations"""
+        return {name: stats.get_attributes()
+                for name, stats in Instrumentation.stats.items()
+                if stats.calls > 0 or stats.opens > 0}
+
+    @staticmethod
+    def print_summary():
+        """Prints statistics of all called operations ordered by cumulative
+        time to stderr"""
+        summary = Instrumentation.get_summary()
+        lines = [f"{'operation':<40} {'calls':>8} {'total ms':>10} "
+                 f"{'max ms':>9} {'read':>11} {'written':>11} {'opens':>6}"]
+        for name, stats in sorted(summary.items(),
+                                  key=lambda item: -item[1]["total_time"]):
+            lines.append(f"{name:<40} {stats['calls']:>8} "
+                         f"{stats['total_time'] * 1e3:>10.1f} "
+                         f"{stats['max_time'] * 1e3:>9.2f} "
+                         f"{stats['bytes_read']:>11} "
+                         f"{stats['bytes_written']:>11} "
+                         f"{stats['opens']:>6}")
+        print('\n'.join(lines), file=sys.stderr)
+
+    @staticmethod
+    def profile(event: str):
+        """Returns context manager, that captures cProfile of handling of the
+        first event, that starts with value of profile environment variable.
+        Profile is saved to data directory and its top is printed to
+        stderr"""
+        key = os.environ.get(InstrumentationConsts.profile_env_variable)
+        if Instrumentation.profiled or not key or \
+                not isinstance(event, str) or not event.startswith(key):
+            return nullcontext()
+        Instrumentation.profiled = True
+        return Instrumentation._profile_()
+
+    @staticmethod
+    @contextmanager
+    def _profile_():
+        """Context manager, that captures cProfile of its body. Profiler is
+        imported only here, so it doesn't slow down start of application"""
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            profiler.dump_stats(InstrumentationConsts.path_to_profile)
+            stats = pstats.Stats(profiler, stream=sys.stderr)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE)
+            stats.print_stats(InstrumentationConsts.profile_lines)
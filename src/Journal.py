@@ -0,0 +1,98 @@
+import json
+import os
+import os.path
+
+from Files import Files
+from Instrumentation import Instrumentation
+
+
+class Journal:
+    """Journal is an append-only log of operations with tasks of one file
+    with tasks. Each line of the journal is one json record:
+    {"op": "add", "task": task_attributes} or {"op": "delete", "id": task_id}
+    or {"op": "batch", "records": records} for several records, that must be
+    applied all together.
+    path: string - path to journal file
+    """
+
+    add_operation = "add"
+    delete_operation = "delete"
+    batch_operation = "batch"
+
+    def __init__(self, path: str):
+        """Creates Journal object by path to journal file"""
+        self.__path = path
+
+    @staticmethod
+    def make_add_record(task_attributes: dict) -> dict:
+        """Returns record about adding of task with task_attributes"""
+        return {"op": Journal.add_operation, "task": task_attributes}
+
+    @staticmethod
+    def make_delete_record(task_id: int) -> dict:
+        """Returns record about deletion of task by id"""
+        return {"op": Journal.delete_operation, "id": task_id}
+
+    def append(self, records: list):
+        """Appends records to the end of journal by one write and flushes it
+        to disk. Several records are written as one batch record, so after
+        crash either all of them or none are in journal"""
+        if len(records) == 1:
+            record = records[0]
+        else:
+            record = {"op": self.batch_operation, "records": records}
+        with Instrumentation.open(self.__path, 'a',
+                                  encoding="UTF-8") as file:
+            file.write(json.dumps(record) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+
+    def read(self, offset=0) -> list:
+        """Returns all records of journal, that start from offset byte. Not
+        finished last record (after crash during writing) is ignored"""
+        if not os.path.exists(self.__path):
+            return []
+        with Instrumentation.open(self.__path, 'rb') as file:
+            file.seek(offset)
+            data = file.read()
+        records = []
+        for line in data.split(b'\n'):
+            if len(line) == 0:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+        return records
+
+    def read_tail(self, offset: int) -> bytes:
+        """Returns raw content of journal after offset byte"""
+        if not os.path.exists(self.__path):
+            return b""
+        with Instrumentation.open(self.__path, 'rb') as file:
+            file.seek(offset)
+            return file.read()
+
+    def replace(self, content: bytes):
+        """Atomically replaces content of journal by content"""
+        Files.write_atomic(self.__path, content)
+
+    @property
+    def size(self) -> int:
+        """Returns size of journal in bytes"""
+        if not os.path.exists(self.__path):
+            return 0
+        return os.path.getsize(self.__path)
+
+    @property
+    def signature(self) -> tuple | None:
+        """Returns modification time and size of journal file or None if it
+        doesn't exist"""
+        if not os.path.exists(self.__path):
+            return None
+        stat = os.stat(self.__path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @property
+    def path(self) -> str:
+        return self.__path
@@ -1,6 +1,8 @@
 import PySimpleGUI as Sg
 
-from Globals import GeneralLayoutConsts, TaskLayoutConsts, TaskConsts
+from Globals import GeneralLayoutConsts, PlanLayoutConsts, StateConsts, \
+    TaskLayoutConsts, TaskConsts
+from LayoutModel import LayoutModel
 from Task import Task
 
 
@@ -65,21 +67,43 @@ class Layout:
         return Layout._get_task_layout_(task, edition_type)
 
     @staticmethod
-    def _get_states_frame_(is_completed: bool) -> Sg.Frame:
-        """Returns frame with available states and already chosen state/
-        is_completed == True is current section state is completed otherwise
-        False"""
-        states_layout = [[Sg.Radio("Following", "State",
-                                   default=not is_completed,
-                                   size=GeneralLayoutConsts.Sizes.tag,
-                                   key=f"{GeneralLayoutConsts.Keys.ch_type}"
-                                       f"following",
-                                   enable_events=is_completed)],
-                         [Sg.Radio("Completed", "State", default=is_completed,
+    def get_plan_layout(rows: list, budget: int, message="") -> list:
+        """Returns layout of plan of tasks to do next with budget of day,
+        that can be changed to plan again.
+        rows - rows of picked tasks (see LayoutModel.get_plan_rows),
+        message - text of error of budget"""
+        budget_row = [Sg.Text("Budget: "),
+                      Sg.InputText(key=PlanLayoutConsts.Keys.budget,
+                                   default_text=str(budget),
+                                   size=PlanLayoutConsts.Sizes.budget),
+                      Sg.Button(button_text="Plan",
+                                key=PlanLayoutConsts.Keys.plan)]
+        plan_layout = [budget_row]
+        for text, color, explanation in rows:
+            plan_layout.append([Sg.Text(text, background_color=color,
+                                        size=PlanLayoutConsts.Sizes.task),
+                                Sg.Text(explanation,
+                                        size=PlanLayoutConsts.Sizes
+                                        .explanation)])
+        if len(rows) == 0:
+            plan_layout.append([Sg.Text("No following tasks fit to budget")])
+        plan_layout.append([Sg.Text(message,
+                                    key=PlanLayoutConsts.Keys.message)])
+        plan_layout.append([Sg.Button(button_text="Close",
+                                      key=PlanLayoutConsts.Keys.close)])
+        return plan_layout
+
+    @staticmethod
+    def _get_states_frame_(state: str) -> Sg.Frame:
+        """Returns frame with available states and already chosen state
+        (see StateConsts)"""
+        states_layout = [[Sg.Radio(StateConsts.titles[section_state], "State",
+                                   default=section_state == state,
                                    size=GeneralLayoutConsts.Sizes.tag,
                                    key=f"{GeneralLayoutConsts.Keys.ch_type}"
-                                       f"completed",
-                                   enable_events=not is_completed)]]
+                                       f"{section_state}",
+                                   enable_events=True)]
+                         for section_state in StateConsts.states]
         states_column = Sg.Column(states_layout,
                                   size=GeneralLayoutConsts.Sizes.state_column,
                                   justification="left")
@@ -88,20 +112,24 @@ class Layout:
         return states_frame
 
     @staticmethod
-    def _get_tags_frame_(tags: list, picked_tags: list) -> Sg.Frame:
+    def get_tag_row(tag: str, is_picked: bool) -> list:
+        """Returns row of tags column with checkbox of tag"""
+        check_box = Sg.Checkbox(text=tag, default=is_picked,
+                                key=f"{GeneralLayoutConsts.Keys.tag}{tag}",
+                                size=GeneralLayoutConsts.Sizes.tag)
+        return [Sg.pin(check_box)]
+
+    @staticmethod
+    def _get_tags_frame_(tag_states: list) -> Sg.Frame:
         """Returns frame with available tags and already chosen tags.
-        tags - list of all tags
-        picked_tags - list of tags of current section"""
+        tag_states - list of tuples: tag and is it tag of current section"""
         tags_layout = []
-        for tag in tags:
-            is_picked = tag in picked_tags
-            check_box = Sg.Checkbox(text=tag, default=is_picked,
-                                    key=f"{GeneralLayoutConsts.Keys.tag}{tag}",
-                                    size=GeneralLayoutConsts.Sizes.tag)
-            tags_layout.append([check_box])
+        for tag, is_picked in tag_states:
+            tags_layout.append(Layout.get_tag_row(tag, is_picked))
         tags_column = Sg.Column(tags_layout, scrollable=True,
                                 size=GeneralLayoutConsts.Sizes.tags_column,
-                                justification='left')
+                                justification='left',
+                                key=GeneralLayoutConsts.Keys.tags_column)
         change_tags_button = Sg.Button(button_text="Change tags",
                                        key=GeneralLayoutConsts.Keys.ch_tags)
         clear_tags_button = Sg.Button(button_text="Clear tags",
@@ -112,62 +140,142 @@ class Layout:
         return tags_frame
 
     @staticmethod
-    def _get_section_frame_(tags: list, picked_tags: list,
-                            is_completed: bool) -> Sg.Frame:
-        """Returns current section and section update frame by all tags, picked
-        tags of current section and current state"""
-        states_frame = Layout._get_states_frame_(is_completed)
-        tags_frame = Layout._get_tags_frame_(tags, picked_tags)
+    def _get_section_frame_(tag_states: list, state: str) -> Sg.Frame:
+        """Returns current section and section update frame by states of all
+        tags and current state"""
+        states_frame = Layout._get_states_frame_(state)
+        tags_frame = Layout._get_tags_frame_(tag_states)
         section_frame = Sg.Frame("Section", [[states_frame], [tags_frame]],
                                  element_justification="l")
         return section_frame
 
     @staticmethod
-    def _get_tasks_frame_(tasks: list, is_completed: bool) -> Sg.Frame:
-        """Return frame with all tasks of current section
-        tasks - list of all tasks of current section
+    def _get_pages_row_(pages_state: tuple) -> list:
+        """Returns row with controls of tasks pages: previous and next page,
+        number of page and jump to the page with date.
+        pages_state - state of pages (see LayoutModel.get_pages_state)"""
+        [text, prev_disabled, next_disabled] = pages_state
+        prev_button = Sg.Button(button_text="Prev",
+                                key=GeneralLayoutConsts.Keys.prev_page,
+                                disabled=prev_disabled)
+        page_text = Sg.Text(text, key=GeneralLayoutConsts.Keys.page_text)
+        next_button = Sg.Button(button_text="Next",
+                                key=GeneralLayoutConsts.Keys.next_page,
+                                disabled=next_disabled)
+        date = Sg.InputText(key=GeneralLayoutConsts.Keys.page_date,
+                            default_text=TaskConsts.Default.date,
+                            size=GeneralLayoutConsts.Sizes.page_date)
+        calendar = Sg.CalendarButton("Select Date", close_when_date_chosen=True,
+                                     target=GeneralLayoutConsts.Keys.page_date,
+                                     format="%d.%m.%Y")
+        go_button = Sg.Button(button_text="Go to date",
+                              key=GeneralLayoutConsts.Keys.go_to_date)
+        return [prev_button, page_text, next_button, date, calendar, go_button]
+
+    @staticmethod
+    def _get_search_row_(query: str) -> list:
+        """Returns row with search box, tasks are searched while query is
+        typed"""
+        search_text = Sg.Text("Search")
+        search_input = Sg.InputText(key=GeneralLayoutConsts.Keys.search,
+                                    default_text=query, enable_events=True,
+                                    size=GeneralLayoutConsts.Sizes.search)
+        return [search_text, search_input]
+
+    @staticmethod
+    def _get_task_slot_(slot: int, row: tuple | None,
+                        is_completed: bool) -> list:
+        """Returns rows of layout of slot of tasks page: date header and task
+        row. Slot without task row (None) is hidden"""
+        [header_text, name, color, difficult_text] = ["", "", None, ""]
+        if row is not None:
+            [_, header_text, name, color, difficult_text] = row
+        header = Sg.Text(header_text or "",
+                         key=f"{GeneralLayoutConsts.Keys.task_date}{slot}",
+                         visible=row is not None and header_text is not None)
+        checkbox = Sg.Checkbox(text=name, default=is_completed,
+                               key=f"{GeneralLayoutConsts.Keys.checkbox_task}"
+                                   f"{slot}",
+                               background_color=color,
+                               enable_events=True,
+                               size=GeneralLayoutConsts.Sizes.task)
+        difficult = Sg.Text(difficult_text, background_color=color,
+                            key=f"{GeneralLayoutConsts.Keys.task_difficult}"
+                                f"{slot}",
+                            size=GeneralLayoutConsts.Sizes.difficult)
+        change = Sg.Button(button_text="Change",
+                           key=f"{GeneralLayoutConsts.Keys.ch_task}{slot}")
+        delete = Sg.Button(button_text="Delete",
+                           key=f"{GeneralLayoutConsts.Keys.delete_task}{slot}")
+        task_row = Sg.Column([[checkbox, difficult, change, delete]],
+                             key=f"{GeneralLayoutConsts.Keys.task_row}{slot}",
+                             visible=row is not None, pad=(0, 0))
+        return [[Sg.pin(header)], [Sg.pin(task_row)]]
+
+    @staticmethod
+    def _get_tasks_frame_(rows: list, is_completed: bool,
+                          pages_state: tuple, query="") -> Sg.Frame:
+        """Return frame with one page of tasks of current section. Page has
+        fixed number of slots, slots without tasks are hidden, so the page
+        can be updated without rebuilding.
+        rows - rows of tasks of current page (see LayoutModel.get_task_rows)
         is_completed == True is current section state is completed otherwise
-        False"""
-        cur_date = TaskConsts.Default.minimal_date
+        False
+        pages_state - state of pages (see LayoutModel.get_pages_state)
+        query - text of search box"""
         tasks_layout = []
-        for task in tasks:
-            if task.date != cur_date:
-                date = Sg.Text(task.date_str)
-                tasks_layout.append([date])
-                cur_date = task.date
-            color = GeneralLayoutConsts.colors_by_priority[task.priority - 1]
-            checkbox_key = f"{GeneralLayoutConsts.Keys.checkbox_task}"\
-                           f"{task.id}"
-            checkbox = Sg.Checkbox(text=task.name, default=is_completed,
-                                   key=checkbox_key,
-                                   background_color=color,
-                                   enable_events=True,
-                                   size=GeneralLayoutConsts.Sizes.task)
-            difficult = Sg.Text(f"Difficult: {task.difficult}",
-                                background_color=color,
-                                size=GeneralLayoutConsts.Sizes.difficult)
-            change = Sg.Button(button_text="Change",
-                               key=f"{GeneralLayoutConsts.Keys.ch_task}"
-                                   f"{task.id}")
-            delete = Sg.Button(button_text="Delete",
-                               key=f"{GeneralLayoutConsts.Keys.delete_task}"
-                                   f"{task.id}")
-            tasks_layout.append([checkbox, difficult, change, delete])
+        for slot in range(GeneralLayoutConsts.page_size):
+            row = rows[slot] if slot < len(rows) else None
+            tasks_layout.extend(Layout._get_task_slot_(slot, row,
+                                                       is_completed))
         task_column = Sg.Column(tasks_layout, scrollable=True,
                                 size=GeneralLayoutConsts.Sizes.tasks_column,
                                 justification='left')
+        pages_row = Layout._get_pages_row_(pages_state)
         add_task_button = Sg.Button(button_text="Add task",
                                     key=GeneralLayoutConsts.Keys.add_task)
-        tasks_frame = Sg.Frame("Tasks", [[task_column], [add_task_button]])
+        plan_button = Sg.Button(button_text="Plan day",
+                                key=GeneralLayoutConsts.Keys.plan)
+        search_row = Layout._get_search_row_(query)
+        tasks_frame = Sg.Frame("Tasks", [search_row, pages_row, [task_column],
+                                         [add_task_button, plan_button]])
         return tasks_frame
 
+    @staticmethod
+    def _get_statistics_frame_(lines: list) -> Sg.Frame:
+        """Returns frame with lines of statistics of tasks (see
+        LayoutModel.get_statistics_lines), every line is text, that is
+        updated by its key"""
+        statistics_layout = [[Sg.Text(
+            lines[line] if line < len(lines) else "",
+            size=GeneralLayoutConsts.Sizes.statistics,
+            key=f"{GeneralLayoutConsts.Keys.statistics}{line}")]
+            for line in range(GeneralLayoutConsts.statistics_lines)]
+        statistics_frame = Sg.Frame("Statistics", statistics_layout,
+                                    element_justification="l")
+        return statistics_frame
+
     @staticmethod
     def get_general_layout(tasks: list, tags: list, picked_tags: list,
-                           is_completed: bool) -> list:
+                           is_completed: bool, offset=0, count=None,
+                           state=None, query="",
+                           statistics_lines=None) -> list:
         """Returns general layout with current section and opportunity to change
-        it and all tasks of current sections"""
-        section_frame = Layout._get_section_frame_(tags, picked_tags,
-                                                   is_completed)
-        tasks_frame = Layout._get_tasks_frame_(tasks, is_completed)
-        general_layout = [[section_frame, tasks_frame]]
+        it, statistics of tasks and one page of tasks of current sections,
+        that starts from offset position. count - number of all tasks of
+        current section, state - state of current section (see StateConsts),
+        query - text of search box, statistics_lines - lines of statistics
+        panel (see LayoutModel.get_statistics_lines)"""
+        model = LayoutModel.get_general_model(tasks, tags, picked_tags,
+                                              is_completed, offset, count,
+                                              state)
+        section_frame = Layout._get_section_frame_(model["tags"],
+                                                   model["state"])
+        statistics_frame = Layout._get_statistics_frame_(
+            statistics_lines or [])
+        tasks_frame = Layout._get_tasks_frame_(model["rows"], is_completed,
+                                               model["pages"], query)
+        section_column = Sg.Column([[section_frame], [statistics_frame]],
+                                   vertical_alignment="top")
+        general_layout = [[section_column, tasks_frame]]
         return general_layout
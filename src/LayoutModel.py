@@ -0,0 +1,108 @@
+from Globals import GeneralLayoutConsts, StateConsts, TaskConsts
+
+
+class LayoutModel:
+    """Description of general layout, that doesn't depend on graphic
+    library. Layout builds elements from it, so it can be built and measured
+    without graphic library"""
+
+    @staticmethod
+    def get_task_rows(tasks: list) -> list:
+        """Returns description of rows of tasks page. For each task it is
+        tuple: id, date header (None if the task has the same date as
+        previous one), name, color by priority and difficult text"""
+        cur_date = TaskConsts.Default.minimal_date.toordinal()
+        rows = []
+        for task in tasks:
+            header = None
+            if task.ordinal != cur_date:
+                header = task.date_str
+                cur_date = task.ordinal
+            color = GeneralLayoutConsts.colors_by_priority[task.priority - 1]
+            rows.append((task.id, header, task.name, color,
+                         f"Difficult: {task.difficult}"))
+        return rows
+
+    @staticmethod
+    def get_tag_states(tags: list, picked_tags: list) -> list:
+        """Returns list of tuples: tag and is it picked, for all tags"""
+        picked_tags = set(picked_tags)
+        return [(tag, tag in picked_tags) for tag in tags]
+
+    @staticmethod
+    def get_pages_state(offset: int, count: int) -> tuple:
+        """Returns text with number of page and number of pages, and if
+        previous and next buttons are disabled.
+        offset - position of the first task of page,
+        count - number of all tasks of current section"""
+        page_size = GeneralLayoutConsts.page_size
+        page = offset // page_size + 1
+        pages_count = max((count + page_size - 1) // page_size, 1)
+        return f"Page {page} of {pages_count}", offset == 0, \
+            offset + page_size >= count
+
+    @staticmethod
+    def get_state(is_completed: bool, state=None) -> str:
+        """Returns state of section (see StateConsts), by default it is
+        following or completed by is_completed"""
+        if state is not None:
+            return state
+        if is_completed:
+            return StateConsts.completed
+        return StateConsts.following
+
+    @staticmethod
+    def get_statistics_lines(statistics: dict, soon_statistics: dict) -> list:
+        """Returns GeneralLayoutConsts.statistics_lines lines of statistics
+        panel by statistics of all tasks and of tasks due soon (see
+        TaskManager.get_statistics): following tasks and their difficult,
+        completed tasks and completion rate, tasks due soon and their
+        difficult, the most difficult day of them and following tasks with
+        every priority"""
+        following = statistics[StateConsts.following]
+        completed = statistics[StateConsts.completed]
+        soon = soon_statistics[StateConsts.following]
+        busiest = max(soon_statistics["days"],
+                      key=lambda day: day["difficult"], default=None)
+        busiest_text = "-"
+        if busiest is not None and busiest["difficult"] != 0:
+            busiest_text = f"{busiest['date']}, {busiest['difficult']}"
+        counts = statistics["priorities"]
+        priorities = ", ".join(
+            f"{priority}: "
+            f"{counts.get(priority, {}).get(StateConsts.following, 0)}"
+            for priority in TaskConsts.Ranges.priority)
+        return [f"Following: {following['tasks']}, "
+                f"difficult {following['difficult']}",
+                f"Completed: {completed['tasks']}, "
+                f"{statistics['completion_rate']:.0%} done",
+                f"Due soon: {soon['tasks']}, difficult {soon['difficult']}",
+                f"Busiest day: {busiest_text}",
+                f"Priority {priorities}"]
+
+    @staticmethod
+    def get_plan_rows(picks: list) -> list:
+        """Returns description of rows of plan of tasks to do next (see
+        TaskManager.plan_tasks). For each picked task it is tuple: text with
+        date, name and difficult, color by priority and explanation"""
+        rows = []
+        for pick in picks:
+            task = pick["task"]
+            color = GeneralLayoutConsts.colors_by_priority[task.priority - 1]
+            rows.append((f"{task.date_str} {task.name}, difficult "
+                         f"{task.difficult}", color, pick["explanation"]))
+        return rows
+
+    @staticmethod
+    def get_general_model(tasks: list, tags: list, picked_tags: list,
+                          is_completed: bool, offset=0, count=None,
+                          state=None) -> dict:
+        """Returns description of general layout: rows of tasks page, states
+        of tags, state of section and state of pages"""
+        if count is None:
+            count = len(tasks)
+        return {"rows": LayoutModel.get_task_rows(tasks),
+                "tags": LayoutModel.get_tag_states(tags, picked_tags),
+                "is_completed": is_completed,
+                "state": LayoutModel.get_state(is_completed, state),
+                "pages": LayoutModel.get_pages_state(offset, count)}
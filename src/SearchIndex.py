@@ -0,0 +1,73 @@
+from Globals import SearchConsts
+from Task import Task
+
+
+class SearchIndex:
+    """SearchIndex is an inverted index from trigram (substring of three
+    characters) of lowercased name or tag to ids of all tasks, whose name or
+    tag contains it. Every task, that contains query, contains all its
+    trigrams, so candidates are found by intersection of their postings and
+    only candidates are checked. Texts are padded by end marks, so every
+    shorter query is a prefix of trigram and its candidates are union of
+    postings of trigrams, that start with it. Index is updated with every
+    added and removed task.
+    postings: dict - trigram -> set of ids of tasks with this trigram
+    """
+
+    def __init__(self, tasks=tuple()):
+        """Creates SearchIndex object and indexes all tasks"""
+        self.__postings = dict()
+        for task in tasks:
+            self.add(task)
+
+    @staticmethod
+    def get_grams(text: str) -> set:
+        """Returns all substrings of text of SearchConsts.gram_size
+        characters"""
+        size = SearchConsts.gram_size
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+    @staticmethod
+    def _get_task_grams_(task: Task) -> set:
+        """Returns trigrams of lowercased name and tags of task padded by end
+        marks"""
+        padding = SearchConsts.end_mark * (SearchConsts.gram_size - 1)
+        grams = SearchIndex.get_grams(task.name.lower() + padding)
+        for tag in task.tags:
+            grams |= SearchIndex.get_grams(tag.lower() + padding)
+        return grams
+
+    def add(self, task: Task):
+        """Adds task to postings of all its trigrams"""
+        for gram in self._get_task_grams_(task):
+            self.__postings.setdefault(gram, set()).add(task.id)
+
+    def remove(self, task: Task):
+        """Removes task from postings of all its trigrams"""
+        for gram in self._get_task_grams_(task):
+            posting = self.__postings.get(gram)
+            if posting is None:
+                continue
+            posting.discard(task.id)
+            if len(posting) == 0:
+                del self.__postings[gram]
+
+    def find(self, query: str) -> set:
+        """Returns ids of tasks, that contain all trigrams of lowercased
+        query or trigram, that starts with shorter query, they must be
+        checked by query itself"""
+        grams = self.get_grams(query)
+        if len(grams) == 0:
+            ids = set()
+            for gram, posting in self.__postings.items():
+                if gram.startswith(query):
+                    ids |= posting
+            return ids
+        postings = []
+        for gram in grams:
+            posting = self.__postings.get(gram)
+            if posting is None:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+        return set(postings[0]).intersection(*postings[1:])
@@ -1,87 +1,142 @@
-import json
-
-from Globals import PathConsts
+from Storage import Storage
 from Task import Task
 
 
 class Section:
     """Section is a wrapper for all tasks with common tags and state
-    (following/completed).
-    path: string - path to file with tasks with this state,
+    (following/completed), optionally only with dates from range. Tasks of
+    range are found by binary search in date-ordered storage: position of
+    range is number of tasks before its first date. Results of queries of
+    section from cache of sections are kept there until storage is changed.
+    store: Storage - storage with all tasks with this state,
     is_completed: bool - is this completed tasks,
     tags: set - tags of tasks,
+    dates: tuple - ordinals of the first and the last dates of tasks
+    inclusive or None for tasks with any dates,
+    cache: SectionCache - cache, that keeps results of queries, or None
     """
 
-    def __init__(self, tags=None, is_completed=False):
-        """Creates Section object from list of tags and state"""
+    def __init__(self, store: Storage, tags=None, dates=None, cache=None):
+        """Creates Section object from store of tasks with needed state,
+        list of tags, range of dates and cache of its results"""
         if tags is None:
             tags = list()
-        if is_completed:
-            self.__path = PathConsts.path_to_completed
-        else:
-            self.__path = PathConsts.path_to_following
-        self.__is_completed = is_completed
+        self.__store = store
+        self.__is_completed = store.is_completed
         self.__tags = set(tags)
+        self.__dates = dates
+        self.__cache = cache
 
-    def _rewrite_tasks_(self, tasks: list):
-        """Rewrites tasks to file"""
-        tasks_attributes = tuple(map(lambda task: task.get_attributes(), tasks))
-        with open(self.__path, 'w', encoding="UTF-8") as file:
-            file.write(json.dumps(tasks_attributes))
+    def _get_cached_(self, query: tuple, compute):
+        """Returns result of query computed by compute or kept by cache of
+        sections (see SectionCache.get_result)"""
+        if self.__cache is None:
+            return compute()
+        return self.__cache.get_result(self, query, compute)
 
     def add_task(self, task: Task) -> None:
         """Adds task to this section, can be used only by
         __following_section and __completed_section attributes of TaskManager"""
-        tasks = self.get_tasks()
-        tasks.append(task)
-        self._rewrite_tasks_(tasks)
+        self.__store.add_task(task)
 
     def delete_task_by_id(self, task_id: int):
         """Delete task from file by id, can be used only by
         __following_section and __completed_section attributes of TaskManager"""
-        tasks_with_current = self.get_tasks()
-        tasks = list(filter(lambda current_task: current_task.id != task_id,
-                            tasks_with_current))
-        self._rewrite_tasks_(tasks)
+        self.__store.delete_task_by_id(task_id)
 
     def get_tasks(self) -> list:
         """Returns sorted by date, priority and difficult attributes list of
         all tasks from this section"""
-        with open(self.__path, 'r', encoding="UTF-8") as file:
-            json_tasks_attributes = file.read()
-        tasks_attributes = []
-        if len(json_tasks_attributes) != 0:
-            tasks_attributes = json.loads(json_tasks_attributes)
-        all_tasks = list(map(lambda task_attribute: Task(task_attribute),
-                             tasks_attributes))
-        tasks = list(filter(lambda task: self.__tags.issubset(task.tags),
-                            all_tasks))
-        tasks.sort(key=lambda task: (task.date, task.priority, -task.difficult))
-        return tasks
+        def get_all() -> list:
+            if self.__dates is None:
+                return self.__store.get_tasks(self.__tags)
+            [first_ordinal, last_ordinal] = self.__dates
+            return self.__store.get_tasks_by_dates(first_ordinal,
+                                                   last_ordinal, self.__tags)
+
+        return self._get_cached_(("tasks",), get_all)
+
+    def get_tasks_page(self, offset: int, limit: int) -> list:
+        """Returns limit tasks of this section starting from offset position
+        in sorted list of them"""
+        def get_page() -> list:
+            if self.__dates is None:
+                return self.__store.get_tasks_page(self.__tags, offset,
+                                                   limit)
+            page_limit = min(limit, self.count_tasks() - offset)
+            if page_limit <= 0:
+                return []
+            start = self.__store.count_tasks_before(self.__dates[0],
+                                                    self.__tags)
+            return self.__store.get_tasks_page(self.__tags, start + offset,
+                                               page_limit)
+
+        return self._get_cached_(("page", offset, limit), get_page)
+
+    def count_tasks(self) -> int:
+        """Returns number of tasks of this section"""
+        def count() -> int:
+            if self.__dates is None:
+                return self.__store.count_tasks(self.__tags)
+            return self.count_tasks_before(self.__dates[1] + 1)
+
+        return self._get_cached_(("count",), count)
+
+    def count_tasks_before(self, ordinal: int) -> int:
+        """Returns number of tasks of this section with date before ordinal"""
+        def count_before() -> int:
+            if self.__dates is None:
+                return self.__store.count_tasks_before(ordinal, self.__tags)
+            [first_ordinal, last_ordinal] = self.__dates
+            if ordinal <= first_ordinal:
+                return 0
+            last = min(ordinal, last_ordinal + 1)
+            return self.__store.count_tasks_before(last, self.__tags) - \
+                self.__store.count_tasks_before(first_ordinal, self.__tags)
+
+        return self._get_cached_(("before", ordinal), count_before)
+
+    def search_tasks(self, query: str, limit: int) -> list:
+        """Returns limit best tasks of this section, whose name or tag
+        contains lowercased query"""
+        return self._get_cached_(
+            ("search", query, limit),
+            lambda: self.__store.search_tasks(query, self.__tags, limit,
+                                              self.__dates))
 
     def find_task_by_name(self, task_name: str) -> bool:
         """Searches for a task with the same name among all tasks with the
         same state. Returns True if found otherwise False, can be used only by
         __following_section and __completed_section attributes of TaskManager"""
-        tasks = self.get_tasks()
-        result = False
-        for task in tasks:
-            if task.name == task_name:
-                result = True
-        return result
+        return self.__store.find_task_by_name(task_name)
+
+    def find_tasks_by_names(self, names: set) -> set:
+        """Returns names from names, that tasks with the same state have, can
+        be used only as find_task_by_name"""
+        return self.__store.find_tasks_by_names(names)
 
     def get_task_by_id(self, task_id: int) -> Task | None:
         """Returns task by id if this task exist otherwise None"""
-        tasks = self.get_tasks()
-        for task in tasks:
-            if task.id == task_id:
-                return task
-        return None
+        return self.__store.get_task_by_id(task_id)
 
     @property
     def is_completed(self) -> bool:
         return self.__is_completed
 
+    @property
+    def key(self) -> tuple:
+        """Returns key of section in cache of sections"""
+        return frozenset(self.__tags), self.__is_completed, self.__dates
+
+    @property
+    def version(self) -> int:
+        """Returns version of storage of section (see Storage.version)"""
+        return self.__store.version
+
     @property
     def tags(self) -> set:
         return self.__tags
+
+    @property
+    def dates(self) -> tuple | None:
+        return self.__dates
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+
+from Globals import StorageConsts
+from Section import Section
+from Storage import Storage
+
+
+class SectionCache:
+    """SectionCache keeps recently used sections with results of their
+    queries (pages and numbers of tasks, positions of dates, found tasks),
+    so section, that was shown recently, is shown again without queries to
+    storage. Sections are keyed by tags, state and range of dates. Results
+    of section are valid while version of its storage (see Storage.version)
+    is the same, the first query after any change of storage drops them.
+    Memory is bound by number of tasks in kept results (every result is
+    counted as one more task) and by number of sections, least recently
+    used sections are dropped first.
+    max_tasks: int - max number of tasks in all kept results,
+    max_sections: int - max number of kept sections,
+    entries: OrderedDict - key of section -> [section, version of storage,
+    dict query -> result, number of tasks in results] from the least
+    recently used section to the most recently used one,
+    size: int - number of tasks in all kept results,
+    hits: int - number of queries answered by kept results,
+    misses: int - number of queries made to storage
+    """
+
+    def __init__(self, max_tasks=StorageConsts.section_cache_tasks,
+                 max_sections=StorageConsts.section_cache_sections):
+        """Creates empty SectionCache object with bounds of memory"""
+        self.__max_tasks = max_tasks
+        self.__max_sections = max_sections
+        self.__entries = OrderedDict()
+        self.__size = 0
+        self.__hits = 0
+        self.__misses = 0
+
+    @staticmethod
+    def get_key(store: Storage, tags=None, dates=None) -> tuple:
+        """Returns key of section of storage with tags and range of dates"""
+        return frozenset(tags or ()), store.is_completed, dates
+
+    def _evict_(self):
+        """Drops least recently used sections until results and sections
+        fit to bounds"""
+        while self.__size > self.__max_tasks or \
+                len(self.__entries) > self.__max_sections:
+            [_, entry] = self.__entries.popitem(last=False)
+            self.__size -= entry[3]
+
+    def get_section(self, store: Storage, tags=None, dates=None) -> Section:
+        """Returns section of storage with tags and range of dates, kept
+        section with its results if it was used recently"""
+        key = self.get_key(store, tags, dates)
+        entry = self.__entries.get(key)
+        if entry is not None:
+            self.__entries.move_to_end(key)
+            return entry[0]
+        section = Section(store, tags, dates, self)
+        self.__entries[key] = [section, None, dict(), 0]
+        self._evict_()
+        return section
+
+    def get_result(self, section: Section, query: tuple, compute):
+        """Returns result of query of section: kept one if storage wasn't
+        changed since it was computed, otherwise computed by compute and kept
+        if it fits to bound. Version is taken before computing, so result
+        computed during change of storage is dropped by the next query.
+        Lists are returned as copies, so kept results can't be changed"""
+        key = section.key
+        version = section.version
+        entry = self.__entries.get(key)
+        if entry is None:
+            entry = [section, version, dict(), 0]
+            self.__entries[key] = entry
+        elif entry[1] != version:
+            self.__size -= entry[3]
+            entry[1:] = [version, dict(), 0]
+        self.__entries.move_to_end(key)
+        if query in entry[2]:
+            self.__hits += 1
+            result = entry[2][query]
+        else:
+            self.__misses += 1
+            result = compute()
+            size = len(result) + 1 if isinstance(result, list) else 1
+            if size <= self.__max_tasks and entry[1] == version and \
+                    self.__entries.get(key) is entry:
+                entry[2][query] = result
+                entry[3] += size
+                self.__size += size
+                self._evict_()
+        if isinstance(result, list):
+            return list(result)
+        return result
+
+    @property
+    def statistics(self) -> dict:
+        """Returns number of hits and misses of queries, number of kept
+        sections and number of tasks in kept results"""
+        return {"hits": self.__hits, "misses": self.__misses,
+                "sections": len(self.__entries), "tasks": self.__size,
+                "max_tasks": self.__max_tasks}
@@ -0,0 +1,93 @@
+import threading
+from bisect import bisect_left
+from operator import itemgetter
+
+from Globals import StorageConsts
+from Storage import Storage
+from Task import Task
+
+
+class SortedTasks:
+    """SortedTasks keeps tasks ordered by date, priority and difficult (and id
+    for equal ones). Tasks are inserted and removed by binary search, so
+    ordered tasks are never sorted again. Added tasks are put to their places
+    only by the next query, so many tasks added in a row (import of file)
+    are merged at once instead of shifting list on every insert.
+    keys: list - sorted keys of tasks,
+    tasks: list - tasks in the same order as keys,
+    added: list - added tasks, that aren't put to their places yet,
+    lock: threading.Lock - guards merge of added tasks
+    """
+
+    def __init__(self, tasks=tuple()):
+        """Creates SortedTasks object from tasks in any order"""
+        self.__tasks = sorted(tasks, key=Storage.sort_key)
+        self.__keys = list(map(Storage.sort_key, self.__tasks))
+        self.__added = list()
+        self.__lock = threading.Lock()
+
+    def add(self, task: Task):
+        """Adds task, it is put to its place by the next query"""
+        with self.__lock:
+            self.__added.append(task)
+
+    def _merge_(self):
+        """Puts added tasks to their places: few tasks are inserted by binary
+        search, many tasks are merged with sorted ones by one sort, that finds
+        sorted run of old tasks and doesn't compare them again"""
+        with self.__lock:
+            added = self.__added
+            if len(added) == 0:
+                return
+            self.__added = list()
+            if len(added) <= StorageConsts.sorted_insert_limit:
+                for task in added:
+                    key = Storage.sort_key(task)
+                    position = bisect_left(self.__keys, key)
+                    self.__keys.insert(position, key)
+                    self.__tasks.insert(position, task)
+                return
+            keys = self.__keys + list(map(Storage.sort_key, added))
+            pairs = sorted(zip(keys, self.__tasks + added), key=itemgetter(0))
+            self.__keys = [key for key, task in pairs]
+            self.__tasks = [task for key, task in pairs]
+
+    def remove(self, task: Task):
+        """Removes task, that was added before"""
+        self._merge_()
+        key = Storage.sort_key(task)
+        position = bisect_left(self.__keys, key)
+        if position < len(self.__keys) and self.__keys[position] == key:
+            del self.__keys[position]
+            del self.__tasks[position]
+
+    def get_by_dates(self, first_ordinal: int, last_ordinal: int) -> list:
+        """Returns ordered tasks with date from first_ordinal to last_ordinal
+        inclusive"""
+        self._merge_()
+        start = bisect_left(self.__keys, (first_ordinal,))
+        end = bisect_left(self.__keys, (last_ordinal + 1,))
+        return self.__tasks[start:end]
+
+    def get_slice(self, offset: int, limit: int) -> list:
+        """Returns limit ordered tasks starting from offset position"""
+        self._merge_()
+        return self.__tasks[offset:offset + limit]
+
+    def count_before(self, ordinal: int) -> int:
+        """Returns number of tasks with date before ordinal"""
+        self._merge_()
+        return bisect_left(self.__keys, (ordinal,))
+
+    def __len__(self) -> int:
+        return len(self.__tasks) + len(self.__added)
+
+    def __iter__(self):
+        self._merge_()
+        return iter(self.__tasks)
+
+    @property
+    def tasks(self) -> list:
+        """Returns ordered list of all tasks"""
+        self._merge_()
+        return list(self.__tasks)
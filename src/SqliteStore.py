@@ -0,0 +1,301 @@
+import sqlite3
+
+from Storage import Storage
+from Task import Task
+from TaskStatistics import TaskStatistics
+
+
+class SqliteStore(Storage):
+    """SqliteStore is a storage of all tasks with the same state
+    (following/completed) in SQLite database. Tasks of both states are kept in
+    one tasks table and differ by completed column, tags are kept in
+    task_tags join table. Lookups, tags filtering and moving of task between
+    states are made by indexed queries.
+    connection: sqlite3.Connection - connection to database,
+    in_transaction: bool - is transaction started by begin now,
+    data_version: int - data_version of database at the last check of
+    version, it is changed by commits of other connections
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            date INTEGER NOT NULL,
+            priority INTEGER NOT NULL,
+            difficult INTEGER NOT NULL,
+            completed INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS task_tags (
+            tag TEXT NOT NULL,
+            task_id INTEGER NOT NULL REFERENCES tasks (id) ON DELETE CASCADE,
+            PRIMARY KEY (tag, task_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS task_tags_task_id ON task_tags (task_id);
+        CREATE INDEX IF NOT EXISTS tasks_order
+            ON tasks (completed, date, priority, difficult DESC);
+        CREATE INDEX IF NOT EXISTS tasks_name ON tasks (completed, name);
+    """
+    task_columns = "id, name, date, priority, difficult, " \
+                   "(SELECT group_concat(tag, char(10)) FROM task_tags " \
+                   "WHERE task_id = tasks.id)"
+    order = "date, priority, difficult DESC, id"
+
+    @staticmethod
+    def connect(path: str) -> sqlite3.Connection:
+        """Returns connection to database by path, creates tables and indexes
+        if they don't exist. Connection can be used by another thread, for
+        example by thread of TaskServer, if calls are not concurrent"""
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.create_function("lower_text", 1, str.lower,
+                                   deterministic=True)
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.executescript(SqliteStore.schema)
+        return connection
+
+    def __init__(self, connection: sqlite3.Connection, is_completed=False):
+        """Creates SqliteStore object by connection to database and state"""
+        super().__init__(is_completed)
+        self.__connection = connection
+        self.__in_transaction = False
+        self.__data_version = None
+
+    def _execute_(self, query: str, parameters=tuple()) -> sqlite3.Cursor:
+        """Executes modifying query, commits it at once if there is no
+        transaction"""
+        cursor = self.__connection.execute(query, parameters)
+        if not self.__in_transaction:
+            self.__connection.commit()
+        return cursor
+
+    def begin(self):
+        """Starts transaction, all queries until commit are made in one
+        database transaction"""
+        self.__in_transaction = True
+
+    def commit(self):
+        """Commits database transaction"""
+        self.__in_transaction = False
+        self.__connection.commit()
+
+    def rollback(self):
+        """Rolls back database transaction"""
+        self.__in_transaction = False
+        self.__connection.rollback()
+        self._bump_version_()
+
+    @property
+    def has_pending_changes(self) -> bool:
+        """Returns True if database transaction has not committed changes"""
+        return self.__connection.in_transaction
+
+    def close(self):
+        """Closes connection to database"""
+        self.__connection.close()
+
+    @staticmethod
+    def _make_task_(row: tuple) -> Task:
+        """Returns task by row of tasks table with concatenated tags"""
+        task_id, name, ordinal, priority, difficult, tags = row
+        tags = tags.split('\n') if tags else tuple()
+        return Task.make(task_id, name, ordinal, tags, priority, difficult)
+
+    @staticmethod
+    def insert_tasks(connection: sqlite3.Connection, tasks: list,
+                     is_completed: bool):
+        """Inserts tasks with state to database without commit"""
+        connection.executemany(
+            "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?)",
+            ((task.id, task.name, task.ordinal, task.priority,
+              task.difficult, int(is_completed)) for task in tasks))
+        connection.executemany(
+            "INSERT OR IGNORE INTO task_tags VALUES (?, ?)",
+            ((tag, task.id) for task in tasks for tag in task.tags))
+
+    def _select_(self, condition: str, parameters: tuple, offset=0,
+                 limit=-1) -> list:
+        """Returns ordered tasks with this state, that satisfy condition,
+        limit of them starting from offset position"""
+        query = f"SELECT {self.task_columns} FROM tasks " \
+                f"WHERE completed = ? AND {condition} ORDER BY {self.order} " \
+                f"LIMIT ? OFFSET ?"
+        rows = self.__connection.execute(
+            query, (int(self.is_completed),) + parameters + (limit, offset))
+        return list(map(self._make_task_, rows))
+
+    def _count_(self, condition: str, parameters: tuple) -> int:
+        """Returns number of tasks with this state, that satisfy condition"""
+        query = f"SELECT COUNT(*) FROM tasks WHERE completed = ? AND " \
+                f"{condition}"
+        row = self.__connection.execute(
+            query, (int(self.is_completed),) + parameters).fetchone()
+        return row[0]
+
+    def _tags_query_(self, tags: set) -> tuple:
+        """Returns condition and its parameters of having all tags"""
+        if len(tags) == 0:
+            return "1", tuple()
+        return self._tags_condition_(tags), tuple(tags) + (len(tags),)
+
+    @property
+    def version(self) -> int:
+        """Returns version of tasks, it is also changed if another
+        connection committed changes to database since the last check"""
+        data_version = self.__connection.execute(
+            "PRAGMA data_version").fetchone()[0]
+        if data_version != self.__data_version:
+            self.__data_version = data_version
+            self._bump_version_()
+        return super().version
+
+    @property
+    def tasks(self) -> list:
+        """Returns all tasks with this state"""
+        return self._select_("1", tuple())
+
+    def add_task(self, task: Task):
+        """Adds task to database"""
+        self.insert_tasks(self.__connection, [task], self.is_completed)
+        self._bump_version_()
+        if not self.__in_transaction:
+            self.__connection.commit()
+
+    def delete_task_by_id(self, task_id: int):
+        """Deletes task with this id and state from database"""
+        self._execute_("DELETE FROM tasks WHERE id = ? AND completed = ?",
+                       (task_id, int(self.is_completed)))
+        self._bump_version_()
+
+    @staticmethod
+    def _tags_condition_(tags: set) -> str:
+        """Returns condition of having all tags, its parameters are tags and
+        number of tags"""
+        placeholders = ", ".join("?" * len(tags))
+        return f"id IN (SELECT task_id FROM task_tags " \
+               f"WHERE tag IN ({placeholders}) " \
+               f"GROUP BY task_id HAVING COUNT(*) = ?)"
+
+    def get_tasks(self, tags: set) -> list:
+        """Returns sorted by date, priority and difficult attributes list of
+        all tasks, that have all tags"""
+        return self._select_(*self._tags_query_(tags))
+
+    def get_tasks_page(self, tags: set, offset: int, limit: int) -> list:
+        """Returns limit tasks, that have all tags, starting from offset
+        position in sorted list of them"""
+        condition, parameters = self._tags_query_(tags)
+        return self._select_(condition, parameters, offset, limit)
+
+    def count_tasks(self, tags: set) -> int:
+        """Returns number of tasks, that have all tags"""
+        return self._count_(*self._tags_query_(tags))
+
+    def count_tasks_before(self, ordinal: int, tags: set) -> int:
+        """Returns number of tasks, that have all tags, with date before
+        ordinal"""
+        condition, parameters = self._tags_query_(tags)
+        return self._count_(f"date < ? AND {condition}",
+                            (ordinal,) + parameters)
+
+    def get_tasks_by_dates(self, first_ordinal: int, last_ordinal: int,
+                           tags=frozenset()) -> list:
+        """Returns sorted list of all tasks with date from first_ordinal to
+        last_ordinal inclusive, that have all tags"""
+        condition, parameters = self._tags_query_(tags)
+        return self._select_(f"date BETWEEN ? AND ? AND {condition}",
+                             (first_ordinal, last_ordinal) + parameters)
+
+    def search_tasks(self, query: str, tags: set, limit: int,
+                     dates=None) -> list:
+        """Returns limit best tasks, whose name or tag contains lowercased
+        query, that have all tags and date from range dates if it is given.
+        Tasks containing query are selected by database, they are ranked by
+        Storage.rank_found_tasks"""
+        condition, parameters = self._tags_query_(tags)
+        if dates is not None:
+            condition += " AND date BETWEEN ? AND ?"
+            parameters += tuple(dates)
+        tasks = self._select_(
+            f"(instr(lower_text(name), ?) > 0 OR id IN (SELECT task_id FROM "
+            f"task_tags WHERE instr(lower_text(tag), ?) > 0)) AND {condition}",
+            (query, query) + parameters)
+        return self.rank_found_tasks(tasks, query, tags, limit, dates)
+
+    def get_statistics(self, tags: set, dates=None) -> dict:
+        """Returns statistics of tasks, that have all tags, with date from
+        range dates if it is given. Tasks are grouped by date and priority
+        and by date and tag in database, so they aren't read"""
+        condition, parameters = self._tags_query_(tags)
+        if dates is not None:
+            condition += " AND date BETWEEN ? AND ?"
+            parameters += tuple(dates)
+        parameters = (int(self.is_completed),) + parameters
+        days = dict()
+        rows = self.__connection.execute(
+            f"SELECT date, priority, COUNT(*), SUM(difficult) FROM tasks "
+            f"WHERE completed = ? AND {condition} GROUP BY date, priority",
+            parameters)
+        for ordinal, priority, count, difficult in rows:
+            day = days.setdefault(ordinal, TaskStatistics.make_counters())
+            day[0] += count
+            day[1] += difficult
+            day[2][priority] = count
+        rows = self.__connection.execute(
+            f"SELECT date, tag, COUNT(*) FROM tasks JOIN task_tags "
+            f"ON id = task_id WHERE completed = ? AND {condition} "
+            f"GROUP BY date, tag", parameters)
+        for ordinal, tag, count in rows:
+            days[ordinal][3][tag] = count
+        statistics = TaskStatistics()
+        for ordinal, day in days.items():
+            statistics.add_counters(ordinal, day)
+        return statistics.get_summary()
+
+    def find_task_by_name(self, task_name: str) -> bool:
+        """Returns True if task with this name exists otherwise False"""
+        row = self.__connection.execute(
+            "SELECT 1 FROM tasks WHERE completed = ? AND name = ? LIMIT 1",
+            (int(self.is_completed), task_name)).fetchone()
+        return row is not None
+
+    def get_task_by_id(self, task_id: int) -> Task | None:
+        """Returns task by id if this task exist otherwise None"""
+        tasks = self._select_("id = ?", (task_id,))
+        if len(tasks) == 0:
+            return None
+        return tasks[0]
+
+    def move_task(self, task_id: int, storage: Storage) -> Task | None:
+        """Moves task by id from this storage to another storage, if both of
+        them are in the same database only completed column is updated"""
+        if not isinstance(storage, SqliteStore) or \
+                storage.__connection is not self.__connection:
+            return super().move_task(task_id, storage)
+        cursor = self._execute_(
+            "UPDATE tasks SET completed = ? WHERE id = ? AND completed = ?",
+            (int(storage.is_completed), task_id, int(self.is_completed)))
+        if cursor.rowcount == 0:
+            return None
+        self._bump_version_()
+        storage._bump_version_()
+        return storage.get_task_by_id(task_id)
+
+    @property
+    def tags(self) -> set:
+        """Returns all tags used at least once in this storage"""
+        rows = self.__connection.execute(
+            "SELECT DISTINCT tag FROM task_tags JOIN tasks ON id = task_id "
+            "WHERE completed = ?", (int(self.is_completed),))
+        return set(row[0] for row in rows)
+
+    @staticmethod
+    def migrate_from_json(connection: sqlite3.Connection, following: Storage,
+                          completed: Storage):
+        """One-shot migration of all tasks from json storages to empty
+        database"""
+        row = connection.execute("SELECT COUNT(*) FROM tasks").fetchone()
+        if row[0] != 0:
+            return
+        with connection:
+            SqliteStore.insert_tasks(connection, following.tasks, False)
+            SqliteStore.insert_tasks(connection, completed.tasks, True)
@@ -0,0 +1,231 @@
+import heapq
+from bisect import bisect_left
+
+from Globals import SearchConsts
+from Task import Task
+from TaskStatistics import TaskStatistics
+
+
+class Storage:
+    """Storage is an interface of storage of all tasks with the same state
+    (following/completed). Default implementations of queries work over list
+    of all tasks, implementations can replace them by more effective ones.
+    is_completed: bool - is this storage of completed tasks,
+    version: int - version of tasks, it is increased by every mutation and
+    by every reading of tasks changed by another process
+    """
+
+    def __init__(self, is_completed=False):
+        """Creates Storage object by state of its tasks"""
+        self.__is_completed = is_completed
+        self.__version = 0
+
+    def _bump_version_(self):
+        """Marks that tasks of storage were changed"""
+        self.__version += 1
+
+    @property
+    def version(self) -> int:
+        """Returns version of tasks of storage. Queries made with the same
+        version return the same results, so they can be cached until
+        version is changed. Implementations, that read tasks changed by
+        another process lazily, check it first"""
+        return self.__version
+
+    @staticmethod
+    def sort_key(task: Task) -> tuple:
+        """Returns key by which tasks are ordered: by date, priority and
+        difficult, tasks with equal ones are ordered by id"""
+        return task.ordinal, task.priority, -task.difficult, task.id
+
+    @property
+    def tasks(self) -> list:
+        """Returns all tasks of storage"""
+        raise NotImplementedError
+
+    def add_task(self, task: Task):
+        """Adds task to storage"""
+        raise NotImplementedError
+
+    def delete_task_by_id(self, task_id: int):
+        """Deletes task with this id from storage"""
+        raise NotImplementedError
+
+    def begin(self):
+        """Starts transaction, mutations until commit must not be
+        persisted"""
+
+    def commit(self):
+        """Persists all mutations of current transaction"""
+
+    def rollback(self):
+        """Cancels all mutations of current transaction"""
+
+    def close(self):
+        """Finishes all background work of storage"""
+
+    @property
+    def supports_deferred_writes(self) -> bool:
+        """Returns True if commit of storage can be split to finishing of
+        transaction in memory (defer_commit) and writing of its records
+        later by another thread (write_deferred)"""
+        return False
+
+    def defer_commit(self) -> list:
+        """Finishes transaction keeping all its mutations in memory and
+        returns records, that must be persisted by write_deferred. Storage
+        isn't read again from disk until they are written or discarded"""
+        raise NotImplementedError
+
+    def write_deferred(self, records: list, reload=False):
+        """Persists records returned by defer_commit. If reload is True,
+        storage is read again from disk by the next query"""
+        raise NotImplementedError
+
+    def discard_deferred(self, records: list):
+        """Forgets records returned by defer_commit, that can't be written,
+        storage is read again from disk by the next query"""
+        raise NotImplementedError
+
+    @property
+    def has_pending_additions(self) -> bool:
+        """Returns True if current transaction adds tasks to storage"""
+        return False
+
+    @property
+    def has_pending_changes(self) -> bool:
+        """Returns True if current transaction changes storage"""
+        return False
+
+    def get_tasks(self, tags: set) -> list:
+        """Returns sorted by date, priority and difficult attributes list of
+        all tasks, that have all tags"""
+        tasks = list(filter(lambda task: tags.issubset(task.tags), self.tasks))
+        tasks.sort(key=self.sort_key)
+        return tasks
+
+    def get_tasks_page(self, tags: set, offset: int, limit: int) -> list:
+        """Returns limit tasks, that have all tags, starting from offset
+        position in sorted list of them"""
+        return self.get_tasks(tags)[offset:offset + limit]
+
+    def count_tasks(self, tags: set) -> int:
+        """Returns number of tasks, that have all tags"""
+        return len(self.get_tasks(tags))
+
+    def count_tasks_before(self, ordinal: int, tags: set) -> int:
+        """Returns number of tasks, that have all tags, with date before
+        ordinal, it is position of the first task with this date or later in
+        sorted list of them"""
+        return bisect_left(self.get_tasks(tags), ordinal,
+                           key=lambda task: task.ordinal)
+
+    def get_tasks_by_dates(self, first_ordinal: int, last_ordinal: int,
+                           tags=frozenset()) -> list:
+        """Returns sorted list of all tasks with date from first_ordinal to
+        last_ordinal inclusive, that have all tags"""
+        return list(filter(
+            lambda task: first_ordinal <= task.ordinal <= last_ordinal,
+            self.get_tasks(tags)))
+
+    @staticmethod
+    def get_search_rank(task: Task, query: str) -> int | None:
+        """Returns rank of task found by lowercased query: the name starts
+        with query, the name contains query, a tag starts with query or a tag
+        contains query (see SearchConsts). Returns None if task doesn't
+        contain query"""
+        name = task.name.lower()
+        if name.startswith(query):
+            return SearchConsts.name_prefix_rank
+        if query in name:
+            return SearchConsts.name_rank
+        rank = None
+        for tag in task.tags:
+            tag = tag.lower()
+            if tag.startswith(query):
+                return SearchConsts.tag_prefix_rank
+            if query in tag:
+                rank = SearchConsts.tag_rank
+        return rank
+
+    @staticmethod
+    def rank_found_tasks(tasks, query: str, tags: set, limit: int,
+                         dates=None) -> list:
+        """Returns limit best tasks from candidates, that contain lowercased
+        query, have all tags and date from range dates (ordinals of the first
+        and the last dates) if it is given. Tasks are ordered by rank and
+        then by date, priority and difficult. Found tasks are grouped by
+        rank, so only groups, that get to result, are ordered, and only
+        limit tasks of them are kept in heap"""
+        groups = [[] for _ in range(SearchConsts.tag_rank + 1)]
+        for task in tasks:
+            if not tags.issubset(task.tags):
+                continue
+            if dates is not None and not dates[0] <= task.ordinal <= dates[1]:
+                continue
+            rank = Storage.get_search_rank(task, query)
+            if rank is not None:
+                groups[rank].append(task)
+        found = []
+        for group in groups:
+            if len(found) >= limit:
+                break
+            found.extend(heapq.nsmallest(limit - len(found), group,
+                                         key=Storage.sort_key))
+        return found
+
+    def search_tasks(self, query: str, tags: set, limit: int,
+                     dates=None) -> list:
+        """Returns limit best tasks, whose name or tag contains lowercased
+        query, that have all tags and date from range dates if it is given"""
+        return self.rank_found_tasks(self.tasks, query, tags, limit, dates)
+
+    def get_statistics(self, tags: set, dates=None) -> dict:
+        """Returns statistics of tasks, that have all tags, with date from
+        range dates (ordinals of the first and the last dates) if it is
+        given (see TaskStatistics.get_summary). Default implementation counts
+        all such tasks"""
+        if dates is None:
+            tasks = self.get_tasks(tags)
+        else:
+            tasks = self.get_tasks_by_dates(dates[0], dates[1], tags)
+        return TaskStatistics(tasks).get_summary()
+
+    def find_task_by_name(self, task_name: str) -> bool:
+        """Returns True if task with this name exists otherwise False"""
+        return any(task.name == task_name for task in self.tasks)
+
+    def find_tasks_by_names(self, names: set) -> set:
+        """Returns names from names, that tasks of this storage have. It is
+        used to check many tasks at once, so storages, that look for a name
+        by reading all tasks, override it to read them once"""
+        return {name for name in names if self.find_task_by_name(name)}
+
+    def get_task_by_id(self, task_id: int) -> Task | None:
+        """Returns task by id if this task exist otherwise None"""
+        for task in self.tasks:
+            if task.id == task_id:
+                return task
+        return None
+
+    def move_task(self, task_id: int, storage) -> Task | None:
+        """Moves task by id from this storage to another storage. Returns
+        moved task or None if there is no task with this id"""
+        task = self.get_task_by_id(task_id)
+        if task is None:
+            return None
+        self.delete_task_by_id(task_id)
+        storage.add_task(task)
+        return task
+
+    @property
+    def tags(self) -> set:
+        """Returns all tags used at least once in this storage"""
+        tags = set()
+        for task in self.tasks:
+            tags |= task.tags
+        return tags
+
+    @property
+    def is_completed(self) -> bool:
+        return self.__is_completed
@@ -0,0 +1,55 @@
+from Task import Task
+
+
+class TagIndex:
+    """TagIndex is an inverted index from tag to ids of all tasks with this
+    tag. Tag is removed from index as soon as there are no tasks with it.
+    postings: dict - tag -> set of ids of tasks with this tag
+    """
+
+    def __init__(self, tasks=tuple()):
+        """Creates TagIndex object and indexes all tasks"""
+        self.__postings = dict()
+        for task in tasks:
+            self.add(task)
+
+    def add(self, task: Task):
+        """Adds task to postings of all its tags"""
+        for tag in task.tags:
+            self.__postings.setdefault(tag, set()).add(task.id)
+
+    def remove(self, task: Task):
+        """Removes task from postings of all its tags"""
+        for tag in task.tags:
+            posting = self.__postings.get(tag)
+            if posting is None:
+                continue
+            posting.discard(task.id)
+            if len(posting) == 0:
+                del self.__postings[tag]
+
+    def find(self, tags: set) -> set:
+        """Returns ids of tasks, that have all tags. Intersection starts from
+        the smallest posting"""
+        postings = []
+        for tag in tags:
+            posting = self.__postings.get(tag)
+            if posting is None:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+        ids = set(postings[0])
+        for posting in postings[1:]:
+            ids &= posting
+            if len(ids) == 0:
+                break
+        return ids
+
+    def count(self, tag: str) -> int:
+        """Returns number of tasks with tag"""
+        return len(self.__postings.get(tag, tuple()))
+
+    @property
+    def tags(self) -> set:
+        """Returns all tags used at least once"""
+        return set(self.__postings)
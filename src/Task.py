@@ -1,4 +1,6 @@
+import sys
 from datetime import datetime, date
+from functools import lru_cache
 
 from Globals import MessageConsts, TaskConsts
 
@@ -17,13 +19,59 @@ class Task:
      more important
     difficult: int (string that need to be int) - task difficult. The more,
     the more difficult
+    Task is compact: it has no __dict__, date is kept as ordinal of the day
+    and equal sets of tags are shared between tasks as one frozenset.
       """
 
+    __slots__ = ("__id", "__name", "__ordinal", "__tags", "__priority",
+                 "__difficult")
+    __interned_tags = dict()
+
     @staticmethod
-    def check_task_attributes(task_attributes: dict) -> str:
-        """Checks task attributes from user input for correctness and the
-        ability to create a task from them. If it is incorrect attributes
-        return error string, that describe which fields and why are incorrect"""
+    @lru_cache(maxsize=TaskConsts.date_cache_size)
+    def parse_date(date_str: str) -> int:
+        """Returns ordinal of date from string with date in
+        TaskConsts.Default.date_format"""
+        return datetime.strptime(date_str,
+                                 TaskConsts.Default.date_format).toordinal()
+
+    @staticmethod
+    @lru_cache(maxsize=TaskConsts.date_cache_size)
+    def format_date(ordinal: int) -> str:
+        """Returns string with date by its ordinal"""
+        return date.fromordinal(ordinal).strftime(
+            TaskConsts.Default.date_format)
+
+    @staticmethod
+    def intern_tags(tags) -> frozenset:
+        """Returns frozenset of tags shared by all tasks with the same tags"""
+        tags = frozenset(tags)
+        entry = Task.__interned_tags.get(tags)
+        if entry is None:
+            interned = frozenset(map(sys.intern, tags))
+            entry = (interned, tuple(interned))
+            Task.__interned_tags[interned] = entry
+        return entry[0]
+
+    @staticmethod
+    def make(task_id: int, name: str, ordinal: int, tags, priority: int,
+             difficult: int):
+        """Returns task by already checked and converted attributes without
+        parsing them"""
+        task = Task.__new__(Task)
+        task.__id = task_id
+        task.__name = name
+        task.__ordinal = ordinal
+        task.__tags = Task.intern_tags(tags)
+        task.__priority = priority
+        task.__difficult = difficult
+        return task
+
+    @staticmethod
+    def _check_fields_(task_attributes: dict) -> tuple:
+        """Checks task attributes for correctness in one pass. Returns error
+        string, that describe which fields and why are incorrect (empty if
+        they are correct), and ordinal of date (None if date is incorrect)"""
 
         def make_error_string(error: str, fields: list) -> str:
             """Creates an error message from error and fields in which it
@@ -46,11 +94,11 @@ class Task:
             else:
                 if int(task_attributes[field]) not in ranges[field]:
                     wrong_range_fields.append(field)
-        wrong_date = False
+        ordinal = None
         try:
-            datetime.strptime(task_attributes["date"], "%d.%m.%Y")
+            ordinal = Task.parse_date(task_attributes["date"])
         except ValueError:
-            wrong_date = True
+            pass
         errors = ""
         if len(empty_fields) > 0:
             errors += make_error_string(MessageConsts.empty_fields_text,
@@ -61,23 +109,49 @@ class Task:
         if len(wrong_range_fields) > 0:
             errors += make_error_string(MessageConsts.wrong_range_fields_text,
                                         wrong_range_fields)
-        if wrong_date:
+        if ordinal is None:
             errors += MessageConsts.wrong_date_text
-        return errors
+        return errors, ordinal
+
+    @staticmethod
+    def check_task_attributes(task_attributes: dict) -> str:
+        """Checks task attributes from user input for correctness and the
+        ability to create a task from them. If it is incorrect attributes
+        return error string, that describe which fields and why are incorrect"""
+        return Task._check_fields_(task_attributes)[0]
+
+    @staticmethod
+    def parse_task_attributes(task_attributes: dict) -> tuple:
+        """Checks task attributes and creates task from them in one pass, so
+        date is parsed once. Returns task and empty string if attributes are
+        correct otherwise None and the same error string as
+        check_task_attributes"""
+        errors, ordinal = Task._check_fields_(task_attributes)
+        if errors != "":
+            return None, errors
+        tags = filter(lambda tag: not tag.isspace(), task_attributes["tags"])
+        return Task.make(task_attributes["id"], task_attributes["name"],
+                         ordinal, tags, int(task_attributes["priority"]),
+                         int(task_attributes["difficult"])), ""
 
     def __init__(self, task_attributes: dict):
         """Creates Task object from task_attributes"""
         self.__id = task_attributes["id"]
         self.__name = task_attributes["name"]
-        self.__date = datetime.strptime(task_attributes["date"], "%d.%m.%Y")
+        self.__ordinal = Task.parse_date(task_attributes["date"])
         tags = filter(lambda tag: not tag.isspace(), task_attributes["tags"])
-        self.__tags = set(tags)
+        self.__tags = Task.intern_tags(tags)
         self.__priority = int(task_attributes["priority"])
         self.__difficult = int(task_attributes["difficult"])
 
     @property
     def date(self) -> date:
-        return self.__date
+        return date.fromordinal(self.__ordinal)
+
+    @property
+    def ordinal(self) -> int:
+        """Returns ordinal of date"""
+        return self.__ordinal
 
     @property
     def id(self) -> int:
@@ -88,7 +162,7 @@ class Task:
         return self.__name
 
     @property
-    def tags(self) -> set:
+    def tags(self) -> frozenset:
         return self.__tags
 
     @property
@@ -102,15 +176,12 @@ class Task:
     @property
     def date_str(self) -> str:
         """Returns string format date"""
-        return self.__date.strftime(TaskConsts.Default.date_format)
+        return Task.format_date(self.__ordinal)
 
     def get_attributes(self) -> dict:
-        """Returns task_attributes"""
-        task_attributes = dict()
-        task_attributes["id"] = self.__id
-        task_attributes["name"] = self.__name
-        task_attributes["date"] = self.date_str
-        task_attributes["tags"] = tuple(self.__tags)
-        task_attributes["priority"] = self.__priority
-        task_attributes["difficult"] = self.__difficult
-        return task_attributes
+        """Returns task_attributes, tuple of tags is shared by all tasks with
+        the same tags"""
+        return {"id": self.__id, "name": self.__name,
+                "date": Task.format_date(self.__ordinal),
+                "tags": Task.__interned_tags[self.__tags][1],
+                "priority": self.__priority, "difficult": self.__difficult}
@@ -1,106 +1,871 @@
+import atexit
 import json
+import os.path
+import random
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import date
 
-from Globals import PathConsts
+from ArchiveStore import ArchiveStore
+from BackgroundWriter import BackgroundWriter
+from ColumnarStore import ColumnarStore
+from FileLock import FileLock
+from Files import Files
+from Globals import MessageConsts, PathConsts, PersistenceConsts, \
+    PlannerConsts, ResultConsts, SearchConsts, StateConsts, StorageConsts, \
+    TaskConsts
+from Instrumentation import Instrumentation
 from Section import Section
+from SectionCache import SectionCache
+from SqliteStore import SqliteStore
+from Storage import Storage
 from Task import Task
+from TaskPlanner import TaskPlanner
+from TaskStore import TaskStore
+
+
+class TransactionRollback(Exception):
+    """Raised inside transaction to cancel it without error"""
+
+
+class TransactionConflict(Exception):
+    """Raised at commit of transaction if another process changed data
+    since the beginning of transaction"""
 
 
 class TaskManager:
-    """Engine of application, the main interface for interacting with tasks
+    """Engine of application, the main interface for interacting with tasks.
+    Several processes can work with the same data: each transaction reads
+    data under shared file lock and commits it under exclusive one, if data
+    version was changed by another process meanwhile, transaction is retried
+    with fresh data.
+    With background writes (see start_background_writes) transactions are
+    committed only in memory and persisted by writer thread, that writes
+    several transactions together. Ids of new tasks are taken from range
+    reserved in config file, so they can't be given by another process.
+    following_store: Storage - storage of all following tasks,
+    completed_store: Storage - storage of all completed tasks,
     following_section: Section - section with all following tasks,
     completed_section: Section - section with all completed tasks,
     current_section: Section - current section, that chosen by user,
+    sections: SectionCache - recently used sections with results of their
+    queries,
+    state: str - state of current section (see StateConsts),
     tags: set - all tags used at least once,
-    max_id: int - max current id of all tasks"""
+    max_id: int - max current id of all tasks,
+    version: int - version of data, that is increased by every commit,
+    config: dict - content of config file,
+    file_lock: FileLock - lock of data files shared between processes,
+    transaction_depth: int - number of nested transactions now,
+    config_changed: bool - was config changed in current transaction,
+    lock_held: bool - is exclusive file lock held by current transaction,
+    writer: BackgroundWriter - writer of committed transactions, None if
+    they are written at once,
+    reserved_from: int - max id before range reserved for new tasks of this
+    process in config file,
+    reserved_id: int - max id of this range,
+    next_reserved: tuple - range of ids (max id before it and max id of it)
+    reserved in advance by writer thread, None if there is no such range"""
 
     def __init__(self):
-        self.__following_section = Section()
-        self.__completed_section = Section(is_completed=True)
-        self.__current_section = self.__following_section
+        self.__file_lock = FileLock(PathConsts.path_to_lock)
+        self._load_config_()
+        if Instrumentation.is_requested(self.__config):
+            Instrumentation.enable()
+            Instrumentation.instrument([TaskManager, Section])
+        storage = self.__config.get("storage", StorageConsts.default_storage)
+        if storage == StorageConsts.sqlite_storage:
+            [self.__following_store, self.__completed_store] = \
+                self._get_sqlite_stores_(self.__file_lock)
+        else:
+            snapshot = self.__config.get("snapshot",
+                                         StorageConsts.default_snapshot)
+            self.__following_store = self._get_file_store_(
+                PathConsts.path_to_following,
+                PathConsts.path_to_following_columns, False, snapshot,
+                self.__file_lock)
+            if self.__config.get("archive", StorageConsts.archive):
+                self.__completed_store = self._get_archive_store_(
+                    self.__config, self.__file_lock)
+            else:
+                self.__completed_store = self._get_file_store_(
+                    PathConsts.path_to_completed,
+                    PathConsts.path_to_completed_columns, True, snapshot,
+                    self.__file_lock)
+        self.__following_section = Section(self.__following_store)
+        self.__completed_section = Section(self.__completed_store)
+        self.__sections = SectionCache(
+            self.__config.get("section_cache_tasks",
+                              StorageConsts.section_cache_tasks),
+            self.__config.get("section_cache_sections",
+                              StorageConsts.section_cache_sections))
+        self.__current_section = self.__sections.get_section(
+            self.__following_store)
+        self.__state = StateConsts.following
         self.__tags = set()
-        with open(PathConsts.path_to_config, 'r') as config:
+        self.__transaction_depth = 0
+        self.__config_changed = False
+        self.__lock_held = False
+        self.__writer = None
+        self.__reserved_from = 0
+        self.__reserved_id = 0
+        self.__next_reserved = None
+
+    @staticmethod
+    def _read_config_() -> dict:
+        """Returns content of config file"""
+        with Instrumentation.open(PathConsts.path_to_config,
+                                  'r') as config:
             config_json = config.read()
-            config = json.loads(config_json)
-        self.__max_id = int(config["max_id"])
+        return json.loads(config_json)
+
+    def _load_config_(self):
+        """Reads config, max_id and version of data from config file"""
+        self.__config = self._read_config_()
+        self.__max_id = int(self.__config["max_id"])
+        self.__version = int(self.__config.get("version", 0))
+
+    @staticmethod
+    def _get_sqlite_stores_(file_lock: FileLock) -> list[Storage]:
+        """Returns following and completed storages in SQLite database. At
+        the first start database is created and all tasks are migrated to it
+        from json files under exclusive file lock, so it is made once"""
+        with file_lock.exclusive():
+            need_migration = not os.path.exists(PathConsts.path_to_database)
+            connection = SqliteStore.connect(PathConsts.path_to_database)
+            if need_migration:
+                SqliteStore.migrate_from_json(
+                    connection, TaskStore(PathConsts.path_to_following),
+                    TaskStore(PathConsts.path_to_completed,
+                              is_completed=True))
+        following_store = SqliteStore(connection)
+        completed_store = SqliteStore(connection, is_completed=True)
+        return [following_store, completed_store]
+
+    @staticmethod
+    def _get_file_store_(path: str, columns_path: str, is_completed: bool,
+                         snapshot: str, file_lock: FileLock) -> Storage:
+        """Returns storage of tasks with this state in json file or in
+        columnar snapshot (see StorageConsts). When format of snapshot is
+        changed, tasks are converted to it from the other format under
+        exclusive file lock at the first start, so it is made once"""
+        if snapshot == StorageConsts.columnar_snapshot:
+            if not os.path.exists(columns_path):
+                with file_lock.exclusive():
+                    if not os.path.exists(columns_path):
+                        ColumnarStore.convert_from_json(path, columns_path)
+            return ColumnarStore(columns_path, is_completed)
+        if os.path.exists(columns_path):
+            with file_lock.exclusive():
+                if os.path.exists(columns_path):
+                    ColumnarStore.convert_to_json(columns_path, path)
+                    os.remove(columns_path)
+                    journal_path = columns_path + PathConsts.journal_extension
+                    if os.path.exists(journal_path):
+                        os.remove(journal_path)
+        return TaskStore(path, is_completed, file_lock=file_lock)
+
+    @staticmethod
+    def _get_archive_store_(config: dict, file_lock: FileLock) -> Storage:
+        """Returns storage of completed tasks partitioned by period. At the
+        first start all completed tasks are migrated to it from json file
+        under exclusive file lock, so it is made once"""
+        store = ArchiveStore(
+            PathConsts.path_to_archive,
+            config.get("archive_period", StorageConsts.archive_period),
+            config.get("archive_compression",
+                       StorageConsts.archive_compression))
+        with file_lock.exclusive():
+            if not store.exists:
+                tasks = []
+                if os.path.exists(PathConsts.path_to_completed_columns):
+                    tasks = ColumnarStore(
+                        PathConsts.path_to_completed_columns).tasks
+                elif os.path.exists(PathConsts.path_to_completed):
+                    tasks = TaskStore(PathConsts.path_to_completed,
+                                      is_completed=True).tasks
+                store.migrate(tasks)
+        return store
+
+    @contextmanager
+    def transaction(self, exclusive=False):
+        """Context manager, that makes all mutations inside it as one
+        transaction: each affected file is written once at the end, and if
+        error happens all mutations are rolled back. TransactionRollback
+        rolls back transaction silently. If another process changed data
+        since the beginning of transaction, it is rolled back at the end and
+        TransactionConflict is raised (see run_transaction). If exclusive is
+        True exclusive file lock is held during the whole transaction, so it
+        can't conflict, but other processes wait for it. Nested transactions
+        are parts of the outer one"""
+        if self.__transaction_depth > 0:
+            self.__transaction_depth += 1
+            try:
+                yield self
+            finally:
+                self.__transaction_depth -= 1
+            return
+        stores = [self.__following_store, self.__completed_store]
+        held_lock = self.__file_lock.exclusive() if exclusive \
+            else nullcontext()
+        with held_lock:
+            self.__lock_held = exclusive
+            if self.__writer is not None:
+                for store in stores:
+                    store.begin()
+            else:
+                with nullcontext() if exclusive \
+                        else self.__file_lock.shared():
+                    self._load_config_()
+                    for store in stores:
+                        store.begin()
+            max_id = self.__max_id
+            self.__transaction_depth = 1
+            self.__config_changed = False
+            try:
+                yield self
+            except BaseException as error:
+                for store in stores:
+                    store.rollback()
+                self.__max_id = max_id
+                self.__config["max_id"] = max_id
+                if not isinstance(error, TransactionRollback):
+                    raise
+            else:
+                self.__transaction_depth = 0
+                if self.__writer is not None:
+                    self._defer_commit_(stores)
+                else:
+                    self._commit_(stores)
+            finally:
+                self.__transaction_depth = 0
+                self.__lock_held = False
+
+    def _commit_(self, stores: list):
+        """Persists transaction under exclusive file lock. If version of data
+        was changed by another process, transaction is rolled back and
+        TransactionConflict is raised. Config with new version and max_id is
+        written before storages, so after crash id can't be given twice.
+        Storages, that get tasks, are written before storages, that lose
+        them, so crash between writes can only duplicate moved task but not
+        lose it"""
+        if not self.__config_changed and \
+                not any(store.has_pending_changes for store in stores):
+            for store in stores:
+                store.commit()
+            return
+        commit_lock = nullcontext() if self.__lock_held \
+            else self.__file_lock.exclusive()
+        with commit_lock:
+            version = int(self._read_config_().get("version", 0))
+            if version != self.__version:
+                for store in stores:
+                    store.rollback()
+                raise TransactionConflict()
+            self.__version += 1
+            self.__config["version"] = self.__version
+            self.__config["max_id"] = self.__max_id
+            self.__config_changed = False
+            Files.write_atomic(PathConsts.path_to_config,
+                               json.dumps(self.__config))
+            stores.sort(key=lambda store: not store.has_pending_additions)
+            for i, store in enumerate(stores):
+                try:
+                    store.commit()
+                except BaseException:
+                    for not_committed_store in stores[i + 1:]:
+                        not_committed_store.rollback()
+                    raise
+
+    def _defer_commit_(self, stores: list):
+        """Finishes transaction in memory and submits records of storages to
+        background writer. Config is written by writer too"""
+        changes = [(store, store.has_pending_additions, store.defer_commit())
+                   for store in stores if store.has_pending_changes]
+        for store in stores:
+            store.commit()
+        if len(changes) != 0:
+            self.__writer.submit(changes)
+
+    def _write_changes_(self, transactions: list):
+        """Writes changes of several transactions submitted to background
+        writer: config and every storage once. If another process changed
+        data meanwhile, changes are written anyway (they are replacements
+        and deletions of tasks by ids) and storages are read again. Storages,
+        that get tasks, are written first as in _commit_. Records of
+        storages, that are not written because of error, are discarded.
+        If less than PersistenceConsts.prefetch_ids reserved ids are left,
+        the next range is reserved in the same write, so thread, that makes
+        transactions, doesn't wait for config file when range is over"""
+        records = dict()
+        additions = dict()
+        for changes in transactions:
+            for store, has_additions, store_records in changes:
+                records.setdefault(store, []).extend(store_records)
+                additions[store] = additions.get(store, False) or \
+                    has_additions
+        stores = sorted(records, key=lambda store: not additions[store])
+        written = 0
+        try:
+            with self.__file_lock.exclusive():
+                config = self._read_config_()
+                version = int(config.get("version", 0))
+                changed = version != self.__version
+                self.__version = version + 1
+                self.__config["version"] = self.__version
+                max_id = max(int(config["max_id"]), self.__reserved_id)
+                next_reserved = None
+                if self.__reserved_id != 0 and \
+                        self.__next_reserved is None and \
+                        self.__reserved_id - max(self.__max_id,
+                                                 self.__reserved_from) < \
+                        PersistenceConsts.prefetch_ids:
+                    next_reserved = \
+                        (max_id, max_id + PersistenceConsts.reserved_ids)
+                    max_id = next_reserved[1]
+                self.__config["max_id"] = max_id
+                Files.write_atomic(PathConsts.path_to_config,
+                                   json.dumps(self.__config))
+                if next_reserved is not None:
+                    self.__next_reserved = next_reserved
+                for store in stores:
+                    store.write_deferred(records[store], reload=changed)
+                    written += 1
+        finally:
+            for store in stores[written:]:
+                store.discard_deferred(records[store])
+
+    def _reserve_ids_(self):
+        """Reserves PersistenceConsts.reserved_ids ids for new tasks of this
+        process in config file. Ids of other processes are given after
+        them. If writer thread has already reserved the next range, it is
+        taken without config file"""
+        if self.__next_reserved is None:
+            with self.__file_lock.exclusive():
+                if self.__next_reserved is None:
+                    config = self._read_config_()
+                    max_id = max(int(config["max_id"]), self.__reserved_id)
+                    self.__version = int(config.get("version", 0)) + 1
+                    self.__config["version"] = self.__version
+                    self.__config["max_id"] = \
+                        max_id + PersistenceConsts.reserved_ids
+                    Files.write_atomic(PathConsts.path_to_config,
+                                       json.dumps(self.__config))
+                    self.__next_reserved = \
+                        (max_id, self.__config["max_id"])
+        self.__reserved_from, self.__reserved_id = self.__next_reserved
+        self.__next_reserved = None
+
+    def reserve_ids(self):
+        """Reserves range of ids for new tasks in advance, if background
+        writes are started and there is no reserved range yet. Used by
+        caller, that can't wait for config file, when the first new task is
+        added"""
+        if self.__writer is not None and self.__reserved_id == 0:
+            self._reserve_ids_()
+
+    def _return_ids_(self):
+        """Gives unused ids of reserved range back to config file, if no
+        process reserved ids after it. Data isn't changed, so version stays
+        the same"""
+        if self.__reserved_id == 0:
+            return
+        last_reserved = self.__reserved_id
+        if self.__next_reserved is not None:
+            last_reserved = self.__next_reserved[1]
+        with self.__file_lock.exclusive():
+            config = self._read_config_()
+            if int(config["max_id"]) == last_reserved:
+                config["max_id"] = max(self.__max_id, self.__reserved_from)
+                Files.write_atomic(PathConsts.path_to_config,
+                                   json.dumps(config))
+        self.__reserved_from = 0
+        self.__reserved_id = 0
+        self.__next_reserved = None
+
+    def _get_new_id_(self) -> int:
+        """Returns id for new task. With background writes id is taken from
+        reserved range, that is reserved when the first id is needed and
+        extended when it is over"""
+        if self.__writer is None:
+            return self.__max_id + 1
+        if self.__max_id >= self.__reserved_id:
+            self._reserve_ids_()
+        return max(self.__max_id, self.__reserved_from) + 1
+
+    def start_background_writes(self) -> bool:
+        """Makes all next transactions to be persisted by background writer
+        thread, so caller never waits for disk. Returns False if storages
+        can't defer writes (see Storage.supports_deferred_writes), then
+        transactions are written at once as before. Writer is flushed by
+        close and at exit of interpreter"""
+        if self.__writer is not None:
+            return True
+        if not (self.__following_store.supports_deferred_writes and
+                self.__completed_store.supports_deferred_writes):
+            return False
+        self._load_config_()
+        self.__writer = BackgroundWriter(self._write_changes_)
+        atexit.register(self.flush)
+        return True
+
+    def flush(self):
+        """Waits until all transactions submitted to background writer are
+        written"""
+        if self.__writer is not None:
+            self.__writer.flush()
+
+    def take_write_errors(self) -> list:
+        """Returns errors of background writer since the last call, changes
+        of failed writes are lost and storages are read from disk again"""
+        if self.__writer is None:
+            return []
+        return self.__writer.take_errors()
+
+    def run_transaction(self, function, *arguments):
+        """Calls function with arguments in transaction and returns its
+        result (None if transaction was rolled back by TransactionRollback).
+        If another process changed data meanwhile, function is called again
+        with fresh data after random delay, so function must be safe to
+        repeat. After StorageConsts.max_retries conflicts the last attempt is
+        made under exclusive lock, so it always succeeds. Inside another
+        transaction function is just called, conflict is handled by the outer
+        transaction"""
+        if self.__transaction_depth > 0:
+            return function(*arguments)
+        for attempt in range(StorageConsts.max_retries + 1):
+            result = None
+            try:
+                with self.transaction(
+                        exclusive=attempt == StorageConsts.max_retries):
+                    result = function(*arguments)
+                return result
+            except TransactionConflict:
+                time.sleep(StorageConsts.retry_delay * (attempt + 1) *
+                           random.random())
 
     def check(self, task_id: int):
         """Marks the task by id as completed,
         used only by section with following state"""
-        task = self.__following_section.get_task_by_id(task_id)
-        self.__following_section.delete_task_by_id(task_id)
-        self.__completed_section.add_task(task)
+        self.run_transaction(self.__following_store.move_task, task_id,
+                             self.__completed_store)
 
     def uncheck(self, task_id: int):
         """Unmarks the task by id, makes it following,
         used only by section with completed state"""
-        task = self.__completed_section.get_task_by_id(task_id)
-        self.__completed_section.delete_task_by_id(task_id)
-        self.__following_section.add_task(task)
+        self.run_transaction(self.__completed_store.move_task, task_id,
+                             self.__following_store)
 
     def add_task(self, task_attributes, is_completed=True, in_any_case=False):
         """Add task by task_attributes to completed or following section,
         depends on value of is_completed
          If is_any_case is False doesn't add task if task with this name
          already exist otherwise add in any case"""
-        new_task = False
-        if task_attributes["id"] is None:
-            task_attributes["id"] = self.__max_id + 1
-            new_task = True
-        task = Task(task_attributes)
-        if is_completed:
-            already_exists = \
-                self.__completed_section.find_task_by_name(task.name)
-        else:
-            already_exists = \
-                self.__following_section.find_task_by_name(task.name)
-        if already_exists and not in_any_case:
-            return False
-        if is_completed:
-            self.__completed_section.add_task(task)
-        else:
-            self.__following_section.add_task(task)
-        if new_task:
-            self.__max_id += 1
-        self.update_config()
-        return True
+        task_id = task_attributes["id"]
+
+        def add() -> bool:
+            task_attributes["id"] = task_id
+            new_task = False
+            if task_id is None:
+                task_attributes["id"] = self._get_new_id_()
+                new_task = True
+            task = Task(task_attributes)
+            if is_completed:
+                already_exists = \
+                    self.__completed_section.find_task_by_name(task.name)
+            else:
+                already_exists = \
+                    self.__following_section.find_task_by_name(task.name)
+            if already_exists and not in_any_case:
+                return False
+            if is_completed:
+                self.__completed_section.add_task(task)
+            else:
+                self.__following_section.add_task(task)
+            if new_task:
+                self.__max_id = task.id
+            self.update_config()
+            return True
+
+        return self.run_transaction(add)
+
+    def change_task(self, task_id: int, task_attributes: dict,
+                    in_any_case=False) -> bool:
+        """Replaces task by id from current section with task made from
+        task_attributes as one transaction. If in_any_case is False doesn't
+        change task if another task with new name already exists"""
+        task_attributes["id"] = task_id
+
+        def change() -> bool:
+            self.delete_task_by_id(task_id)
+            done = self.add_task(task_attributes,
+                                 is_completed=self.is_completed,
+                                 in_any_case=in_any_case)
+            if not done:
+                raise TransactionRollback()
+            return done
+
+        return bool(self.run_transaction(change))
+
+    def add_many(self, tasks_attributes: list, is_completed=False,
+                 in_any_case=False) -> list:
+        """Adds tasks by list of task_attributes as one transaction, so each
+        file is written once. Returns result for each task: created, duplicate
+        (task with this name already exists and in_any_case is False) or
+        invalid (task_attributes are incorrect)"""
+        for task_attributes in tasks_attributes:
+            task_attributes.setdefault("id", None)
+        tasks_ids = [task_attributes["id"]
+                     for task_attributes in tasks_attributes]
 
-    def get_tasks(self) -> list:
-        """Returns all tasks from this section"""
-        return self.__current_section.get_tasks()
+        def add_all() -> list:
+            results = []
+            for task_attributes, task_id in zip(tasks_attributes, tasks_ids):
+                task_attributes["id"] = task_id
+                errors = MessageConsts.wrong_attributes_text
+                if all(map(lambda attribute: attribute in task_attributes,
+                           TaskConsts.attributes)):
+                    try:
+                        errors = Task.check_task_attributes(task_attributes)
+                    except TypeError:
+                        pass
+                if errors != "":
+                    results.append(ResultConsts.invalid)
+                    continue
+                done = self.add_task(task_attributes,
+                                     is_completed=is_completed,
+                                     in_any_case=in_any_case)
+                if done:
+                    results.append(ResultConsts.created)
+                else:
+                    results.append(ResultConsts.duplicate)
+            return results
+
+        return self.run_transaction(add_all)
+
+    def import_tasks(self, tasks: list, in_any_case=False) -> list:
+        """Adds already checked tasks (see Task.parse_task_attributes) as one
+        transaction, so each file is written once. tasks is list of (task,
+        is_completed), ids of tasks are ignored and new ids are given.
+        Returns result for each task: created or duplicate (task with this
+        name and state already exists and in_any_case is False)"""
+
+        def import_all() -> list:
+            results = []
+            existing = dict()
+            if not in_any_case:
+                for section in (self.__following_section,
+                                self.__completed_section):
+                    existing[section.is_completed] = \
+                        section.find_tasks_by_names(
+                            {task.name for task, is_completed in tasks
+                             if is_completed == section.is_completed})
+            for task, is_completed in tasks:
+                if is_completed:
+                    section = self.__completed_section
+                else:
+                    section = self.__following_section
+                if not in_any_case:
+                    if task.name in existing[is_completed]:
+                        results.append(ResultConsts.duplicate)
+                        continue
+                    existing[is_completed].add(task.name)
+                task_id = self._get_new_id_()
+                section.add_task(Task.make(task_id, task.name, task.ordinal,
+                                           task.tags, task.priority,
+                                           task.difficult))
+                self.__max_id = task_id
+                results.append(ResultConsts.created)
+            self.update_config()
+            return results
+
+        return self.run_transaction(import_all)
+
+    def iterate_tasks(self, is_completed: bool, page_size: int):
+        """Yields all tasks with this state in sorted order page by page, so
+        storages, that build tasks lazily, build only one page at once.
+        Shared file lock is held until the end, so other processes can't
+        change tasks between pages"""
+        store = self._get_store_(is_completed)
+        with self.__file_lock.shared():
+            offset = 0
+            while True:
+                tasks = store.get_tasks_page(frozenset(), offset, page_size)
+                yield from tasks
+                if len(tasks) < page_size:
+                    return
+                offset += page_size
+
+    def check_many(self, tasks_ids: list) -> list:
+        """Marks tasks by ids as completed as one transaction. Returns result
+        for each task: done or not_found"""
+        return self.run_transaction(lambda: [
+            self._move_result_(self.__following_store.move_task(
+                task_id, self.__completed_store)) for task_id in tasks_ids])
+
+    def uncheck_many(self, tasks_ids: list) -> list:
+        """Makes tasks by ids following as one transaction. Returns result
+        for each task: done or not_found"""
+        return self.run_transaction(lambda: [
+            self._move_result_(self.__completed_store.move_task(
+                task_id, self.__following_store)) for task_id in tasks_ids])
+
+    def delete_many(self, tasks_ids: list, is_completed=None) -> list:
+        """Deletes tasks by ids with state is_completed (state of current
+        section if it is None) as one transaction. Returns result for each
+        task: done or not_found"""
+        if is_completed is None:
+            is_completed = self.is_completed
+        store = self._get_store_(is_completed)
+
+        def delete_all() -> list:
+            results = []
+            for task_id in tasks_ids:
+                if store.get_task_by_id(task_id) is None:
+                    results.append(ResultConsts.not_found)
+                    continue
+                store.delete_task_by_id(task_id)
+                results.append(ResultConsts.done)
+            return results
+
+        return self.run_transaction(delete_all)
+
+    @staticmethod
+    def _move_result_(task: Task | None) -> str:
+        """Returns result of moving of task by moved task"""
+        if task is None:
+            return ResultConsts.not_found
+        return ResultConsts.done
+
+    def get_tasks(self, offset=0, limit=None) -> list:
+        """Returns tasks from this section, if limit is given returns only
+        limit tasks starting from offset position"""
+        if limit is None:
+            return self.__current_section.get_tasks()[offset:]
+        return self.__current_section.get_tasks_page(offset, limit)
+
+    def count_tasks(self) -> int:
+        """Returns number of tasks in this section"""
+        return self.__current_section.count_tasks()
+
+    def get_date_position(self, date_str: str) -> int:
+        """Returns position of the first task of this section with date
+        date_str or later"""
+        ordinal = Task.parse_date(date_str)
+        return self.__current_section.count_tasks_before(ordinal)
+
+    def search_tasks(self, query: str, limit=SearchConsts.limit) -> list:
+        """Returns limit tasks of this section, whose name or tag contains
+        query ignoring case. Tasks, whose name starts with query, are the
+        first, then tasks, whose name contains it, then tasks with tag, that
+        starts with or contains it, tasks with the same rank are ordered by
+        date, priority and difficult"""
+        query = query.strip().lower()
+        if len(query) == 0:
+            return []
+        return self.__current_section.search_tasks(query, limit)
 
     def get_task_by_id(self, task_id: int) -> Task:
         """Returns task from this section by id"""
         return self.__current_section.get_task_by_id(task_id)
 
-    def change_section_tags(self, tags: list, is_completed: bool):
+    def _get_store_(self, is_completed: bool) -> Storage:
+        """Returns storage of completed or following tasks"""
+        if is_completed:
+            return self.__completed_store
+        return self.__following_store
+
+    def get_section(self, tags: list, is_completed: bool,
+                    dates=None) -> Section:
+        """Returns section with tags, state is_completed and range of dates
+        (see change_section_tags) without changing current section, so
+        several clients of one engine can read different sections"""
+        return self.__sections.get_section(self._get_store_(is_completed),
+                                           tags, dates)
+
+    def change_section_tags(self, tags: list, is_completed: bool,
+                            dates=None):
         """Changes current section to section with needed tags and needed
-        state depends on tags and is_completed value"""
-        self.__current_section = Section(tags, is_completed=is_completed)
+        state depends on tags and is_completed value, if dates (ordinals of
+        the first and the last dates) are given only with dates from this
+        range. Recently used section is taken from cache of sections with
+        results of its queries, that are valid until its storage is
+        changed"""
+        self.__current_section = self.__sections.get_section(
+            self._get_store_(is_completed), tags, dates)
+        if is_completed:
+            self.__state = StateConsts.completed
+        else:
+            self.__state = StateConsts.following
+
+    @staticmethod
+    def get_state_dates(state: str) -> tuple | None:
+        """Returns ordinals of the first and the last dates of tasks of
+        section state (see StateConsts) counted from today or None if state
+        isn't limited by dates"""
+        today = date.today().toordinal()
+        if state == StateConsts.overdue:
+            return TaskConsts.Default.minimal_date.toordinal(), today - 1
+        if state == StateConsts.due_soon:
+            return today, today + StateConsts.due_days
+        return None
+
+    def change_section_state(self, tags: list, state: str):
+        """Changes current section to section with needed tags and state
+        (see StateConsts). Overdue tasks and tasks due soon are following
+        tasks with dates before today and in StateConsts.due_days days from
+        today"""
+        self.change_section_tags(tags, state == StateConsts.completed,
+                                 self.get_state_dates(state))
+        self.__state = state
+
+    def get_tasks_by_dates(self, first_date_str: str, last_date_str: str,
+                           tags=None, is_completed=False) -> list:
+        """Returns sorted list of tasks with date from first_date_str to
+        last_date_str inclusive, that have all tags. Tasks are found by
+        binary search by date, not by scan of all tasks"""
+        first_ordinal = Task.parse_date(first_date_str)
+        last_ordinal = Task.parse_date(last_date_str)
+        return self._get_store_(is_completed).get_tasks_by_dates(
+            first_ordinal, last_ordinal, set(tags or []))
+
+    def get_overdue_tasks(self, tags=None) -> list:
+        """Returns sorted list of following tasks with date before today,
+        that have all tags"""
+        [first_ordinal, last_ordinal] = \
+            self.get_state_dates(StateConsts.overdue)
+        return self.__following_store.get_tasks_by_dates(
+            first_ordinal, last_ordinal, set(tags or []))
+
+    def get_tasks_due_within(self, days: int, tags=None) -> list:
+        """Returns sorted list of following tasks with date from today to
+        days days from today inclusive, that have all tags"""
+        today = date.today().toordinal()
+        return self.__following_store.get_tasks_by_dates(
+            today, today + days, set(tags or []))
+
+    @staticmethod
+    def _get_rate_(completed: int, following: int) -> float:
+        """Returns share of completed tasks, 0 if there are no tasks"""
+        if completed + following == 0:
+            return 0.0
+        return completed / (completed + following)
+
+    def get_statistics(self, first_date_str=None, last_date_str=None,
+                       tags=None) -> dict:
+        """Returns statistics of tasks, that have all tags, with date from
+        first_date_str to last_date_str inclusive (range isn't limited from
+        side, whose date isn't given): number of tasks and sum of their
+        difficult of every state, completion rate, number of tasks of every
+        state with every priority and with every tag and for every day with
+        tasks its date, number of tasks of every state, difficult of
+        following tasks due this day and completion rate. Statistics of all
+        tasks is kept by storages and updated by every change of tasks"""
+        dates = None
+        if first_date_str is not None or last_date_str is not None:
+            dates = (TaskConsts.Default.minimal_date.toordinal(),
+                     date.max.toordinal())
+            if first_date_str is not None:
+                dates = (Task.parse_date(first_date_str), dates[1])
+            if last_date_str is not None:
+                dates = (dates[0], Task.parse_date(last_date_str))
+        tags = set(tags or [])
+        summaries = {
+            StateConsts.following:
+                self.__following_store.get_statistics(tags, dates),
+            StateConsts.completed:
+                self.__completed_store.get_statistics(tags, dates)}
+        statistics = {state: {"tasks": summary["tasks"],
+                              "difficult": summary["difficult"]}
+                      for state, summary in summaries.items()}
+        statistics["completion_rate"] = self._get_rate_(
+            statistics[StateConsts.completed]["tasks"],
+            statistics[StateConsts.following]["tasks"])
+        statistics.update(priorities=dict(), tags=dict(), days=[])
+        for state, summary in summaries.items():
+            for field in ("priorities", "tags"):
+                for key, count in summary[field].items():
+                    counts = statistics[field].setdefault(
+                        key, {StateConsts.following: 0,
+                              StateConsts.completed: 0})
+                    counts[state] = count
+        following = summaries[StateConsts.following]["days"]
+        completed = summaries[StateConsts.completed]["days"]
+        for ordinal in sorted(following.keys() | completed.keys()):
+            following_tasks, difficult = following.get(ordinal, (0, 0))
+            completed_tasks = completed.get(ordinal, (0, 0))[0]
+            statistics["days"].append({
+                "date": Task.format_date(ordinal),
+                StateConsts.following: following_tasks,
+                StateConsts.completed: completed_tasks,
+                "difficult": difficult,
+                "completion_rate": self._get_rate_(completed_tasks,
+                                                   following_tasks)})
+        return statistics
+
+    def plan_tasks(self, budget=PlannerConsts.budget,
+                   limit=PlannerConsts.limit, tags=None) -> list:
+        """Returns plan of what to do next: no more than limit following
+        tasks, that have all tags, whose sum of difficult fits to budget,
+        picked by priority and closeness of date, every task with
+        explanation (see TaskPlanner.plan). Shared file lock is held while
+        tasks are read, so other processes can't change them between
+        pages"""
+        planner = TaskPlanner(self.__following_store,
+                              date.today().toordinal(), budget, limit, tags)
+        with self.__file_lock.shared():
+            return planner.plan()
 
     def delete_task_by_id(self, task_id):
         """Deletes task by id"""
         if self.is_completed:
-            self.__completed_section.delete_task_by_id(task_id)
+            section = self.__completed_section
         else:
-            self.__following_section.delete_task_by_id(task_id)
+            section = self.__following_section
+        self.run_transaction(section.delete_task_by_id, task_id)
+
+    def close(self):
+        """Writes all changes submitted to background writer, gives back
+        unused reserved ids and finishes all background work of
+        storages"""
+        if self.__writer is not None:
+            self.__writer.close()
+            atexit.unregister(self.flush)
+            self.__writer = None
+            self._return_ids_()
+        self.__following_store.close()
+        self.__completed_store.close()
 
     def update_config(self):
-        """Update info about max_id in config file"""
-        new_config = dict()
-        new_config["max_id"] = self.__max_id
-        with open(PathConsts.path_to_config, 'w', encoding="UTF-8") as config:
-            config.write(json.dumps(new_config))
+        """Writes max_id to config file with new version of data, during
+        transaction config is written only at commit"""
+        with self.transaction():
+            self.__config_changed = True
+
+    @property
+    def storage_versions(self) -> tuple:
+        """Returns versions of storages of following and completed tasks
+        (see Storage.version), results of queries are the same until they
+        are changed"""
+        return self.__following_store.version, self.__completed_store.version
 
     @property
     def tags(self) -> list:
         """Returns all tags used at least once"""
-        self.__tags = set()
-        for task in self.__following_section.get_tasks():
-            self.__tags |= task.tags
-        for task in self.__completed_section.get_tasks():
-            self.__tags |= task.tags
+        self.__tags = self.__following_store.tags | self.__completed_store.tags
         return list(self.__tags)
 
+    @property
+    def cache_statistics(self) -> dict:
+        """Returns number of hits and misses of cache of sections and its
+        size (see SectionCache.statistics)"""
+        return self.__sections.statistics
+
+    @property
+    def state(self) -> str:
+        """Returns state of current section (see StateConsts)"""
+        return self.__state
+
     def get_section_tags(self) -> list:
         """Returns all tags of current_section"""
         return list(self.__current_section.tags)
@@ -0,0 +1,166 @@
+import heapq
+
+from Globals import PlannerConsts, TaskConsts
+from Storage import Storage
+from Task import Task
+
+
+class TaskPlanner:
+    """TaskPlanner chooses what to do next: no more than limit following
+    tasks, whose sum of difficult fits to budget of day, with the most sum
+    of scores. Score of task is weight of its priority multiplied by urgency
+    of its date: urgency is 1 for overdue tasks and tasks due today and
+    horizon / (horizon + days left) for later tasks. Tasks are picked
+    greedily by score per point of difficult, task, that doesn't fit to the
+    rest of budget, is skipped. Tasks with the same score per point are
+    ordered by date, priority and id. Tasks with score less than
+    PlannerConsts.min_score are too far to plan them, so budget of day can
+    stay partly unused.
+    Not all tasks are ranked: for every difficult only limit best tasks are
+    kept in bounded heap, greedy picking from them gives the same plan as
+    from all tasks, because task, that isn't among limit best tasks with its
+    difficult, could be picked only after all of them. Tasks are read page by
+    page in order of dates and reading stops as soon as no later task can
+    change plan: urgency only decreases with date, so score per point of
+    later tasks is bound by score of the best priority due the last read
+    date, or as soon as no later task has score enough to be planned.
+    store: Storage - storage of following tasks,
+    today: int - ordinal of today,
+    budget: int - max sum of difficult of planned tasks,
+    limit: int - max number of planned tasks,
+    tags: set - tags, that planned tasks must have
+    """
+
+    def __init__(self, store: Storage, today: int,
+                 budget=PlannerConsts.budget, limit=PlannerConsts.limit,
+                 tags=None):
+        """Creates TaskPlanner object for storage of following tasks"""
+        self.__store = store
+        self.__today = today
+        self.__budget = budget
+        self.__limit = limit
+        self.__tags = set(tags or [])
+
+    @staticmethod
+    def get_urgency(days_left: int) -> float:
+        """Returns urgency of task due in days_left days"""
+        if days_left <= 0:
+            return 1.0
+        return PlannerConsts.horizon / (PlannerConsts.horizon + days_left)
+
+    def get_score(self, task: Task) -> float:
+        """Returns score of task: weight of its priority multiplied by
+        urgency of its date"""
+        return PlannerConsts.priority_weights[task.priority] * \
+            self.get_urgency(task.ordinal - self.__today)
+
+    def get_rank(self, task: Task) -> tuple:
+        """Returns rank of task for greedy picking, the greater the
+        better"""
+        return (self.get_score(task) / task.difficult, -task.ordinal,
+                -task.priority, -task.id)
+
+    def get_bound(self, ordinal: int, difficult: int) -> tuple:
+        """Returns rank, that is greater than rank of any task with
+        difficult and date ordinal or later"""
+        return (max(PlannerConsts.priority_weights.values()) *
+                self.get_urgency(ordinal - self.__today) / difficult,
+                0.5 - ordinal)
+
+    def _pick_(self, candidates: list) -> list:
+        """Returns picked tasks of candidates (pairs of rank and task) with
+        the rest of budget after every task"""
+        picks = []
+        budget = self.__budget
+        for rank, task in sorted(candidates, key=lambda pair: pair[0],
+                                 reverse=True):
+            if len(picks) == self.__limit or budget == 0:
+                break
+            if task.difficult <= budget:
+                budget -= task.difficult
+                picks.append((task, budget))
+        return picks
+
+    def _is_final_(self, heaps: dict, ordinal: int) -> bool:
+        """Returns True if no task with date ordinal or later can change
+        plan of tasks from heaps: all better tasks with its difficult are
+        in heap, or after all tasks, whose rank is greater than its bound,
+        are picked, there is no room for it. Also returns True if score of
+        any task with date ordinal or later is less than min score"""
+        if self.get_bound(ordinal, 1)[0] < PlannerConsts.min_score:
+            return True
+        candidates = sorted((pair for heap in heaps.values()
+                             for pair in heap),
+                            key=lambda pair: pair[0], reverse=True)
+        for difficult, heap in heaps.items():
+            bound = self.get_bound(ordinal, difficult)
+            if len(heap) == self.__limit and heap[0][0] > bound:
+                continue
+            picks, budget = 0, self.__budget
+            for rank, task in candidates:
+                if rank < bound or picks == self.__limit:
+                    break
+                if task.difficult <= budget:
+                    budget -= task.difficult
+                    picks += 1
+            if picks < self.__limit and difficult <= budget:
+                return False
+        return True
+
+    def _collect_(self) -> list:
+        """Returns candidates (pairs of rank and task): limit best tasks
+        with every difficult, that fits to budget, and score not less than
+        min score. Pages of tasks grow twice
+        up to PlannerConsts.max_page_size, so reading is linear even for
+        storages, that find page with tags by list of all tasks with them"""
+        heaps = {difficult: [] for difficult in TaskConsts.Ranges.difficult
+                 if difficult <= self.__budget}
+        offset, page_size = 0, PlannerConsts.page_size
+        while len(heaps) != 0 and self.__limit > 0:
+            tasks = self.__store.get_tasks_page(self.__tags, offset,
+                                                page_size)
+            for task in tasks:
+                heap = heaps.get(task.difficult)
+                if heap is None or \
+                        self.get_score(task) < PlannerConsts.min_score:
+                    continue
+                pair = (self.get_rank(task), task)
+                if len(heap) < self.__limit:
+                    heapq.heappush(heap, pair)
+                elif pair[0] > heap[0][0]:
+                    heapq.heapreplace(heap, pair)
+            if len(tasks) < page_size or \
+                    self._is_final_(heaps, tasks[-1].ordinal):
+                break
+            offset += page_size
+            page_size = min(page_size * 2, PlannerConsts.max_page_size)
+        return [pair for heap in heaps.values() for pair in heap]
+
+    def explain(self, task: Task, budget_left: int) -> str:
+        """Returns explanation, why task is planned"""
+        days_left = task.ordinal - self.__today
+        days = f"{abs(days_left)} day" + ("s" if abs(days_left) != 1 else "")
+        if days_left < 0:
+            due = f"overdue by {days}"
+        elif days_left == 0:
+            due = "due today"
+        else:
+            due = f"due in {days}"
+        weight = PlannerConsts.priority_weights[task.priority]
+        urgency = self.get_urgency(days_left)
+        return f"{due}, priority {task.priority}: score {weight:g} x " \
+               f"{urgency:.2f} = {weight * urgency:.2f}, " \
+               f"{weight * urgency / task.difficult:.2f} per point of " \
+               f"difficult {task.difficult}, {budget_left} of " \
+               f"{self.__budget} points left"
+
+    def plan(self) -> list:
+        """Returns plan: list of dicts with picked task (task), its score
+        (score), score per point of difficult (density), the rest of budget
+        after it (budget_left) and explanation (explanation) in order of
+        picking"""
+        return [{"task": task, "score": self.get_score(task),
+                 "density": self.get_score(task) / task.difficult,
+                 "budget_left": budget_left,
+                 "explanation": self.explain(task, budget_left)}
+                for task, budget_left in self._pick_(self._collect_())]
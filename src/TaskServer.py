@@ -0,0 +1,453 @@
+import asyncio
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from Globals import MessageConsts, PersistenceConsts, ResultConsts, \
+    ServerConsts, TaskConsts
+from Task import Task
+from TaskManager import TaskManager
+
+
+class HttpError(Exception):
+    """Error of request, that is sent to client as response with status.
+    status: int - HTTP status of response"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class TaskServer:
+    """TaskServer is a local HTTP server with json API over one TaskManager,
+    so several clients can work with the same tasks. All mutations are put
+    to queue and executed by single writer, that takes all queued mutations
+    at once and executes them as one transaction, so burst of mutations is
+    persisted once. Reads are served from memory without queue and don't
+    change current section of engine. Event loop never waits for disk: if
+    storages can defer writes, batch is only applied in memory and is
+    persisted by background writer of engine (see
+    TaskManager.start_background_writes), otherwise all calls of engine are
+    made in its own thread. Each executed batch of mutations increases
+    version, clients can wait for changes after version by long polling
+    (/changes) or get them as stream of server-sent events (/events). If
+    background write fails, storages are read again and history of changes
+    is dropped, so clients get reset.
+    manager: TaskManager - engine of application,
+    host: str - host of TCP server,
+    port: int - port of TCP server (0 for any free port),
+    unix_path: str - path to unix socket, if it is given server listens to it
+    instead of TCP port,
+    queue: asyncio.Queue - queue of mutations and their futures,
+    executor: ThreadPoolExecutor - thread of engine, None if changes are
+    persisted by background writer,
+    version: int - number of executed batches with changes,
+    changes: deque - last versions and their changes,
+    changed: asyncio.Condition - condition of new version,
+    server: asyncio.Server - started server,
+    writer_task: asyncio.Task - task of single writer,
+    streams: set - tasks of clients, that get stream of events
+    """
+
+    statuses = {200: "OK", 400: "Bad Request", 404: "Not Found",
+                405: "Method Not Allowed", 413: "Payload Too Large",
+                500: "Internal Server Error"}
+
+    def __init__(self, manager: TaskManager, host=ServerConsts.host,
+                 port=ServerConsts.port, unix_path=None):
+        """Creates TaskServer object, server is started by start"""
+        self.__manager = manager
+        self.__host = host
+        self.__port = port
+        self.__unix_path = unix_path
+        self.__queue = None
+        self.__executor = None
+        self.__version = 0
+        self.__changes = deque(maxlen=ServerConsts.changes_history)
+        self.__changed = None
+        self.__server = None
+        self.__writer_task = None
+        self.__streams = set()
+
+    async def start(self) -> asyncio.Server:
+        """Starts server and single writer in running event loop. With
+        background writes ids for new tasks are reserved in advance in
+        another thread"""
+        self.__queue = asyncio.Queue()
+        if not self.__manager.start_background_writes():
+            self.__executor = ThreadPoolExecutor(max_workers=1)
+        else:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.__manager.reserve_ids)
+        self.__changed = asyncio.Condition()
+        self.__writer_task = asyncio.create_task(self._write_loop_())
+        if self.__unix_path is not None:
+            self.__server = await asyncio.start_unix_server(
+                self._handle_connection_, path=self.__unix_path)
+        else:
+            self.__server = await asyncio.start_server(
+                self._handle_connection_, self.__host, self.__port)
+        return self.__server
+
+    async def stop(self):
+        """Stops server, streams of events and single writer"""
+        self.__server.close()
+        for stream in self.__streams:
+            stream.cancel()
+        await asyncio.gather(*self.__streams, return_exceptions=True)
+        await self.__server.wait_closed()
+        self.__writer_task.cancel()
+        try:
+            await self.__writer_task
+        except asyncio.CancelledError:
+            pass
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+
+    async def serve_forever(self):
+        """Starts server if it is not started yet and serves clients until
+        cancellation"""
+        if self.__server is None:
+            await self.start()
+        try:
+            await self.__server.serve_forever()
+        finally:
+            await self.stop()
+
+    @property
+    def address(self):
+        """Returns address, that server listens to"""
+        return self.__server.sockets[0].getsockname()
+
+    @property
+    def version(self) -> int:
+        return self.__version
+
+    async def _call_(self, function, *arguments):
+        """Returns result of function, that uses engine: it is called at once
+        if changes are persisted by background writer, otherwise in thread of
+        engine, so event loop doesn't wait for disk"""
+        if self.__executor is None:
+            return function(*arguments)
+        return await asyncio.get_running_loop().run_in_executor(
+            self.__executor, function, *arguments)
+
+    async def _write_loop_(self):
+        """Single writer: waits for mutation, takes all mutations queued
+        during short delay, executes them as one batch and sets their
+        futures. Errors of background writer are checked while it waits"""
+        timeout = None if self.__executor is not None \
+            else PersistenceConsts.errors_poll_timeout / 1000
+        while True:
+            try:
+                batch = [await asyncio.wait_for(self.__queue.get(), timeout)]
+            except asyncio.TimeoutError:
+                batch = []
+            if len(self.__manager.take_write_errors()) != 0:
+                await self._reset_()
+            if len(batch) == 0:
+                continue
+            await asyncio.sleep(ServerConsts.coalesce_delay)
+            while not self.__queue.empty():
+                batch.append(self.__queue.get_nowait())
+            results, changes = await self._call_(
+                self._execute_batch_, [operation for operation, _ in batch])
+            for (_, future), result in zip(batch, results):
+                if future.cancelled():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            if len(changes) > 0:
+                await self._publish_(changes)
+
+    def _execute_batch_(self, operations: list) -> tuple:
+        """Executes mutations as one transaction. If some mutation fails,
+        batch is rolled back and mutations are executed one by one, so only
+        failed mutation gets error. Returns results (or errors) of mutations
+        and changes made by them"""
+        changes = []
+
+        def execute(operations: list, operations_changes: list) -> list:
+            operations_changes.clear()
+            return [operation(operations_changes) for operation in operations]
+
+        try:
+            results = self.__manager.run_transaction(execute, operations,
+                                                     changes)
+        except Exception:
+            changes = []
+            results = []
+            for operation in operations:
+                operation_changes = []
+                try:
+                    results.extend(self.__manager.run_transaction(
+                        execute, [operation], operation_changes))
+                    changes.extend(operation_changes)
+                except Exception as error:
+                    results.append(error)
+        return results, changes
+
+    async def _publish_(self, changes: list):
+        """Makes new version with changes and wakes up waiting clients"""
+        self.__version += 1
+        self.__changes.append((self.__version, changes))
+        async with self.__changed:
+            self.__changed.notify_all()
+
+    async def _reset_(self):
+        """Makes new version without history of changes after failed
+        background write, so clients read all tasks again"""
+        self.__changes.clear()
+        self.__version += 1
+        async with self.__changed:
+            self.__changed.notify_all()
+
+    async def _submit_(self, operation):
+        """Puts mutation to queue of single writer and returns its result.
+        operation - function, that makes mutation, appends its changes to
+        given list and returns result"""
+        future = asyncio.get_running_loop().create_future()
+        await self.__queue.put((operation, future))
+        return await future
+
+    def get_changes(self, since: int) -> dict:
+        """Returns changes made after version since. If some of them are
+        already forgotten reset is True, client must read all tasks again"""
+        oldest = self.__changes[0][0] if len(self.__changes) > 0 \
+            else self.__version + 1
+        reset = since + 1 < oldest and since < self.__version
+        changes = [] if reset else [
+            change for version, version_changes in self.__changes
+            if version > since for change in version_changes]
+        return {"version": self.__version, "reset": reset,
+                "changes": changes}
+
+    async def wait_changes(self, since: int, timeout: float) -> dict:
+        """Waits for changes made after version since at most timeout seconds
+        and returns them"""
+        async with self.__changed:
+            try:
+                await asyncio.wait_for(self.__changed.wait_for(
+                    lambda: self.__version > since), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.get_changes(since)
+
+    @staticmethod
+    def _get_int_(values: dict, key: str, default):
+        """Returns int value by key or default if there is no key"""
+        if key not in values or values[key] is None:
+            return default
+        try:
+            return int(values[key])
+        except (TypeError, ValueError):
+            raise HttpError(400, f"{key} must be integer")
+
+    @staticmethod
+    def _get_bool_(values: dict, key: str) -> bool:
+        """Returns bool value by key, false if there is no key"""
+        value = values.get(key, False)
+        if isinstance(value, str):
+            return value.lower() in ("1", "true", "yes")
+        return bool(value)
+
+    @staticmethod
+    def _get_ids_(body: dict) -> list:
+        """Returns list of ids from body of request"""
+        ids = body.get("ids")
+        if not isinstance(ids, list) or \
+                not all(isinstance(task_id, int) for task_id in ids):
+            raise HttpError(400, "ids must be list of integers")
+        return ids
+
+    def get_tasks(self, query: dict) -> dict:
+        """Returns tasks of section by query: tags (comma separated),
+        completed, offset and limit. Current section of engine isn't
+        changed"""
+        tags = [tag for tag in query.get("tags", "").split(',') if tag]
+        section = self.__manager.get_section(
+            tags, self._get_bool_(query, "completed"))
+        offset = self._get_int_(query, "offset", 0)
+        limit = self._get_int_(query, "limit", None)
+        if limit is None:
+            tasks = section.get_tasks()[offset:]
+        else:
+            tasks = section.get_tasks_page(offset, limit)
+        return {"version": self.__version,
+                "count": section.count_tasks(),
+                "tasks": [task.get_attributes() for task in tasks]}
+
+    async def add_task(self, body: dict) -> dict:
+        """Adds task by attributes from body, completed and force keys of
+        body are is_completed and in_any_case of TaskManager.add_task"""
+        task_attributes = {"id": None, "name": body.get("name"),
+                           "date": body.get("date", TaskConsts.Default.date),
+                           "tags": body.get("tags", []),
+                           "priority": body.get("priority",
+                                                TaskConsts.Default.priority),
+                           "difficult": body.get("difficult",
+                                                 TaskConsts.Default.difficult)}
+        tags = task_attributes["tags"]
+        message = "Name must be string and tags must be list of strings"
+        if isinstance(task_attributes["name"], str) and \
+                isinstance(tags, list) and \
+                all(isinstance(tag, str) for tag in tags):
+            try:
+                message = Task.check_task_attributes(task_attributes)
+            except (TypeError, AttributeError):
+                message = MessageConsts.wrong_attributes_text
+        if message != "":
+            raise HttpError(400, message)
+        is_completed = self._get_bool_(body, "completed")
+        in_any_case = self._get_bool_(body, "force")
+
+        def add(changes: list) -> dict:
+            attributes = dict(task_attributes)
+            done = self.__manager.add_task(attributes,
+                                           is_completed=is_completed,
+                                           in_any_case=in_any_case)
+            if not done:
+                return {"result": ResultConsts.duplicate}
+            changes.append({"op": "add", "id": attributes["id"],
+                            "completed": is_completed})
+            return {"result": ResultConsts.created, "id": attributes["id"]}
+
+        return await self._submit_(add)
+
+    async def move_tasks(self, body: dict, operation: str) -> dict:
+        """Checks, unchecks or deletes tasks by ids from body"""
+        ids = self._get_ids_(body)
+        is_completed = self._get_bool_(body, "completed")
+
+        def move(changes: list) -> dict:
+            if operation == "check":
+                results = self.__manager.check_many(ids)
+            elif operation == "uncheck":
+                results = self.__manager.uncheck_many(ids)
+            else:
+                results = self.__manager.delete_many(ids, is_completed)
+            done_ids = [task_id for task_id, result in zip(ids, results)
+                        if result == ResultConsts.done]
+            if len(done_ids) > 0:
+                changes.append({"op": operation, "ids": done_ids})
+            return {"results": dict(zip(map(str, ids), results))}
+
+        return await self._submit_(move)
+
+    async def _route_(self, method: str, path: str, query: dict,
+                      body: dict):
+        """Returns result of request by method and path"""
+        routes = {("GET", "/tasks"): lambda: self.get_tasks(query),
+                  ("GET", "/tags"): lambda: sorted(self.__manager.tags)}
+        if (method, path) in routes:
+            return await self._call_(routes[(method, path)])
+        if method == "GET" and path == "/version":
+            return {"version": self.__version}
+        if method == "GET" and path == "/changes":
+            timeout = min(float(self._get_int_(query, "timeout",
+                                               ServerConsts.poll_timeout)),
+                          ServerConsts.max_poll_timeout)
+            return await self.wait_changes(
+                self._get_int_(query, "since", self.__version), timeout)
+        if method == "POST" and path == "/tasks":
+            return await self.add_task(body)
+        if method == "POST" and path in ("/check", "/uncheck", "/delete"):
+            return await self.move_tasks(body, path[1:])
+        if path in ("/tasks", "/tags", "/version", "/changes", "/check",
+                    "/uncheck", "/delete"):
+            raise HttpError(405, f"{method} is not allowed")
+        raise HttpError(404, f"{path} not found")
+
+    @staticmethod
+    async def _read_request_(reader: asyncio.StreamReader) -> tuple:
+        """Reads HTTP request, returns method, target and body parsed from
+        json"""
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise HttpError(400, "Wrong request line")
+        headers = dict()
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = TaskServer._get_int_(headers, "content-length", 0)
+        if length > ServerConsts.max_body_size:
+            raise HttpError(413, "Body is too large")
+        body = dict()
+        if length > 0:
+            try:
+                body = json.loads(await reader.readexactly(length))
+            except ValueError:
+                raise HttpError(400, "Body must be json")
+            if not isinstance(body, dict):
+                raise HttpError(400, "Body must be json object")
+        return request_line[0], request_line[1], body
+
+    async def _respond_(self, writer: asyncio.StreamWriter, status: int,
+                        result):
+        """Writes json response with status"""
+        content = json.dumps(result, ensure_ascii=False).encode("UTF-8")
+        writer.write(f"HTTP/1.1 {status} {self.statuses[status]}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(content)}\r\n"
+                     f"Connection: close\r\n\r\n".encode("latin-1") + content)
+        await writer.drain()
+
+    async def _stream_events_(self, writer: asyncio.StreamWriter,
+                              query: dict):
+        """Sends changes as server-sent events until client disconnects"""
+        since = self._get_int_(query, "since", self.__version)
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\n"
+                     b"Connection: close\r\n\r\n")
+        await writer.drain()
+        while True:
+            result = await self.wait_changes(since, ServerConsts.poll_timeout)
+            if result["version"] > since:
+                writer.write(f"id: {result['version']}\ndata: "
+                             f"{json.dumps(result, ensure_ascii=False)}\n\n"
+                             .encode("UTF-8"))
+                since = result["version"]
+            else:
+                writer.write(b": keep-alive\n\n")
+            await writer.drain()
+
+    async def _handle_connection_(self, reader: asyncio.StreamReader,
+                                  writer: asyncio.StreamWriter):
+        """Handles one request of client"""
+        try:
+            try:
+                method, target, body = await self._read_request_(reader)
+                url = urlsplit(target)
+                query = {key: values[-1] for key, values in
+                         parse_qs(url.query).items()}
+                if method == "GET" and url.path == "/events":
+                    stream = asyncio.current_task()
+                    self.__streams.add(stream)
+                    try:
+                        await self._stream_events_(writer, query)
+                    except asyncio.CancelledError:
+                        pass
+                    finally:
+                        self.__streams.discard(stream)
+                    return
+                status, result = 200, await self._route_(method, url.path,
+                                                         query, body)
+            except HttpError as error:
+                status, result = error.status, {"error": str(error)}
+            except (ConnectionError, asyncio.IncompleteReadError):
+                return
+            except Exception as error:
+                status, result = 500, {"error": repr(error)}
+            await self._respond_(writer, status, result)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,234 @@
+from bisect import bisect_left, bisect_right, insort
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from Task import Task
+
+
+class TaskStatistics:
+    """TaskStatistics keeps counters of tasks with the same state by days of
+    their dates: number of tasks, sum of their difficult, number of tasks
+    with every priority and with every tag. Counters are updated with every
+    added and removed task, so statistics of all tasks or of tasks with date
+    from range is summed from counters of days without reading tasks.
+    Counters can also be built from columns of tasks at once (see
+    from_columns), then they are aggregated by NumPy if it is installed.
+    Counters are list: number of tasks, sum of difficult, dict priority ->
+    number of tasks, dict tag -> number of tasks.
+    ordinals: list - sorted ordinals of days, that have tasks,
+    days: dict - ordinal -> counters of tasks with this date,
+    total: list - counters of all tasks
+    """
+
+    def __init__(self, tasks=tuple()):
+        """Creates TaskStatistics object and counts all tasks"""
+        self.__ordinals = list()
+        self.__days = dict()
+        self.__total = self.make_counters()
+        for task in tasks:
+            self.add(task)
+
+    @staticmethod
+    def make_counters() -> list:
+        """Returns counters without tasks"""
+        return [0, 0, dict(), dict()]
+
+    @staticmethod
+    def _add_counts_(counts: dict, other: dict, sign: int):
+        """Adds counts of other to counts (subtracts if sign is -1), keys
+        with zero count are removed"""
+        for key, count in other.items():
+            count = counts.get(key, 0) + sign * count
+            if count == 0:
+                counts.pop(key, None)
+            else:
+                counts[key] = count
+
+    def _get_day_(self, ordinal: int) -> list:
+        """Returns counters of day by ordinal, creates them if day has no
+        tasks"""
+        day = self.__days.get(ordinal)
+        if day is None:
+            day = self.make_counters()
+            self.__days[ordinal] = day
+            insort(self.__ordinals, ordinal)
+        return day
+
+    def _drop_empty_day_(self, ordinal: int):
+        """Forgets day by ordinal if it has no tasks"""
+        if self.__days[ordinal][0] == 0:
+            del self.__days[ordinal]
+            del self.__ordinals[bisect_left(self.__ordinals, ordinal)]
+
+    def add_counters(self, ordinal: int, counters: list, sign=1):
+        """Adds counters to counters of day by ordinal and to total counters
+        (subtracts them if sign is -1)"""
+        for target in (self._get_day_(ordinal), self.__total):
+            target[0] += sign * counters[0]
+            target[1] += sign * counters[1]
+            self._add_counts_(target[2], counters[2], sign)
+            self._add_counts_(target[3], counters[3], sign)
+        self._drop_empty_day_(ordinal)
+
+    def _change_(self, task: Task, sign: int):
+        """Adds task to counters of its day and total counters (removes it
+        if sign is -1)"""
+        for target in (self._get_day_(task.ordinal), self.__total):
+            target[0] += sign
+            target[1] += sign * task.difficult
+            for counts, key in [(target[2], task.priority)] + \
+                    [(target[3], tag) for tag in task.tags]:
+                count = counts.get(key, 0) + sign
+                if count == 0:
+                    counts.pop(key, None)
+                else:
+                    counts[key] = count
+        self._drop_empty_day_(task.ordinal)
+
+    def add(self, task: Task):
+        """Counts task"""
+        self._change_(task, 1)
+
+    def remove(self, task: Task):
+        """Stops counting task, that was counted before"""
+        self._change_(task, -1)
+
+    def _get_ordinals_(self, dates=None) -> list:
+        """Returns ordered ordinals of days with tasks from range dates
+        (ordinals of the first and the last dates) or of all days"""
+        if dates is None:
+            return self.__ordinals
+        return self.__ordinals[bisect_left(self.__ordinals, dates[0]):
+                               bisect_right(self.__ordinals, dates[1])]
+
+    def get_summary(self, dates=None) -> dict:
+        """Returns statistics of tasks with date from range dates (ordinals
+        of the first and the last dates) or of all tasks: number of tasks
+        (tasks), sum of their difficult (difficult), priority -> number of
+        tasks (priorities), tag -> number of tasks (tags) and ordinal ->
+        number of tasks and sum of their difficult for every day with tasks
+        (days)"""
+        ordinals = self._get_ordinals_(dates)
+        if len(ordinals) == len(self.__ordinals):
+            counters = self.__total
+        else:
+            counters = self.make_counters()
+            for ordinal in ordinals:
+                day = self.__days[ordinal]
+                counters[0] += day[0]
+                counters[1] += day[1]
+                self._add_counts_(counters[2], day[2], 1)
+                self._add_counts_(counters[3], day[3], 1)
+        return {"tasks": counters[0], "difficult": counters[1],
+                "priorities": dict(counters[2]), "tags": dict(counters[3]),
+                "days": {ordinal: (self.__days[ordinal][0],
+                                   self.__days[ordinal][1])
+                         for ordinal in ordinals}}
+
+    def get_rows(self) -> list:
+        """Returns counters of all days as json compatible rows: ordinal,
+        number of tasks, sum of difficult, priorities and tags"""
+        return [[ordinal, day[0], day[1], dict(day[2]), dict(day[3])]
+                for ordinal, day in zip(self.__ordinals,
+                                        map(self.__days.get, self.__ordinals))]
+
+    def add_rows(self, rows: list, dates=None):
+        """Adds counters of days from rows (see get_rows), that are from
+        range dates if it is given. Priorities of rows read from json are
+        strings, they are turned back to numbers"""
+        for ordinal, tasks, difficult, priorities, tags in rows:
+            if dates is not None and not dates[0] <= ordinal <= dates[1]:
+                continue
+            priorities = {int(priority): count
+                          for priority, count in priorities.items()}
+            self.add_counters(ordinal, [tasks, difficult, priorities, tags])
+
+    @staticmethod
+    def from_columns(ordinals, priorities, difficults, tag_offsets,
+                     tag_codes, dictionary: list, rows=None):
+        """Returns statistics of tasks given by columns: ordinals,
+        priorities and difficults of tasks, tags of task i are codes
+        tag_codes[tag_offsets[i]:tag_offsets[i + 1]] in dictionary of tags.
+        Only tasks with numbers from rows are counted if rows are given.
+        Columns are aggregated by NumPy without loop over tasks if NumPy is
+        installed, otherwise they are counted one by one"""
+        if numpy is None:
+            return TaskStatistics._count_columns_(
+                ordinals, priorities, difficults, tag_offsets, tag_codes,
+                dictionary, rows)
+        return TaskStatistics._aggregate_columns_(
+            ordinals, priorities, difficults, tag_offsets, tag_codes,
+            dictionary, rows)
+
+    @staticmethod
+    def _count_columns_(ordinals, priorities, difficults, tag_offsets,
+                        tag_codes, dictionary: list, rows=None):
+        """Returns statistics of tasks given by columns counted one by one
+        (see from_columns)"""
+        statistics = TaskStatistics()
+        if rows is None:
+            rows = range(len(ordinals))
+        for row in rows:
+            day = statistics._get_day_(ordinals[row])
+            tags = [dictionary[code] for code in
+                    tag_codes[tag_offsets[row]:tag_offsets[row + 1]]]
+            for target in (day, statistics.__total):
+                target[0] += 1
+                target[1] += difficults[row]
+                target[2][priorities[row]] = \
+                    target[2].get(priorities[row], 0) + 1
+                for tag in tags:
+                    target[3][tag] = target[3].get(tag, 0) + 1
+        return statistics
+
+    @staticmethod
+    def _aggregate_columns_(ordinals, priorities, difficults, tag_offsets,
+                            tag_codes, dictionary: list, rows=None):
+        """Returns statistics of tasks given by columns aggregated by NumPy
+        (see from_columns): tasks are grouped by days with numpy.unique and
+        counters of days, pairs of day and priority and pairs of day and tag
+        are counted by numpy.bincount"""
+        ordinals = numpy.asarray(ordinals, dtype=numpy.int64)
+        priorities = numpy.asarray(priorities, dtype=numpy.int64)
+        difficults = numpy.asarray(difficults, dtype=numpy.int64)
+        tag_offsets = numpy.asarray(tag_offsets, dtype=numpy.int64)
+        codes = numpy.asarray(tag_codes, dtype=numpy.int64)
+        if rows is None:
+            lengths = numpy.diff(tag_offsets)
+        else:
+            rows = numpy.asarray(rows, dtype=numpy.int64)
+            lengths = tag_offsets[rows + 1] - tag_offsets[rows]
+            starts = numpy.repeat(tag_offsets[rows], lengths)
+            shifts = numpy.arange(len(starts)) - numpy.repeat(
+                numpy.cumsum(lengths) - lengths, lengths)
+            codes = codes[starts + shifts]
+            ordinals = ordinals[rows]
+            priorities = priorities[rows]
+            difficults = difficults[rows]
+        statistics = TaskStatistics()
+        if len(ordinals) == 0:
+            return statistics
+        days, days_of_tasks = numpy.unique(ordinals, return_inverse=True)
+        counters = [[int(tasks), int(difficult), dict(), dict()]
+                    for tasks, difficult in zip(
+                        numpy.bincount(days_of_tasks, minlength=len(days)),
+                        numpy.bincount(days_of_tasks, weights=difficults,
+                                       minlength=len(days)))]
+        priorities_count = int(priorities.max()) + 1
+        pairs = numpy.bincount(days_of_tasks * priorities_count + priorities)
+        for pair in numpy.flatnonzero(pairs).tolist():
+            day, priority = divmod(pair, priorities_count)
+            counters[day][2][priority] = int(pairs[pair])
+        if len(codes) != 0:
+            days_of_tags = numpy.repeat(days_of_tasks, lengths)
+            pairs, counts = numpy.unique(
+                days_of_tags * len(dictionary) + codes, return_counts=True)
+            for pair, count in zip(pairs.tolist(), counts.tolist()):
+                day, code = divmod(pair, len(dictionary))
+                counters[day][3][dictionary[code]] = count
+        for ordinal, day in zip(days.tolist(), counters):
+            statistics.add_counters(ordinal, day)
+        return statistics
@@ -0,0 +1,472 @@
+import json
+import os
+import os.path
+import threading
+from contextlib import nullcontext
+
+from FileLock import FileLock
+from Files import Files
+from Globals import PathConsts, StorageConsts
+from Instrumentation import Instrumentation
+from Journal import Journal
+from SearchIndex import SearchIndex
+from SortedTasks import SortedTasks
+from Storage import Storage
+from TagIndex import TagIndex
+from Task import Task
+from TaskStatistics import TaskStatistics
+
+
+class TaskStore(Storage):
+    """TaskStore is a resident in-memory storage of all tasks with the same
+    state (following/completed), backed by json file. The file is read again
+    only if it was changed (by modification time or size) since the last
+    reading or writing.
+    In journal mode the json file is a snapshot and every mutation only
+    appends one record to the journal. At loading the journal is replayed
+    on top of the snapshot and when it becomes too big it is folded back to
+    the snapshot by background compaction.
+    Several processes can work with the same file: mutations are persisted
+    under exclusive file lock by owner of store (TaskManager) and compaction
+    takes the same lock and is skipped if another process already replaced
+    the snapshot.
+    path: string - path to file with tasks with this state,
+    tasks: dict - id -> task for all tasks from the file in the order they
+    are stored,
+    sorted_tasks: SortedTasks - all tasks ordered by date, priority and
+    difficult,
+    tag_index: TagIndex - index from tags to ids of tasks,
+    names: dict - name -> set of ids of tasks with this name,
+    search_index: SearchIndex - index from trigrams of names and tags to ids
+    of tasks, it is built by the first search and then updated, None before
+    it,
+    statistics: TaskStatistics - counters of tasks by days, they are built
+    by the first query of statistics and then updated, None before it,
+    journal: Journal - journal of mutations made after the snapshot,
+    journal_mode: bool - are mutations written to journal,
+    journal_records: int - number of records in journal,
+    signature: tuple - modification time and size of snapshot and journal
+    after the last reading or writing,
+    undo: list - (id, previous task or None) for every mutation of current
+    transaction or None if there is no transaction,
+    pending: list - journal records of current transaction,
+    unwritten: int - number of deferred records, that are not written yet,
+    store isn't read again from disk until they are written,
+    file_lock: FileLock - lock of data files shared between processes or
+    None
+    """
+
+    def __init__(self, path: str, is_completed=False,
+                 journal_mode=StorageConsts.journal_mode,
+                 file_lock: FileLock | None = None):
+        """Creates TaskStore object by path to file with tasks and state"""
+        super().__init__(is_completed)
+        self.__path = path
+        self.__tasks = dict()
+        self.__sorted_tasks = SortedTasks()
+        self.__tag_index = TagIndex()
+        self.__names = dict()
+        self.__search_index = None
+        self.__statistics = None
+        self.__journal = Journal(path + PathConsts.journal_extension)
+        self.__journal_mode = journal_mode
+        self.__journal_records = 0
+        self.__signature = None
+        self.__lock = threading.RLock()
+        self.__compaction = None
+        self.__undo = None
+        self.__pending = list()
+        self.__unwritten = 0
+        self.__file_lock = file_lock
+
+    def _get_signature_(self) -> tuple:
+        """Returns modification time and size of snapshot and journal"""
+        stat = os.stat(self.__path)
+        return stat.st_mtime_ns, stat.st_size, self.__journal.signature
+
+    @staticmethod
+    def _apply_record_(tasks: dict, record: dict):
+        """Applies journal record to tasks dict (id -> task). Applying is
+        idempotent, so records, that are already in snapshot, can be
+        replayed again"""
+        if record["op"] == Journal.add_operation:
+            task = Task(record["task"])
+            tasks.pop(task.id, None)
+            tasks[task.id] = task
+        elif record["op"] == Journal.delete_operation:
+            tasks.pop(record["id"], None)
+        elif record["op"] == Journal.batch_operation:
+            for batch_record in record["records"]:
+                TaskStore._apply_record_(tasks, batch_record)
+
+    def _load_(self):
+        """Reads all tasks from snapshot to memory and replays journal on top
+        of them"""
+        with Instrumentation.open(self.__path, 'r',
+                                  encoding="UTF-8") as file:
+            json_tasks_attributes = file.read()
+        tasks_attributes = []
+        if len(json_tasks_attributes) != 0:
+            tasks_attributes = json.loads(json_tasks_attributes)
+        tasks = dict()
+        for task_attributes in tasks_attributes:
+            task = Task(task_attributes)
+            tasks[task.id] = task
+        records = self.__journal.read()
+        for record in records:
+            self._apply_record_(tasks, record)
+        self.__tasks = tasks
+        self.__sorted_tasks = SortedTasks(tasks.values())
+        self.__tag_index = TagIndex(tasks.values())
+        self.__names = dict()
+        for task in tasks.values():
+            self.__names.setdefault(task.name, set()).add(task.id)
+        self.__search_index = None
+        self.__statistics = None
+        self.__journal_records = len(records)
+        self._bump_version_()
+
+    def _index_task_(self, task: Task):
+        """Adds task to store and all its indexes"""
+        self.__tasks[task.id] = task
+        self.__sorted_tasks.add(task)
+        self.__tag_index.add(task)
+        self.__names.setdefault(task.name, set()).add(task.id)
+        if self.__search_index is not None:
+            self.__search_index.add(task)
+        if self.__statistics is not None:
+            self.__statistics.add(task)
+        self._bump_version_()
+
+    def _unindex_task_(self, task_id: int) -> Task | None:
+        """Removes task by id from store and all its indexes. Returns
+        removed task or None if there is no task with this id"""
+        task = self.__tasks.pop(task_id, None)
+        if task is None:
+            return None
+        self.__sorted_tasks.remove(task)
+        self.__tag_index.remove(task)
+        ids = self.__names[task.name]
+        ids.discard(task_id)
+        if len(ids) == 0:
+            del self.__names[task.name]
+        if self.__search_index is not None:
+            self.__search_index.remove(task)
+        if self.__statistics is not None:
+            self.__statistics.remove(task)
+        self._bump_version_()
+        return task
+
+    def _refresh_(self):
+        """Reads tasks from file again if it was changed since last
+        reading or writing. Isn't made during transaction and while deferred
+        records are not written. If another
+        process replaced the snapshot during reading, it is read again, so
+        records folded to new snapshot are not lost"""
+        if self.__undo is not None or self.__unwritten > 0:
+            return
+        with self.__lock:
+            while True:
+                signature = self._get_signature_()
+                if signature == self.__signature:
+                    return
+                self._load_()
+                if self._get_signature_()[:2] == signature[:2]:
+                    self.__signature = signature
+                    return
+
+    def _rewrite_tasks_(self):
+        """Atomically rewrites all tasks from memory to file"""
+        tasks_attributes = tuple(map(lambda task: task.get_attributes(),
+                                     self.__tasks.values()))
+        Files.write_atomic(self.__path, json.dumps(tasks_attributes))
+        if self.__journal_records > 0 or self.__journal.size > 0:
+            self.__journal.replace(b"")
+            self.__journal_records = 0
+        self.__signature = self._get_signature_()
+
+    def _need_compaction_(self) -> bool:
+        """Returns True if journal passed size or ratio (to number of tasks)
+        threshold. Big journal is compacted only if it also has compaction
+        growth part of number of tasks, so big store isn't rewritten after
+        every big transaction"""
+        if self.__journal_records < StorageConsts.compaction_min_records:
+            return False
+        ratio = self.__journal_records / max(len(self.__tasks), 1)
+        if self.__journal.size >= StorageConsts.compaction_size:
+            return ratio >= StorageConsts.compaction_growth
+        return ratio >= StorageConsts.compaction_ratio
+
+    def _compact_(self, tasks_attributes: tuple, offset: int,
+                  snapshot_signature: tuple):
+        """Writes tasks_attributes as new snapshot and removes from journal
+        first offset bytes, that are already in it. Compaction is skipped if
+        snapshot was replaced since snapshot_signature. Memory is marked as
+        read from new files only if it was read from the old ones, otherwise
+        changes of other processes made since the last reading would be
+        never read"""
+        temp_path = Files.write_temp(self.__path, json.dumps(tasks_attributes))
+        file_lock = self.__file_lock.exclusive() \
+            if self.__file_lock is not None else nullcontext()
+        with file_lock, self.__lock:
+            signature = self._get_signature_()
+            if signature[:2] != snapshot_signature:
+                os.remove(temp_path)
+                return
+            os.replace(temp_path, self.__path)
+            tail = self.__journal.read_tail(offset)
+            self.__journal.replace(tail)
+            self.__journal_records = tail.count(b'\n')
+            if signature == self.__signature:
+                self.__signature = self._get_signature_()
+
+    def _start_compaction_(self):
+        """Starts background compaction of journal if it is needed and
+        isn't running already"""
+        if self.__compaction is not None and self.__compaction.is_alive():
+            return
+        if not self._need_compaction_():
+            return
+        tasks_attributes = tuple(map(lambda task: task.get_attributes(),
+                                     self.__tasks.values()))
+        offset = self.__journal.size
+        snapshot_signature = self._get_signature_()[:2]
+        self.__compaction = threading.Thread(
+            target=self._compact_,
+            args=(tasks_attributes, offset, snapshot_signature))
+        self.__compaction.start()
+
+    def close(self):
+        """Waits for the end of background compaction if it is running"""
+        if self.__compaction is not None:
+            self.__compaction.join()
+
+    def _write_records_(self, records: list):
+        """Persists mutations described by records, appends them to journal
+        in journal mode otherwise rewrites all tasks"""
+        if not self.__journal_mode:
+            self._rewrite_tasks_()
+            return
+        self.__journal.append(records)
+        self.__journal_records += len(records)
+        self.__signature = self._get_signature_()
+        self._start_compaction_()
+
+    def _mutate_(self, task_id: int, task: Task | None, record: dict):
+        """Replaces task by id with task (deletes it if task is None) in
+        memory. Persists record at once if there is no transaction otherwise
+        postpones it until commit"""
+        old_task = self._unindex_task_(task_id)
+        if task is not None:
+            self._index_task_(task)
+        if self.__undo is None:
+            self._write_records_([record])
+            return
+        self.__undo.append((task_id, old_task))
+        self.__pending.append(record)
+
+    def add_task(self, task: Task):
+        """Adds task to store and file"""
+        with self.__lock:
+            self._refresh_()
+            record = Journal.make_add_record(task.get_attributes())
+            self._mutate_(task.id, task, record)
+
+    def delete_task_by_id(self, task_id: int):
+        """Deletes task with this id from store and file"""
+        with self.__lock:
+            self._refresh_()
+            if task_id not in self.__tasks:
+                return
+            record = Journal.make_delete_record(task_id)
+            self._mutate_(task_id, None, record)
+
+    def begin(self):
+        """Starts transaction, all mutations until commit are made only in
+        memory"""
+        with self.__lock:
+            self._refresh_()
+            self.__undo = list()
+            self.__pending = list()
+
+    def commit(self):
+        """Persists all mutations of transaction by one write. If writing
+        fails, mutations are rolled back"""
+        with self.__lock:
+            records = self.__pending
+            try:
+                if len(records) > 0:
+                    self._write_records_(records)
+            except BaseException:
+                self.rollback()
+                raise
+            self.__undo = None
+            self.__pending = list()
+
+    def rollback(self):
+        """Cancels all mutations of transaction in memory"""
+        with self.__lock:
+            for task_id, old_task in reversed(self.__undo or []):
+                self._unindex_task_(task_id)
+                if old_task is not None:
+                    self._index_task_(old_task)
+            self.__undo = None
+            self.__pending = list()
+
+    @property
+    def supports_deferred_writes(self) -> bool:
+        """Returns True in journal mode, where deferred records are appended
+        to journal"""
+        return self.__journal_mode
+
+    def defer_commit(self) -> list:
+        """Finishes transaction keeping all its mutations in memory and
+        returns its journal records, that must be persisted by
+        write_deferred"""
+        with self.__lock:
+            records = self.__pending
+            self.__unwritten += len(records)
+            self.__undo = None
+            self.__pending = list()
+            return records
+
+    def write_deferred(self, records: list, reload=False):
+        """Appends records returned by defer_commit to journal. Journal is
+        written without lock of store, so queries aren't blocked by disk. If
+        reload is True, store is read again by the next query, otherwise
+        journal is folded to snapshot if it is too big and all deferred
+        records are written"""
+        self.__journal.append(records)
+        with self.__lock:
+            self.__journal_records += len(records)
+            self.__unwritten -= len(records)
+            self.__signature = self._get_signature_()
+            if reload:
+                self.__signature = None
+            elif self.__unwritten == 0:
+                self._start_compaction_()
+
+    def discard_deferred(self, records: list):
+        """Forgets records returned by defer_commit, that can't be written,
+        store is read again from disk by the next query"""
+        with self.__lock:
+            self.__unwritten -= len(records)
+            self.__signature = None
+
+    @property
+    def has_pending_additions(self) -> bool:
+        """Returns True if current transaction adds tasks to store"""
+        return any(record["op"] == Journal.add_operation
+                   for record in self.__pending)
+
+    @property
+    def has_pending_changes(self) -> bool:
+        """Returns True if current transaction changes store"""
+        return len(self.__pending) > 0
+
+    @property
+    def version(self) -> int:
+        """Returns version of tasks, reads them from file first if it was
+        changed"""
+        with self.__lock:
+            self._refresh_()
+            return super().version
+
+    @property
+    def tasks(self) -> list:
+        """Returns all tasks of store in sorted order, reads them from file
+        only if it was changed"""
+        self._refresh_()
+        return self.__sorted_tasks.tasks
+
+    def get_tasks(self, tags: set) -> list:
+        """Returns sorted by date, priority and difficult attributes list of
+        all tasks, that have all tags. Tasks are found by tag index. If they
+        are a big part of all tasks, they are picked from sorted tasks,
+        otherwise only found tasks are sorted"""
+        self._refresh_()
+        if len(tags) == 0:
+            return self.__sorted_tasks.tasks
+        ids = self.__tag_index.find(tags)
+        if len(ids) * StorageConsts.filter_scan_ratio >= len(self.__tasks):
+            return [task for task in self.__sorted_tasks if task.id in ids]
+        tasks = [self.__tasks[task_id] for task_id in ids]
+        tasks.sort(key=self.sort_key)
+        return tasks
+
+    def get_tasks_page(self, tags: set, offset: int, limit: int) -> list:
+        """Returns limit tasks, that have all tags, starting from offset
+        position in sorted list of them. Without tags it is a slice of sorted
+        tasks"""
+        if len(tags) != 0:
+            return super().get_tasks_page(tags, offset, limit)
+        self._refresh_()
+        return self.__sorted_tasks.get_slice(offset, limit)
+
+    def count_tasks(self, tags: set) -> int:
+        """Returns number of tasks, that have all tags"""
+        self._refresh_()
+        if len(tags) == 0:
+            return len(self.__tasks)
+        return len(self.__tag_index.find(tags))
+
+    def count_tasks_before(self, ordinal: int, tags: set) -> int:
+        """Returns number of tasks, that have all tags, with date before
+        ordinal. Without tags it is found by binary search in sorted tasks"""
+        if len(tags) != 0:
+            return super().count_tasks_before(ordinal, tags)
+        self._refresh_()
+        return self.__sorted_tasks.count_before(ordinal)
+
+    def get_tasks_by_dates(self, first_ordinal: int, last_ordinal: int,
+                           tags=frozenset()) -> list:
+        """Returns sorted list of all tasks with date from first_ordinal to
+        last_ordinal inclusive, that have all tags. Tasks are found by binary
+        search in sorted tasks"""
+        self._refresh_()
+        tasks = self.__sorted_tasks.get_by_dates(first_ordinal, last_ordinal)
+        if len(tags) == 0:
+            return tasks
+        ids = self.__tag_index.find(tags)
+        return [task for task in tasks if task.id in ids]
+
+    def search_tasks(self, query: str, tags: set, limit: int,
+                     dates=None) -> list:
+        """Returns limit best tasks, whose name or tag contains lowercased
+        query, that have all tags and date from range dates if it is given.
+        Only candidates found by search index are checked"""
+        with self.__lock:
+            self._refresh_()
+            if self.__search_index is None:
+                self.__search_index = SearchIndex(self.__tasks.values())
+            tasks = [self.__tasks[task_id]
+                     for task_id in self.__search_index.find(query)]
+        return self.rank_found_tasks(tasks, query, tags, limit, dates)
+
+    def get_statistics(self, tags: set, dates=None) -> dict:
+        """Returns statistics of tasks, that have all tags, with date from
+        range dates if it is given. Without tags it is summed from counters
+        of days"""
+        if len(tags) != 0:
+            return super().get_statistics(tags, dates)
+        with self.__lock:
+            self._refresh_()
+            if self.__statistics is None:
+                self.__statistics = TaskStatistics(self.__tasks.values())
+            return self.__statistics.get_summary(dates)
+
+    def find_task_by_name(self, task_name: str) -> bool:
+        """Returns True if task with this name exists otherwise False"""
+        self._refresh_()
+        return task_name in self.__names
+
+    def get_task_by_id(self, task_id: int) -> Task | None:
+        """Returns task by id if this task exist otherwise None"""
+        self._refresh_()
+        return self.__tasks.get(task_id)
+
+    @property
+    def tags(self) -> set:
+        """Returns all tags used at least once in this storage"""
+        self._refresh_()
+        return self.__tag_index.tags
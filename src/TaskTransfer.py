@@ -0,0 +1,319 @@
+import csv
+import json
+import os.path
+from itertools import islice
+
+from Globals import MessageConsts, ResultConsts, TaskConsts, TransferConsts
+from Instrumentation import Instrumentation
+from Task import Task
+from TaskManager import TaskManager
+
+
+class TaskTransfer:
+    """TaskTransfer imports tasks from files and exports them to files in
+    JSON Lines, CSV and iCalendar (VTODO) formats. Files are read and written
+    as streams: rows are read, checked by Task.parse_task_attributes and
+    added by chunks of chunk_size rows, each chunk is one transaction, so
+    every file of tasks is written once per chunk and memory doesn't depend
+    on size of file. Incorrect rows are reported and skipped, they don't stop
+    import.
+    Rows of all formats have fields of TransferConsts.fields: tags are list
+    in JSON Lines, string of tags split by '\\n' in CSV and CATEGORIES in
+    iCalendar, completed is state of task. Only name and date are required,
+    id is ignored at import.
+    manager: TaskManager - engine, that gets and gives tasks,
+    chunk_size: int - number of rows in one transaction
+    """
+
+    def __init__(self, manager: TaskManager,
+                 chunk_size=TransferConsts.chunk_size):
+        """Creates TaskTransfer object by engine and size of chunks"""
+        self.__manager = manager
+        self.__chunk_size = chunk_size
+
+    @staticmethod
+    def get_format(path: str, file_format=None) -> str:
+        """Returns format of file by its extension if file_format isn't
+        given"""
+        if file_format is not None:
+            return file_format
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in TransferConsts.extensions:
+            raise ValueError(f"Unknown format of {path}, use one of "
+                             f"{', '.join(TransferConsts.formats)}")
+        return TransferConsts.extensions[extension]
+
+    @staticmethod
+    def _make_attributes_(row: dict) -> tuple:
+        """Returns task_attributes from row with default values of missing
+        fields and state of task, or None and error string if required
+        fields are missing"""
+        missing = [field for field in TransferConsts.required_fields
+                   if row.get(field) is None]
+        if len(missing) != 0:
+            return None, MessageConsts.missing_fields_text + \
+                ", ".join(missing)
+        if not isinstance(row["name"], str) or \
+                not isinstance(row["date"], str):
+            return None, MessageConsts.wrong_row_text + str(row)
+        tags = row.get("tags") or []
+        if isinstance(tags, str):
+            tags = tags.split('\n')
+        completed = row.get("completed") or False
+        if isinstance(completed, str):
+            completed = completed.strip().lower() in \
+                TransferConsts.true_values
+        task_attributes = {
+            "id": None, "name": row["name"], "date": row["date"],
+            "tags": [tag for tag in tags if tag != ""],
+            "priority": row.get("priority", TaskConsts.Default.priority),
+            "difficult": row.get("difficult", TaskConsts.Default.difficult)}
+        return (task_attributes, bool(completed)), ""
+
+    @staticmethod
+    def _read_jsonl_(file):
+        """Yields number of line and row (dict or error string) of every
+        not empty line of JSON Lines file"""
+        for number, line in enumerate(file, 1):
+            if line.strip() == "":
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield number, MessageConsts.wrong_row_text + str(error)
+                continue
+            tags = row.get("tags") if isinstance(row, dict) else None
+            if not isinstance(row, dict) or \
+                    not isinstance(tags or [], list) or \
+                    not all(isinstance(tag, str) for tag in tags or []):
+                yield number, MessageConsts.wrong_row_text + line.strip()
+                continue
+            yield number, row
+
+    @staticmethod
+    def _read_csv_(file):
+        """Yields number of the first line and row of every record of CSV
+        file with header. Empty fields are missing ones"""
+        reader = csv.DictReader(file)
+        if reader.fieldnames is None:
+            return
+        number = reader.line_num + 1
+        for row in reader:
+            yield number, {field: value for field, value in row.items()
+                           if field is not None and value not in ("", None)}
+            number = reader.line_num + 1
+
+    @staticmethod
+    def _unfold_ics_(file):
+        """Yields number and content of every logical line of iCalendar
+        file, folded lines (that start with space or tab) are joined"""
+        number, content = 0, None
+        for line_number, line in enumerate(file, 1):
+            line = line.rstrip("\r\n")
+            if line[:1] in (" ", "\t") and content is not None:
+                content += line[1:]
+                continue
+            if content is not None:
+                yield number, content
+            number, content = line_number, line
+        if content is not None:
+            yield number, content
+
+    @staticmethod
+    def _unescape_ics_(value: str) -> list:
+        """Returns list of values of iCalendar text split by not escaped
+        commas and unescaped"""
+        values, current, escaped = [], [], False
+        for char in value:
+            if escaped:
+                current.append('\n' if char in "nN" else char)
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == ',':
+                values.append("".join(current))
+                current = []
+            else:
+                current.append(char)
+        values.append("".join(current))
+        return values
+
+    @staticmethod
+    def _get_priority_(ics_priority: str) -> str:
+        """Returns priority of task by iCalendar priority: 1-4 is high, 5 is
+        medium and 6-9 is low. Not digits are returned as is to be reported
+        by check"""
+        if not ics_priority.isdigit():
+            return ics_priority
+        for priority, levels in TransferConsts.ics_priority_levels.items():
+            if int(ics_priority) in levels:
+                return str(priority)
+        return ics_priority
+
+    @staticmethod
+    def _read_ics_(file):
+        """Yields number of BEGIN line and row of every VTODO component of
+        iCalendar file"""
+        row = None
+        number = 0
+        for line_number, line in TaskTransfer._unfold_ics_(file):
+            name, _, value = line.partition(':')
+            name = name.partition(';')[0].upper()
+            if name == "BEGIN" and value.upper() == "VTODO":
+                row, number = dict(), line_number
+            elif row is None:
+                continue
+            elif name == "END" and value.upper() == "VTODO":
+                yield number, row
+                row = None
+            elif name == "SUMMARY":
+                row["name"] = ",".join(TaskTransfer._unescape_ics_(value))
+            elif name == "DUE":
+                row["date"] = f"{value[6:8]}.{value[4:6]}.{value[0:4]}"
+            elif name == "CATEGORIES":
+                row.setdefault("tags", []).extend(
+                    TaskTransfer._unescape_ics_(value))
+            elif name == "PRIORITY" and value.strip() not in ("", "0"):
+                row["priority"] = TaskTransfer._get_priority_(value.strip())
+            elif name == TransferConsts.ics_difficult:
+                row["difficult"] = value.strip()
+            elif name == "STATUS":
+                row["completed"] = \
+                    value.strip().upper() == TransferConsts.ics_completed
+
+    def _read_(self, file, file_format: str):
+        """Returns generator of rows of file by its format"""
+        readers = {TransferConsts.jsonl_format: self._read_jsonl_,
+                   TransferConsts.csv_format: self._read_csv_,
+                   TransferConsts.ics_format: self._read_ics_}
+        return readers[file_format](file)
+
+    def import_file(self, path: str, file_format=None, in_any_case=False,
+                    report=None) -> dict:
+        """Imports tasks from file by chunks. report(line, result, error) is
+        called for every row, that isn't created: result is invalid or
+        duplicate (see TaskManager.import_tasks), rows of chunk are reported
+        in order of lines after chunk is written. Returns number of rows
+        with every result"""
+        file_format = self.get_format(path, file_format)
+        counts = {ResultConsts.created: 0, ResultConsts.duplicate: 0,
+                  ResultConsts.invalid: 0}
+        newline = "" if file_format == TransferConsts.csv_format else None
+        with Instrumentation.open(path, 'r', encoding="UTF-8",
+                                  newline=newline) as file:
+            rows = self._read_(file, file_format)
+            while True:
+                chunk = list(islice(rows, self.__chunk_size))
+                if len(chunk) == 0:
+                    break
+                lines, tasks, failed = [], [], []
+                for number, row in chunk:
+                    error = row
+                    if isinstance(row, dict):
+                        entry, error = self._make_attributes_(row)
+                        if entry is not None:
+                            task_attributes, completed = entry
+                            task, error = \
+                                Task.parse_task_attributes(task_attributes)
+                    if error != "":
+                        failed.append((number, ResultConsts.invalid,
+                                       error.strip()))
+                        continue
+                    lines.append(number)
+                    tasks.append((task, completed))
+                results = self.__manager.import_tasks(tasks, in_any_case)
+                error = MessageConsts.already_exist_console_text
+                for number, result in zip(lines, results):
+                    if result == ResultConsts.created:
+                        counts[result] += 1
+                    else:
+                        failed.append((number, result, error))
+                for number, result, error in sorted(failed):
+                    counts[result] += 1
+                    if report is not None:
+                        report(number, result, error)
+        return counts
+
+    @staticmethod
+    def _get_row_(task: Task, completed: bool) -> dict:
+        """Returns row of task for export"""
+        return {"id": task.id, "name": task.name, "date": task.date_str,
+                "tags": sorted(task.tags), "priority": task.priority,
+                "difficult": task.difficult, "completed": completed}
+
+    @staticmethod
+    def _escape_ics_(value: str) -> str:
+        """Returns iCalendar text with escaped special characters"""
+        return value.replace('\\', "\\\\").replace(';', "\\;") \
+            .replace(',', "\\,").replace('\n', "\\n")
+
+    @staticmethod
+    def _fold_ics_(line: str) -> str:
+        """Returns iCalendar line folded to lines of no more than
+        TransferConsts.ics_line_length bytes with CRLF at the end"""
+        parts = []
+        limit = TransferConsts.ics_line_length
+        current, size = [], 0
+        for char in line:
+            char_size = len(char.encode("UTF-8"))
+            if size + char_size > limit:
+                parts.append("".join(current))
+                current, size = [' '], 1
+            current.append(char)
+            size += char_size
+        parts.append("".join(current))
+        return "\r\n".join(parts) + "\r\n"
+
+    @staticmethod
+    def _write_ics_task_(file, row: dict):
+        """Writes row of task as VTODO component"""
+        day, month, year = row["date"].split('.')
+        lines = ["BEGIN:VTODO",
+                 f"UID:task-{row['id']}@{TransferConsts.ics_uid_domain}",
+                 f"SUMMARY:{TaskTransfer._escape_ics_(row['name'])}",
+                 f"DUE;VALUE=DATE:{year}{month}{day}",
+                 f"PRIORITY:"
+                 f"{TransferConsts.ics_priorities[row['priority']]}",
+                 f"{TransferConsts.ics_difficult}:{row['difficult']}"]
+        if len(row["tags"]) != 0:
+            lines.append("CATEGORIES:" + ",".join(
+                map(TaskTransfer._escape_ics_, row["tags"])))
+        status = TransferConsts.ics_completed if row["completed"] \
+            else TransferConsts.ics_following
+        lines += [f"STATUS:{status}", "END:VTODO"]
+        file.write("".join(map(TaskTransfer._fold_ics_, lines)))
+
+    def export_file(self, path: str, file_format=None,
+                    is_completed=None) -> int:
+        """Exports tasks with state is_completed (all tasks if it is None)
+        to file page by page. Returns number of exported tasks"""
+        file_format = self.get_format(path, file_format)
+        states = [False, True] if is_completed is None else [is_completed]
+        count = 0
+        newline = "" if file_format != TransferConsts.jsonl_format else None
+        with Instrumentation.open(path, 'w', encoding="UTF-8",
+                                  newline=newline) as file:
+            writer = None
+            if file_format == TransferConsts.csv_format:
+                writer = csv.DictWriter(file, TransferConsts.fields)
+                writer.writeheader()
+            elif file_format == TransferConsts.ics_format:
+                file.write("".join(map(self._fold_ics_, [
+                    "BEGIN:VCALENDAR", "VERSION:2.0",
+                    f"PRODID:{TransferConsts.ics_product}"])))
+            for completed in states:
+                for task in self.__manager.iterate_tasks(completed,
+                                                         self.__chunk_size):
+                    row = self._get_row_(task, completed)
+                    if file_format == TransferConsts.jsonl_format:
+                        file.write(json.dumps(row, ensure_ascii=False) + '\n')
+                    elif file_format == TransferConsts.csv_format:
+                        row["tags"] = '\n'.join(row["tags"])
+                        row["completed"] = int(completed)
+                        writer.writerow(row)
+                    else:
+                        self._write_ics_task_(file, row)
+                    count += 1
+            if file_format == TransferConsts.ics_format:
+                file.write(self._fold_ics_("END:VCALENDAR"))
+        return count
@@ -0,0 +1,2 @@
+"""Benchmarks of task manager engine. Run from src directory, for example:
+python3 -m benchmarks.batch"""
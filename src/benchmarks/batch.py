@@ -0,0 +1,58 @@
+import sys
+
+from TaskManager import TaskManager
+from benchmarks.common import make_task_attributes, measure, temp_data_dir
+
+sizes = (100, 1000, 10000, 50000)
+single_sizes = (100, 1000)
+
+
+def bench_batch(size: int, storage: str) -> dict:
+    """Returns time per item of add_many, check_many and delete_many with
+    batch of size items"""
+    with temp_data_dir(storage):
+        manager = TaskManager()
+        tasks_attributes = [make_task_attributes(i) for i in range(size)]
+        ids = list(range(1, size + 1))
+        add = measure(lambda: manager.add_many(tasks_attributes))
+        check = measure(lambda: manager.check_many(ids))
+        manager.change_section_tags([], True)
+        delete = measure(lambda: manager.delete_many(ids))
+        manager.close()
+    return {"add_many": add / size, "check_many": check / size,
+            "delete_many": delete / size}
+
+
+def bench_single(size: int, storage: str) -> float:
+    """Returns time per item of adding size items one by one"""
+    with temp_data_dir(storage):
+        manager = TaskManager()
+        tasks_attributes = [make_task_attributes(i) for i in range(size)]
+
+        def add_one_by_one():
+            for task_attributes in tasks_attributes:
+                manager.add_task(task_attributes, is_completed=False)
+
+        result = measure(add_one_by_one) / size
+        manager.close()
+    return result
+
+
+def main():
+    storages = sys.argv[1:] or ["json", "sqlite"]
+    for storage in storages:
+        print(f"storage: {storage}, microseconds per item")
+        print(f"{'size':>8} {'add_many':>10} {'check_many':>11} "
+              f"{'delete_many':>12} {'add_task':>10}")
+        for size in sizes:
+            result = bench_batch(size, storage)
+            single = "-"
+            if size in single_sizes:
+                single = f"{bench_single(size, storage) * 1e6:.1f}"
+            print(f"{size:>8} {result['add_many'] * 1e6:>10.1f} "
+                  f"{result['check_many'] * 1e6:>11.1f} "
+                  f"{result['delete_many'] * 1e6:>12.1f} {single:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import json
+import os
+import os.path
+import tempfile
+import time
+from contextlib import contextmanager
+
+from Globals import PathConsts, StorageConsts
+
+
+@contextmanager
+def temp_data_dir(storage=StorageConsts.default_storage):
+    """Context manager, that creates temp directory with empty data files and
+    makes it current working directory, so TaskManager works with it"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            for path in (PathConsts.path_to_following_dir,
+                         PathConsts.path_to_completed_dir,
+                         PathConsts.path_to_config_dir):
+                os.makedirs(path, exist_ok=True)
+            for path in (PathConsts.path_to_following,
+                         PathConsts.path_to_completed):
+                open(path, 'w').close()
+            with open(PathConsts.path_to_config, 'w') as config:
+                config.write(json.dumps({"max_id": 0, "storage": storage}))
+            yield directory
+        finally:
+            os.chdir(cwd)
+
+
+def make_task_attributes(i: int) -> dict:
+    """Returns deterministic task_attributes of i-th task"""
+    return {"id": None, "name": f"task {i}",
+            "date": f"{i % 28 + 1:02}.{i % 12 + 1:02}.{2020 + i % 10}",
+            "tags": [f"tag {i % 20}", f"tag {i % 7}"],
+            "priority": i % 3 + 1, "difficult": i % 5 + 1}
+
+
+def measure(function) -> float:
+    """Returns time of function call in seconds"""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
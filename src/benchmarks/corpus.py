@@ -0,0 +1,74 @@
+import datetime
+import json
+import random
+
+from Globals import PathConsts, TaskConsts
+
+start_date = datetime.date(2024, 1, 1)
+
+
+class CorpusConfig:
+    """Parameters of synthetic corpus of tasks. Corpus with the same
+    parameters is always the same.
+    size: int - number of all tasks,
+    tags_count: int - number of different tags,
+    max_task_tags: int - max number of tags of one task,
+    date_spread: int - number of days, that dates of tasks are spread over,
+    completed_ratio: float - part of completed tasks,
+    seed: int - seed of random generator"""
+
+    def __init__(self, size: int, tags_count=50, max_task_tags=3,
+                 date_spread=365, completed_ratio=0.3, seed=0):
+        self.size = size
+        self.tags_count = tags_count
+        self.max_task_tags = max_task_tags
+        self.date_spread = date_spread
+        self.completed_ratio = completed_ratio
+        self.seed = seed
+
+    @property
+    def tags(self) -> list:
+        """Returns all tags of corpus"""
+        return [f"tag {i}" for i in range(self.tags_count)]
+
+    def get_attributes(self) -> dict:
+        """Returns parameters of corpus"""
+        return dict(vars(self))
+
+
+def generate_tasks(config: CorpusConfig) -> tuple:
+    """Returns lists of attributes of following and completed tasks of
+    corpus, ids are 1..size"""
+    generator = random.Random(config.seed)
+    tags = config.tags
+    following, completed = [], []
+    for i in range(config.size):
+        date = start_date + datetime.timedelta(
+            days=generator.randrange(config.date_spread))
+        tags_count = generator.randint(0, min(config.max_task_tags,
+                                              len(tags)))
+        task_attributes = {
+            "id": i + 1,
+            "name": f"task {i}",
+            "date": date.strftime(TaskConsts.Default.date_format),
+            "tags": generator.sample(tags, tags_count),
+            "priority": generator.choice(TaskConsts.Ranges.priority),
+            "difficult": generator.choice(TaskConsts.Ranges.difficult)}
+        if generator.random() < config.completed_ratio:
+            completed.append(task_attributes)
+        else:
+            following.append(task_attributes)
+    return following, completed
+
+
+def write_corpus(config: CorpusConfig, storage: str):
+    """Writes corpus to data files in current working directory, in the same
+    layout as data directory of application"""
+    following, completed = generate_tasks(config)
+    for path, tasks_attributes in ((PathConsts.path_to_following, following),
+                                   (PathConsts.path_to_completed, completed)):
+        with open(path, 'w', encoding="UTF-8") as file:
+            file.write(json.dumps(tasks_attributes))
+    with open(PathConsts.path_to_config, 'w') as config_file:
+        config_file.write(json.dumps({"max_id": config.size,
+                                      "storage": storage}))
@@ -0,0 +1,232 @@
+"""Benchmarks of engine and layout hot paths on synthetic corpora. Results
+are printed as JSON and can be compared with saved baseline, for example:
+python3 -m benchmarks.suite --sizes 1000,10000 --output baseline.json
+python3 -m benchmarks.suite --sizes 1000,10000 --baseline baseline.json"""
+import argparse
+import importlib.util
+import json
+import math
+import random
+import sys
+import time
+import tracemalloc
+
+from FileLock import FileLock
+from Globals import GeneralLayoutConsts, PathConsts, StorageConsts
+from LayoutModel import LayoutModel
+from Section import Section
+from TaskManager import TaskManager
+from TaskStore import TaskStore
+from benchmarks.common import temp_data_dir
+from benchmarks.corpus import CorpusConfig, write_corpus
+
+default_sizes = (1000, 10000, 100000)
+
+
+def open_stores(storage: str) -> list:
+    """Returns following and completed storages of data in current working
+    directory"""
+    if storage == StorageConsts.sqlite_storage:
+        return TaskManager._get_sqlite_stores_(
+            FileLock(PathConsts.path_to_lock))
+    return [TaskStore(PathConsts.path_to_following),
+            TaskStore(PathConsts.path_to_completed, is_completed=True)]
+
+
+def percentile(latencies: list, part: float) -> float:
+    """Returns percentile of sorted latencies"""
+    position = max(math.ceil(part * len(latencies)) - 1, 0)
+    return latencies[position]
+
+
+def run(function, calls: int) -> dict:
+    """Calls function calls times with number of call, returns ops/sec,
+    p50/p99 latency in microseconds and peak memory in bytes of one more
+    traced call"""
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        function(i)
+        latencies.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function(calls)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    latencies.sort()
+    return {"calls": calls,
+            "ops_per_sec": calls / sum(latencies),
+            "p50_us": percentile(latencies, 0.5) * 1e6,
+            "p99_us": percentile(latencies, 0.99) * 1e6,
+            "peak_memory": peak_memory}
+
+
+def bench_load(repeat: int) -> dict:
+    """Measures loading of all tasks by new TaskManager"""
+    def load(_):
+        manager = TaskManager()
+        manager.count_tasks()
+        manager.close()
+
+    return run(load, repeat)
+
+
+def bench_sections(config: CorpusConfig, storage: str, repeat: int,
+                   calls: int) -> dict:
+    """Measures queries of sections"""
+    generator = random.Random(config.seed)
+    tags = config.tags
+    [following_store, completed_store] = open_stores(storage)
+    whole_section = Section(following_store)
+    tag_sections = [Section(following_store, [tag]) for tag in tags]
+    names = [f"task {generator.randrange(config.size * 2)}"
+             for _ in range(calls + 1)]
+    results = {
+        "section.get_tasks": run(
+            lambda i: whole_section.get_tasks(), repeat),
+        "section.get_tasks_by_tag": run(
+            lambda i: tag_sections[i % len(tags)].get_tasks(), repeat),
+        "section.get_tasks_page": run(
+            lambda i: tag_sections[i % len(tags)].get_tasks_page(
+                0, GeneralLayoutConsts.page_size), calls),
+        "section.find_task_by_name": run(
+            lambda i: whole_section.find_task_by_name(names[i]), calls)}
+    following_store.close()
+    completed_store.close()
+    return results
+
+
+def bench_manager(repeat: int, calls: int) -> dict:
+    """Measures mutations, tags, statistics and planning of TaskManager"""
+    manager = TaskManager()
+    manager.change_section_tags([], False)
+    ids = [task.id for task in manager.get_tasks(0, calls + 1)]
+
+    def add_task(i):
+        manager.add_task({"id": None, "name": f"new task {i}",
+                          "date": "01.01.2024", "tags": ["new"],
+                          "priority": 1, "difficult": 1},
+                         is_completed=False)
+
+    def check_uncheck(i):
+        task_id = ids[i % len(ids)]
+        manager.check(task_id)
+        manager.uncheck(task_id)
+
+    results = {"task_manager.add_task": run(add_task, calls)}
+    if len(ids) > 0:
+        results["task_manager.check_uncheck"] = run(check_uncheck, calls)
+    results["task_manager.tags"] = run(lambda i: manager.tags, repeat)
+    results["task_manager.get_statistics"] = run(
+        lambda i: manager.get_statistics(), calls)
+    results["task_manager.plan_tasks"] = run(
+        lambda i: manager.plan_tasks(), calls)
+    manager.close()
+    return results
+
+
+def bench_layout(repeat: int) -> dict:
+    """Measures building of general layout with the first page of tasks,
+    with graphic library only if it is installed"""
+    manager = TaskManager()
+    page_size = GeneralLayoutConsts.page_size
+    tasks = manager.get_tasks(0, page_size)
+    count = manager.count_tasks()
+    tags = manager.tags
+    picked_tags = tags[:1]
+    results = {"layout.get_general_model": run(
+        lambda i: LayoutModel.get_general_model(tasks, tags, picked_tags,
+                                                False, 0, count), repeat)}
+    if importlib.util.find_spec("PySimpleGUI") is not None:
+        from Layout import Layout
+        results["layout.get_general_layout"] = run(
+            lambda i: Layout.get_general_layout(tasks, tags, picked_tags,
+                                                False, 0, count), repeat)
+    manager.close()
+    return results
+
+
+def bench_corpus(config: CorpusConfig, storage: str, repeat: int,
+                 calls: int) -> dict:
+    """Returns results of all benchmarks on corpus"""
+    with temp_data_dir(storage):
+        write_corpus(config, storage)
+        results = {"task_manager.load": bench_load(repeat)}
+        results.update(bench_sections(config, storage, repeat, calls))
+        results.update(bench_layout(repeat))
+        results.update(bench_manager(repeat, calls))
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> dict:
+    """Returns ratio of ops/sec to baseline for each benchmark, that is in
+    both of them, and if it is regression (slower more than tolerance)"""
+    comparison = dict()
+    for size, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            base = baseline.get(size, dict()).get(name)
+            if base is None:
+                continue
+            ratio = result["ops_per_sec"] / base["ops_per_sec"]
+            comparison[f"{size}/{name}"] = {
+                "ratio": ratio, "regression": ratio < 1 - tolerance}
+    return comparison
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default=",".join(map(str, default_sizes)),
+                        help="comma separated sizes of corpora, for example "
+                             "1000,10000,100000,1000000")
+    parser.add_argument("--storage", default=StorageConsts.default_storage,
+                        choices=(StorageConsts.json_storage,
+                                 StorageConsts.sqlite_storage))
+    parser.add_argument("--tags", type=int, default=50,
+                        help="number of different tags")
+    parser.add_argument("--max-task-tags", type=int, default=3)
+    parser.add_argument("--date-spread", type=int, default=365,
+                        help="number of days of dates of tasks")
+    parser.add_argument("--completed-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=10,
+                        help="calls of heavy benchmarks")
+    parser.add_argument("--calls", type=int, default=200,
+                        help="calls of light benchmarks")
+    parser.add_argument("--output", help="file to save results to")
+    parser.add_argument("--baseline", help="saved results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed slowdown relative to baseline")
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+    config = CorpusConfig(0, arguments.tags, arguments.max_task_tags,
+                          arguments.date_spread, arguments.completed_ratio,
+                          arguments.seed)
+    results = dict()
+    for size in map(int, arguments.sizes.split(',')):
+        config.size = size
+        results[str(size)] = bench_corpus(config, arguments.storage,
+                                          arguments.repeat, arguments.calls)
+    corpus = config.get_attributes()
+    del corpus["size"]
+    report = {"storage": arguments.storage, "corpus": corpus,
+              "results": results}
+    is_regression = False
+    if arguments.baseline is not None:
+        with open(arguments.baseline, 'r') as file:
+            baseline = json.loads(file.read())
+        report["comparison"] = compare(results, baseline["results"],
+                                       arguments.tolerance)
+        is_regression = any(item["regression"]
+                            for item in report["comparison"].values())
+    report_json = json.dumps(report, indent=2)
+    if arguments.output is not None:
+        with open(arguments.output, 'w') as file:
+            file.write(report_json)
+    print(report_json)
+    sys.exit(1 if is_regression else 0)
+
+
+if __name__ == "__main__":
+    main()
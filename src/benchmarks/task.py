@@ -0,0 +1,74 @@
+import gc
+import tracemalloc
+from datetime import datetime
+
+from Task import Task
+from benchmarks.common import make_task_attributes, measure
+
+sizes = (10000, 100000)
+
+
+class LegacyTask:
+    """Task as it was before compact representation: __dict__, datetime from
+    strptime and own set of tags"""
+
+    def __init__(self, task_attributes: dict):
+        self.__id = task_attributes["id"]
+        self.__name = task_attributes["name"]
+        self.__date = datetime.strptime(task_attributes["date"], "%d.%m.%Y")
+        tags = filter(lambda tag: not tag.isspace(), task_attributes["tags"])
+        self.__tags = set(tags)
+        self.__priority = int(task_attributes["priority"])
+        self.__difficult = int(task_attributes["difficult"])
+
+    def get_attributes(self) -> dict:
+        task_attributes = dict()
+        task_attributes["id"] = self.__id
+        task_attributes["name"] = self.__name
+        task_attributes["date"] = self.__date.strftime("%d.%m.%Y")
+        task_attributes["tags"] = tuple(self.__tags)
+        task_attributes["priority"] = self.__priority
+        task_attributes["difficult"] = self.__difficult
+        return task_attributes
+
+
+def bench_class(task_class, tasks_attributes: list) -> dict:
+    """Returns construction and serialization throughput (tasks per second)
+    and memory (bytes per task) of task_class"""
+    gc.collect()
+    tracemalloc.start()
+    tasks = [task_class(task_attributes) for task_attributes in
+             tasks_attributes]
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tasks
+    gc.collect()
+    size = len(tasks_attributes)
+    tasks = []
+    construction = measure(lambda: tasks.extend(
+        task_class(task_attributes) for task_attributes in tasks_attributes))
+    serialization = measure(lambda: [task.get_attributes() for task in tasks])
+    return {"construction": size / construction,
+            "serialization": size / serialization,
+            "memory": memory / size}
+
+
+def main():
+    print(f"{'class':>10} {'size':>8} {'bytes/task':>11} "
+          f"{'created/s':>11} {'serialized/s':>13}")
+    for size in sizes:
+        tasks_attributes = []
+        for i in range(size):
+            task_attributes = make_task_attributes(i)
+            task_attributes["id"] = i
+            tasks_attributes.append(task_attributes)
+        for task_class in (LegacyTask, Task):
+            result = bench_class(task_class, tasks_attributes)
+            print(f"{task_class.__name__:>10} {size:>8} "
+                  f"{result['memory']:>11.0f} "
+                  f"{result['construction']:>11.0f} "
+                  f"{result['serialization']:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
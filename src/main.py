@@ -1,10 +1,22 @@
-from GraphicShell import GraphicShell
+import sys
 
+from Globals import ConsoleConsts
 
-def main():
-    app = GraphicShell()
-    app.general()
+
+def main(arguments=None) -> int:
+    """Starts graphic shell without command line arguments or with gui
+    command, otherwise runs command of command line shell. Graphic library is
+    imported only for graphic shell"""
+    if arguments is None:
+        arguments = sys.argv[1:]
+    if len(arguments) == 0 or arguments == [ConsoleConsts.gui]:
+        from GraphicShell import GraphicShell
+        app = GraphicShell()
+        app.general()
+        return 0
+    from ConsoleShell import ConsoleShell
+    return ConsoleShell().run(arguments)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())